@@ -1,22 +1,35 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from typing import List, Optional
 
-from ..models import Pos, WorldState
-from ..pathfinding import find_path
+from ..models import Grid, Pos, WorldState
+from ..basket import elegir_canasta
+from ..components import componentes
+from ..distances import find_route, goal_fields
+from ..incremental import DStarLite
+from ..pick_order import optimizar_picks
+from ..pathfinding import INCREMENTAL_ALGOS, PATH_METRICS, SearchStats, canonical_algo, one_to_many
 from ..bitacora import write_event
 
 
 EPS = 1e-6
+INF = float("inf")
 
 
 def choose_products_greedy(world: WorldState, voucher: float) -> List[str]:
     """
     Compra "la mayoría": meter la mayor cantidad posible (por precio ascendente)
-    sin exceder el vale.
+    sin exceder el vale. Los productos inalcanzables desde el comprador se
+    descartan de entrada (consulta O(1) a los componentes conexos).
     """
-    prods = sorted(world.map_data.products.values(), key=lambda p: p.price)
+    comp = componentes(world.map_data.grid)
+    start = world.buyer.pos
+    prods = sorted(
+        (p for p in world.map_data.products.values() if comp.conectados(start, p.pick)),
+        key=lambda p: p.price,
+    )
     selected: List[str] = []
     total = 0.0
     for p in prods:
@@ -26,12 +39,20 @@ def choose_products_greedy(world: WorldState, voucher: float) -> List[str]:
     return selected
 
 
-def order_goals_nearest_neighbor(start: Pos, goals: List[Pos]) -> List[Pos]:
+def order_goals_nearest_neighbor(start: Pos, goals: List[Pos], grid: Optional[Grid] = None) -> List[Pos]:
+    """
+    Vecino más cercano. Con `grid`, usa distancia real caminando (una búsqueda
+    uno-a-muchos por paso); sin grid, distancia Manhattan.
+    """
     remaining = goals[:]
     ordered: List[Pos] = []
     cur = start
     while remaining:
-        nxt = min(remaining, key=lambda g: cur.manhattan(g))
+        if grid is not None:
+            dist = one_to_many(grid, cur, remaining).distances
+            nxt = min(remaining, key=lambda g: (dist.get(g, INF), cur.manhattan(g)))
+        else:
+            nxt = min(remaining, key=lambda g: cur.manhattan(g))
         ordered.append(nxt)
         remaining.remove(nxt)
         cur = nxt
@@ -61,12 +82,14 @@ class BuyerAgent:
 
     # ---------- Helpers ----------
     def _esta_en_cola_de_caja(self, world: WorldState) -> bool:
-        b = world.buyer
-        return any(b.pos == r.queue_spot for r in world.map_data.registers.values())
+        return world.map_data.caja_en_cola(world.buyer.pos) is not None
 
     def _cola_de_caja_mas_cercana(self, world: WorldState, from_pos: Pos) -> Pos:
-        regs = list(world.map_data.registers.values())
-        reg = min(regs, key=lambda r: from_pos.manhattan(r.queue_spot))
+        # Consulta O(1) al campo multi-fuente de colas de caja
+        reg = goal_fields(world.map_data).caja_mas_cercana(from_pos)
+        if reg is None:
+            regs = list(world.map_data.registers.values())
+            reg = min(regs, key=lambda r: from_pos.manhattan(r.queue_spot))
         return reg.queue_spot
 
     def _precio_minimo_restante(self, world: WorldState) -> Optional[float]:
@@ -74,11 +97,7 @@ class BuyerAgent:
         Precio mínimo de los productos seleccionados que aún NO están en el carrito.
         Si no quedan productos, retorna None.
         """
-        b = world.buyer
-        remaining = [world.map_data.products[sku].price for sku in b.selected_skus if sku not in b.cart]
-        if not remaining:
-            return None
-        return float(min(remaining))
+        return world.buyer.precio_minimo_pendiente()
 
     def _redireccionar_a_caja(self, world: WorldState, reason: str) -> None:
         """
@@ -95,7 +114,7 @@ class BuyerAgent:
         b.goal_queue = [queue_spot, world.map_data.exit]
         b.goal = b.goal_queue[0]
         b.goal_kind = "register"
-        b.path = []
+        b.path.limpiar()
 
         world.log(f"➡️ Buyer va directo a caja ({reason}). Restante={b.budget_remaining:.2f}")
 
@@ -109,18 +128,17 @@ class BuyerAgent:
         if b.selected_skus and b.goal_queue:
             return
 
-        b.selected_skus = choose_products_greedy(world, b.voucher_amount)
+        # Máxima utilidad (section_weights) dentro del vale, descontando el desvío caminando
+        b.selected_skus = elegir_canasta(world.map_data, b.pos, b.voucher_amount, b.section_weights).skus
+        b.indexar_pendientes(world.map_data.products)
         b.budget_remaining = b.voucher_amount
 
         pick_points = [world.map_data.products[sku].pick for sku in b.selected_skus]
-        ordered_picks = order_goals_nearest_neighbor(b.pos, pick_points)
-
-        # Caja más cercana al último pick (o a la posición actual si no hay picks)
-        registers = list(world.map_data.registers.values())
-        reg = min(
-            registers,
-            key=lambda r: (ordered_picks[-1].manhattan(r.queue_spot) if ordered_picks else b.pos.manhattan(r.queue_spot)),
-        )
+        # Orden de picks y caja elegidos juntos sobre distancias reales
+        # (picks -> cola de caja -> salida)
+        plan = optimizar_picks(world.map_data, b.pos, pick_points)
+        ordered_picks = plan.order
+        reg = plan.register
 
         world.log(
             f"Buyer seleccionó {len(b.selected_skus)} productos con vale={b.voucher_amount:.2f}. Caja elegida: {reg.id}"
@@ -131,16 +149,40 @@ class BuyerAgent:
 
         b.goal = b.goal_queue[0] if b.goal_queue else None
         b.goal_kind = "pick" if ordered_picks else "register"
-        b.path = []
+        b.path.limpiar()
 
     # ---------- Pathing ----------
     def _asegurar_ruta(self, world: WorldState) -> None:
         b = world.buyer
         if b.goal is None:
             return
-        if b.path and b.path[0] == b.pos:
+        if b.path and b.path.actual() == b.pos:
             return
-        b.path = find_path(b.algo, world.map_data.grid, b.pos, b.goal)
+        b.last_search = SearchStats()
+        if not componentes(world.map_data.grid).conectados(b.pos, b.goal):
+            # Meta aislada: se descarta sin buscar (paso() registra "No se encontró ruta")
+            b.path.limpiar()
+            return
+        if canonical_algo(b.algo) in INCREMENTAL_ALGOS:
+            path = self._ruta_incremental(world, b.last_search)
+        else:
+            path = find_route(world.map_data, b.algo, b.pos, b.goal, stats=b.last_search, goal_kind=b.goal_kind)
+        b.path.cargar(path, world.map_data.grid.width)
+
+    def _ruta_incremental(self, world: WorldState, stats: SearchStats) -> List[Pos]:
+        """
+        Reutiliza el planificador D* Lite del comprador mientras la meta no cambie;
+        los bloqueos que llegan por parche ya fueron reparados en `World.aplicar_parche`.
+        """
+        b = world.buyer
+        grid = world.map_data.grid
+        t0 = time.perf_counter()
+        if b.planner is None or not b.planner.sirve_para(grid, b.goal):
+            b.planner = DStarLite(grid, b.goal)
+        path = b.planner.ruta(b.pos, stats)
+        stats.wall_ms = (time.perf_counter() - t0) * 1e3
+        PATH_METRICS.registrar(world.map_data.name, "dstar", stats, b.goal_kind, b.pos, b.goal)
+        return path
 
     # ---------- Goal transitions ----------
     def _avanzar_meta_si_alcanzo(self, world: WorldState) -> None:
@@ -149,9 +191,9 @@ class BuyerAgent:
             return
 
         # Si estamos en la cola de una caja, NO avanzar hasta pagar
-        if any(b.pos == r.queue_spot for r in world.map_data.registers.values()):
+        if world.map_data.caja_en_cola(b.pos) is not None:
             b.goal_kind = "register"
-            b.path = []
+            b.path.limpiar()
 
             # Solo cuando pagó, avanzar a salida
             if not b.paid:
@@ -166,17 +208,17 @@ class BuyerAgent:
 
             b.goal = b.goal_queue[0]
             b.goal_kind = "exit"
-            b.path = []
+            b.path.limpiar()
             return
 
         # Si estamos en un punto pick, intentar tomar producto
-        pick_to_sku = {world.map_data.products[sku].pick: sku for sku in b.selected_skus if sku not in b.cart}
-        if b.goal in pick_to_sku:
-            sku = pick_to_sku[b.goal]
+        sku = b.sku_pendiente_en(b.goal)
+        if sku is not None:
             prod = world.map_data.products[sku]
 
             if prod.price <= b.budget_remaining + EPS:
                 b.cart.append(sku)
+                b.retirar_pendiente(sku, prod.pick)
                 b.budget_remaining -= float(prod.price)
 
                 ev = {
@@ -219,15 +261,15 @@ class BuyerAgent:
             b.goal = b.goal_queue[0]
             if b.goal == world.map_data.exit:
                 b.goal_kind = "exit"
-            elif any(b.goal == r.queue_spot for r in world.map_data.registers.values()):
+            elif world.map_data.caja_en_cola(b.goal) is not None:
                 b.goal_kind = "register"
             else:
                 b.goal_kind = "pick"
-            b.path = []
+            b.path.limpiar()
         else:
             b.goal = None
             b.goal_kind = "idle"
-            b.path = []
+            b.path.limpiar()
 
     # ---------- Step ----------
         # ---------- Ciclo principal del agente ----------
@@ -254,7 +296,7 @@ class BuyerAgent:
         if self._esta_en_cola_de_caja(world):
             b.goal_kind = "register"
             b.goal = b.pos
-            b.path = []
+            b.path.limpiar()
             if not b.paid:
                 return
 
@@ -268,14 +310,13 @@ class BuyerAgent:
             world.log("No se encontró ruta a la meta (posible bloqueo).")
             b.goal = None
             b.goal_kind = "idle"
-            b.path = []
+            b.path.limpiar()
             return
 
         # Mover 1 celda
         if len(b.path) >= 2:
             old = b.pos
-            b.pos = b.path[1]
-            b.path = b.path[1:]
+            b.pos = b.path.avanzar()
             if b.pos != old:
                 b.steps_moved += 1
 
@@ -35,23 +35,18 @@ class CashierAgent:
         """
         Devuelve el id de la caja cuyo queue_spot coincide con la posición del comprador.
         """
-        b = world.buyer
-        for r in world.map_data.registers.values():
-            if b.pos == r.queue_spot:
-                return r.id
-        return None
+        return world.map_data.caja_en_cola(world.buyer.pos)
 
     def _siguiente_sku_a_escanear(self, world: WorldState) -> Optional[str]:
         """
         Escanea SOLO lo que el comprador realmente tiene en el carrito.
+        El carrito solo crece y se escanea en orden, así que basta un cursor.
         """
         b = world.buyer
         c = world.cashier
-        scanned = set(c.scanned_skus or [])
-
-        for sku in b.cart or []:
-            if sku not in scanned:
-                return sku
+        cart = b.cart or []
+        if c.scan_index < len(cart):
+            return cart[c.scan_index]
         return None
 
     def _registrar_escaneo(self, world: WorldState, sku: str) -> None:
@@ -68,6 +63,7 @@ class CashierAgent:
             c.subtotal = 0.0
 
         c.scanned_skus.append(sku)
+        c.scan_index = len(c.scanned_skus)
         c.subtotal = float(c.subtotal) + float(prod.price)
 
         ev: Dict[str, Any] = {
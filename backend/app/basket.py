@@ -0,0 +1,294 @@
+"""
+Selección de canasta: máxima utilidad dentro del vale, descontando lo que se camina.
+
+- Utilidad de un producto: `section_weights[sección]` del comprador (default 1.0,
+  así que sin pesos equivale a "comprar la mayor cantidad").
+- Costo de caminar: desvío estimado de su punto pick (distancias de la tabla de
+  puntos de interés si está precalculada; Manhattan si no), por `walk_weight`
+  unidades de utilidad por paso.
+- Etapa 1: mochila exacta en centavos (DP de frontera de Pareto costo/utilidad).
+- Etapa 2: búsqueda local sobre la ruta estimada (quitar picks cuyo desvío no
+  compensa, agregar con inserción más barata lo que entre en el vale).
+Es "anytime": si se agota `budget_ms` devuelve la mejor canasta hallada hasta ahí.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .components import componentes
+from .distances import goal_fields, poi_distances
+from .models import MapData, Pos, Product
+
+
+DEFAULT_BUDGET_MS = 15.0
+# Utilidad que se resigna por cada paso extra (50 pasos de desvío = 1 producto)
+WALK_WEIGHT = 0.02
+# Candidatos (por utilidad neta / precio) que entran a la mochila
+MAX_CANDIDATES = 300
+
+
+@dataclass(slots=True)
+class BasketPlan:
+    skus: List[str]
+    utility: float
+    spent: float
+    exact: bool
+
+
+def utilidad_producto(prod: Product, weights: Optional[Dict[str, float]] = None) -> float:
+    return float(weights.get(prod.section, 1.0)) if weights else 1.0
+
+
+def _centavos(monto: float) -> int:
+    return int(round(monto * 100))
+
+
+class _Distancias:
+    """Distancia entre puntos: tabla completa si el mapa la admite (ver `PoiDistances.precalcular`), si no Manhattan (cota inferior)."""
+
+    def __init__(self, md: MapData):
+        self.pd = poi_distances(md)
+        self.fields = goal_fields(md)
+        self.tabla = self.pd.precalcular()
+        self._cierre: Dict[Pos, Optional[int]] = {}
+
+    def d(self, a: Pos, b: Pos) -> int:
+        if self.tabla:
+            v = self.pd.distancia(a, b)
+            if v is not None:
+                return v
+        return a.manhattan(b)
+
+    def cierre(self, p: Pos) -> Optional[int]:
+        """Pasos p -> mejor cola de caja -> salida (None si no hay salida posible)."""
+        if p not in self._cierre:
+            c = self.fields.mejor_cierre(p)
+            self._cierre[p] = c[0] if c is not None else None
+        return self._cierre[p]
+
+
+def _mochila(
+    items: List[Tuple[int, float]], capacidad: int, deadline: float
+) -> Tuple[List[int], bool]:
+    """
+    Mochila 0/1 exacta: frontera de Pareto de estados (costo, valor) ordenada por
+    costo con valor estrictamente creciente. Devuelve (índices, completa).
+    Si se agota el tiempo, completa el mejor estado con los ítems restantes por
+    valor/costo.
+    """
+    # (costo, valor, nodo) con nodo = (índice, nodo padre) para reconstruir
+    frontera: List[Tuple[int, float, Optional[tuple]]] = [(0, 0.0, None)]
+    completa = True
+    k = 0
+    for k, (c, v) in enumerate(items):
+        if time.perf_counter() >= deadline:
+            completa = False
+            break
+        nuevos = [(fc + c, fv + v, (k, nodo)) for fc, fv, nodo in frontera if fc + c <= capacidad]
+        mezcla = sorted(frontera + nuevos, key=lambda s: (s[0], -s[1]))
+        frontera = []
+        mejor = -1.0
+        for s in mezcla:
+            if s[1] > mejor + 1e-9:
+                frontera.append(s)
+                mejor = s[1]
+    else:
+        k = len(items)
+
+    costo, _, nodo = frontera[-1]
+    elegidos: List[int] = []
+    while nodo is not None:
+        elegidos.append(nodo[0])
+        nodo = nodo[1]
+
+    if not completa:
+        resto = sorted(range(k, len(items)), key=lambda i: -items[i][1] / max(1, items[i][0]))
+        for i in resto:
+            if costo + items[i][0] <= capacidad:
+                elegidos.append(i)
+                costo += items[i][0]
+    return elegidos, completa
+
+
+def _ruta_estimada(dist: _Distancias, start: Pos, puntos: List[Pos]) -> List[Pos]:
+    """Orden por vecino más cercano (la ruta final la optimiza pick_order)."""
+    libres = list(puntos)
+    orden: List[Pos] = []
+    cur = start
+    while libres:
+        nxt = min(libres, key=lambda p: dist.d(cur, p))
+        orden.append(nxt)
+        libres.remove(nxt)
+        cur = nxt
+    return orden
+
+
+def _vecino_mas_cercano(dist: _Distancias, puntos: List[Pos]) -> Dict[Pos, int]:
+    """Distancia de cada punto al punto más cercano del resto."""
+    if dist.tabla or len(puntos) <= 64:
+        return {p: min((dist.d(p, q) for q in puntos if q != p), default=-1) for p in puntos}
+    # Sin tabla (mapas grandes): Manhattan con hash espacial, anillos crecientes
+    B = 16
+    cubos: Dict[Tuple[int, int], List[Pos]] = {}
+    for p in puntos:
+        cubos.setdefault((p.x // B, p.y // B), []).append(p)
+    kxs = [k[0] for k in cubos]
+    kys = [k[1] for k in cubos]
+    radio_max = max(max(kxs) - min(kxs), max(kys) - min(kys))
+    out: Dict[Pos, int] = {}
+    for p in puntos:
+        cx, cy = p.x // B, p.y // B
+        mejor = -1
+        for r in range(radio_max + 1):
+            # Todo punto fuera del anillo r está a más de (r - 1) * B
+            if mejor >= 0 and mejor <= (r - 1) * B:
+                break
+            for kx in range(cx - r, cx + r + 1):
+                for ky in (range(cy - r, cy + r + 1) if kx in (cx - r, cx + r) else (cy - r, cy + r)):
+                    for q in cubos.get((kx, ky), ()):
+                        if q != p:
+                            d = p.manhattan(q)
+                            if mejor < 0 or d < mejor:
+                                mejor = d
+        out[p] = mejor
+    return out
+
+
+def _mejorar(
+    dist: _Distancias,
+    start: Pos,
+    cand: List[Product],
+    util: List[float],
+    elegidos: set,
+    capacidad: int,
+    walk_weight: float,
+    deadline: float,
+) -> None:
+    """Quita / agrega picks mirando el desvío real sobre la ruta estimada (modifica `elegidos`)."""
+    por_punto: Dict[Pos, List[int]] = {}
+    for i in elegidos:
+        por_punto.setdefault(cand[i].pick, []).append(i)
+    gastado = sum(_centavos(cand[i].price) for i in elegidos)
+    # Lo quitado no vuelve a entrar: sin ciclos quitar/agregar, termina sola
+    descartados: set = set()
+
+    cambio = True
+    while cambio and time.perf_counter() < deadline:
+        cambio = False
+        orden = _ruta_estimada(dist, start, list(por_punto))
+
+        # Quitar: el ahorro de caminar supera la utilidad del punto
+        for k, p in enumerate(orden):
+            prev = orden[k - 1] if k > 0 else start
+            if k + 1 < len(orden):
+                ahorro = dist.d(prev, p) + dist.d(p, orden[k + 1]) - dist.d(prev, orden[k + 1])
+            else:
+                ahorro = dist.d(prev, p) + (dist.cierre(p) or 0) - (dist.cierre(prev) or 0)
+            u = sum(util[i] for i in por_punto[p])
+            if walk_weight * ahorro > u + 1e-9:
+                for i in por_punto.pop(p):
+                    elegidos.discard(i)
+                    descartados.add(i)
+                    gastado -= _centavos(cand[i].price)
+                cambio = True
+                break
+        if cambio or time.perf_counter() >= deadline:
+            continue
+
+        # Agregar: mejor utilidad neta (inserción más barata) por centavo que entre
+        pts = [start] + orden
+        mejor, mejor_i = 0.0, -1
+        for i, prod in enumerate(cand):
+            if i in elegidos or i in descartados or gastado + _centavos(prod.price) > capacidad:
+                continue
+            p = prod.pick
+            if p in por_punto:
+                ins = 0
+            else:
+                ins = min(
+                    (dist.d(a, p) + dist.d(p, b) - dist.d(a, b) for a, b in zip(pts, pts[1:])),
+                    default=dist.d(start, p) + (dist.cierre(p) or 0) - (dist.cierre(start) or 0),
+                )
+                ins = min(ins, dist.d(pts[-1], p) + (dist.cierre(p) or 0) - (dist.cierre(pts[-1]) or 0))
+            neta = util[i] - walk_weight * ins
+            ratio = neta / max(1, _centavos(prod.price))
+            if neta > 1e-9 and ratio > mejor:
+                mejor, mejor_i = ratio, i
+        if mejor_i >= 0:
+            elegidos.add(mejor_i)
+            por_punto.setdefault(cand[mejor_i].pick, []).append(mejor_i)
+            gastado += _centavos(cand[mejor_i].price)
+            cambio = True
+
+
+def elegir_canasta(
+    md: MapData,
+    start: Pos,
+    voucher: float,
+    weights: Optional[Dict[str, float]] = None,
+    walk_weight: float = WALK_WEIGHT,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+) -> BasketPlan:
+    """Canasta de máxima utilidad neta (utilidad - walk_weight * pasos) que cabe en el vale."""
+    deadline = time.perf_counter() + budget_ms / 1e3
+    capacidad = _centavos(voucher)
+    dist = _Distancias(md)
+    base = dist.cierre(start) or 0
+
+    # Candidatos: entran en el vale, utilidad positiva y con salida posible
+    prods = [p for p in md.products.values() if _centavos(p.price) <= capacidad and utilidad_producto(p, weights) > 0]
+    if len(prods) > MAX_CANDIDATES:
+        prods.sort(key=lambda p: (-utilidad_producto(p, weights) / max(1, _centavos(p.price)), p.sku))
+        prods = prods[:MAX_CANDIDATES]
+    comp = componentes(md.grid)
+    prods = [p for p in prods if comp.conectados(start, p.pick) and dist.cierre(p.pick) is not None]
+    if not prods:
+        return BasketPlan(skus=[], utility=0.0, spent=0.0, exact=True)
+
+    # Desvío estimado por punto pick: ir y volver al vecino más cercano (o el
+    # recorrido solo a ese punto), repartido entre los productos que lo comparten
+    puntos: Dict[Pos, int] = {}
+    for p in prods:
+        puntos[p.pick] = puntos.get(p.pick, 0) + 1
+    vecinos = _vecino_mas_cercano(dist, list(puntos))
+    desvio: Dict[Pos, float] = {}
+    for p in puntos:
+        solo = dist.d(start, p) + (dist.cierre(p) or 0) - base
+        ida_y_vuelta = 2 * vecinos[p] if vecinos[p] >= 0 else solo
+        desvio[p] = max(0, min(solo, ida_y_vuelta)) / puntos[p]
+
+    util = [utilidad_producto(p, weights) for p in prods]
+    neto = [u - walk_weight * desvio[p.pick] for u, p in zip(util, prods)]
+    idx = [i for i in range(len(prods)) if neto[i] > 0]
+    # Orden por densidad: si la DP se corta por tiempo, lo más valioso ya entró
+    idx.sort(key=lambda i: -neto[i] / _centavos(prods[i].price))
+    sel, exacta = _mochila([(_centavos(prods[i].price), neto[i]) for i in idx], capacidad, deadline)
+    elegidos = {idx[k] for k in sel}
+
+    _mejorar(dist, start, prods, util, elegidos, capacidad, walk_weight, deadline)
+
+    skus = sorted((prods[i] for i in elegidos), key=lambda p: (p.price, p.sku))
+    return BasketPlan(
+        skus=[p.sku for p in skus],
+        utility=sum(util[i] for i in elegidos),
+        spent=sum(p.price for p in skus),
+        exact=exacta,
+    )
+
+
+# --- Alias de compatibilidad (inglés) ---
+def choose_basket(
+    md: MapData,
+    start: Pos,
+    voucher: float,
+    weights: Optional[Dict[str, float]] = None,
+    walk_weight: float = WALK_WEIGHT,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+) -> BasketPlan:
+    return elegir_canasta(md, start, voucher, weights, walk_weight, budget_ms)
+
+
+def product_utility(prod: Product, weights: Optional[Dict[str, float]] = None) -> float:
+    return utilidad_producto(prod, weights)
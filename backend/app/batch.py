@@ -0,0 +1,353 @@
+"""
+Corridas en lote de episodios de `World`, sin HTTP, sobre un pool de procesos.
+
+Un episodio es (sucursal, vale, algoritmo, semilla): se reinicia el mundo y se
+avanza hasta que el comprador sale (o hasta `max_ticks`). La semilla sortea,
+con un `random.Random` propio del episodio, las preferencias por sección del
+comprador (`section_weights`), así que cambia la canasta que elige. Cada worker carga
+cada sucursal una sola vez y reutiliza su `World`; los episodios viajan en
+lotes agrupados por sucursal. Las métricas se escriben a medida que llegan
+(CSV o JSONL según la extensión de la salida).
+
+En los workers la bitácora y PATH_METRICS están apagados (en un barrido
+serían millones de líneas y de registros).
+
+Uso (desde backend/):
+    python -m app.batch --vouchers 20 60 120 500 --algos bfs astar --out logs/batch.csv
+    python -m app.batch --voucher-range 10 500 5 --seeds 0 1 2 --workers 8 --out logs/batch.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .data_loader import _project_root, load_map
+from .distances import goal_fields, poi_distances
+from .pathfinding import PATH_METRICS, canonical_algo
+from .sim.world import World
+
+
+DEFAULT_MAX_TICKS = 5000
+# Rango de las preferencias por sección que sortea cada semilla
+SECTION_WEIGHT_RANGE = (0.5, 1.5)
+# Lotes en vuelo por worker (más = mejor balance, más IPC)
+CHUNKS_PER_WORKER = 8
+MAX_CHUNK = 256
+
+FIELDS = (
+    "id",
+    "branch",
+    "voucher",
+    "algo",
+    "seed",
+    "finished",
+    "ticks",
+    "steps_moved",
+    "items",
+    "spent",
+    "change",
+    "register",
+    "plan_ms",
+    "wall_ms",
+    "error",
+)
+
+
+@dataclass(slots=True, frozen=True)
+class Episode:
+    id: int
+    branch: str  # ruta del JSON de la sucursal
+    voucher: float
+    algo: str
+    seed: int = 0
+    register: str = "R1"
+    max_ticks: int = DEFAULT_MAX_TICKS
+
+
+def sucursales(nombres: Optional[Sequence[str]] = None) -> List[str]:
+    """Rutas de las sucursales: todas las `data/Hipermaxi_*.json` o las pedidas (nombre o ruta)."""
+    data = _project_root() / "data"
+    if not nombres:
+        return [str(f) for f in sorted(data.glob("Hipermaxi_*.json"))]
+    out: List[str] = []
+    for n in nombres:
+        p = Path(n)
+        if not p.suffix:
+            p = p.with_suffix(".json")
+        if not p.exists():
+            p = data / p.name
+        if not p.exists():
+            raise FileNotFoundError(f"branch not found: {n}")
+        out.append(str(p))
+    return out
+
+
+def episodios(
+    branches: Sequence[str],
+    vouchers: Sequence[float],
+    algos: Sequence[str],
+    seeds: Sequence[int] = (0,),
+    max_ticks: int = DEFAULT_MAX_TICKS,
+) -> List[Episode]:
+    """Producto (sucursal x vale x algoritmo x semilla), agrupado por sucursal."""
+    out: List[Episode] = []
+    for b in branches:
+        for a in algos:
+            for v in vouchers:
+                for s in seeds:
+                    out.append(Episode(len(out), b, float(v), canonical_algo(a), int(s), max_ticks=max_ticks))
+    return out
+
+
+# ---------- Ejecución (en el worker) ----------
+_WORLDS: Dict[str, World] = {}
+
+
+def _init_worker() -> None:
+    os.environ["BITACORA"] = "0"
+    PATH_METRICS.enabled = False
+
+
+def _mundo(branch: str) -> World:
+    w = _WORLDS.get(branch)
+    if w is None:
+        w = World(load_map(Path(branch)))
+        # Tabla y campos de distancias antes del primer episodio: si no, se
+        # construyen dentro del presupuesto de tiempo de canasta / orden de
+        # picks y el primer episodio de cada worker sale distinto
+        poi_distances(w.map_data)
+        goal_fields(w.map_data)
+        _WORLDS[branch] = w
+    return w
+
+
+def pesos_secciones(sections: Iterable[str], seed: int) -> Dict[str, float]:
+    """Preferencias por sección del comprador de un episodio (deterministas por semilla)."""
+    rng = random.Random(seed)
+    lo, hi = SECTION_WEIGHT_RANGE
+    return {sec: round(rng.uniform(lo, hi), 3) for sec in sorted(sections)}
+
+
+def correr_episodio(ep: Episode) -> Dict[str, Any]:
+    """Corre un episodio completo y devuelve su fila de métricas."""
+    row: Dict[str, Any] = {
+        "id": ep.id,
+        "branch": Path(ep.branch).stem,
+        "voucher": ep.voucher,
+        "algo": ep.algo,
+        "seed": ep.seed,
+        "error": "",
+    }
+    t0 = time.perf_counter()
+    try:
+        w = _mundo(ep.branch)
+        w.reiniciar(voucher_amount=ep.voucher, algo=ep.algo, cashier_register_id=ep.register)
+        w.state.buyer.section_weights = pesos_secciones(w.map_data.sections, ep.seed)
+        # La planificación es lo primero que hace el comprador en su primer
+        # paso; hacerla aquí solo permite medirla (paso() ve el plan y sigue)
+        tp = time.perf_counter()
+        w.buyer_agent.planificar_si_es_necesario(w.state)
+        row["plan_ms"] = round((time.perf_counter() - tp) * 1e3, 3)
+        w.paso(ep.max_ticks)
+        s = w.state
+        row.update(
+            finished=w.finished,
+            ticks=s.step_count,
+            steps_moved=s.buyer.steps_moved,
+            items=len(s.buyer.cart),
+            spent=round(float(s.cashier.subtotal or 0.0), 2),
+            change=round(s.buyer.change_received, 2),
+            register=s.cashier.register_id or "",
+        )
+    except Exception as e:  # un episodio roto no corta el barrido
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["wall_ms"] = round((time.perf_counter() - t0) * 1e3, 3)
+    return row
+
+
+def _correr_lote(eps: List[Episode]) -> List[Dict[str, Any]]:
+    return [correr_episodio(ep) for ep in eps]
+
+
+def correr_episodios(
+    eps: Sequence[Episode], workers: Optional[int] = None, chunk: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Métricas de cada episodio a medida que terminan (no en orden: usar `id`).
+    Con `workers=1` corre en este proceso.
+    """
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    if not eps:
+        return
+    if workers == 1:
+        # En proceso: apagar bitácora y métricas solo mientras dure el lote
+        prev_env, prev_metrics = os.environ.get("BITACORA"), PATH_METRICS.enabled
+        _init_worker()
+        try:
+            for ep in eps:
+                yield correr_episodio(ep)
+        finally:
+            PATH_METRICS.enabled = prev_metrics
+            if prev_env is None:
+                os.environ.pop("BITACORA", None)
+            else:
+                os.environ["BITACORA"] = prev_env
+        return
+
+    n = chunk or max(1, min(MAX_CHUNK, len(eps) // (workers * CHUNKS_PER_WORKER)))
+    # Lotes contiguos: los episodios ya vienen agrupados por sucursal
+    lotes = [list(eps[k : k + n]) for k in range(0, len(eps), n)]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as ex:
+        pendientes = iter(lotes)
+        en_vuelo = set()
+        # Solo unos lotes en vuelo por worker: el resto se envía a medida que se libera
+        for lote in pendientes:
+            en_vuelo.add(ex.submit(_correr_lote, lote))
+            if len(en_vuelo) >= workers * 2:
+                break
+        while en_vuelo:
+            listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for fut in listos:
+                lote = next(pendientes, None)
+                if lote is not None:
+                    en_vuelo.add(ex.submit(_correr_lote, lote))
+                yield from fut.result()
+
+
+# ---------- Salida ----------
+class MetricsWriter:
+    """Escribe filas de métricas en CSV o JSONL (según extensión; '-' = JSONL por stdout)."""
+
+    def __init__(self, out: str, flush_every: int = 256):
+        self.flush_every = max(1, int(flush_every))
+        self.rows = 0
+        self.path = None if out == "-" else Path(out)
+        self.csv = self.path is not None and self.path.suffix.lower() == ".csv"
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f: IO[str] = self.path.open("w", encoding="utf-8", newline="")
+        else:
+            self._f = sys.stdout
+        self._csv = csv.DictWriter(self._f, fieldnames=FIELDS, extrasaction="ignore") if self.csv else None
+        if self._csv is not None:
+            self._csv.writeheader()
+
+    def escribir(self, row: Dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps({k: row.get(k) for k in FIELDS}, ensure_ascii=False) + "\n")
+        self.rows += 1
+        if self.rows % self.flush_every == 0:
+            self._f.flush()
+
+    def cerrar(self) -> None:
+        if self.path is not None:
+            self._f.close()
+        else:
+            self._f.flush()
+
+    # --- Alias de compatibilidad (inglés) ---
+    def write(self, row: Dict[str, Any]) -> None:
+        return self.escribir(row)
+
+    def close(self) -> None:
+        return self.cerrar()
+
+
+def correr_barrido(
+    eps: Sequence[Episode], out: str, workers: Optional[int] = None, flush_every: int = 256
+) -> Dict[str, Any]:
+    """Corre `eps` escribiendo cada fila en `out`; devuelve un resumen del barrido."""
+    w = MetricsWriter(out, flush_every)
+    t0 = time.perf_counter()
+    n = terminados = errores = 0
+    try:
+        for row in correr_episodios(eps, workers):
+            w.escribir(row)
+            n += 1
+            terminados += bool(row.get("finished"))
+            errores += bool(row.get("error"))
+    finally:
+        w.cerrar()
+    dt = time.perf_counter() - t0
+    return {
+        "episodes": n,
+        "finished": terminados,
+        "errors": errores,
+        "seconds": round(dt, 2),
+        "episodes_per_s": round(n / dt, 1) if dt > 0 else None,
+        "out": out,
+    }
+
+
+# --- Alias de compatibilidad (inglés) ---
+def branches(names: Optional[Sequence[str]] = None) -> List[str]:
+    return sucursales(names)
+
+
+def episodes(
+    branches: Sequence[str],
+    vouchers: Sequence[float],
+    algos: Sequence[str],
+    seeds: Sequence[int] = (0,),
+    max_ticks: int = DEFAULT_MAX_TICKS,
+) -> List[Episode]:
+    return episodios(branches, vouchers, algos, seeds, max_ticks)
+
+
+def section_weights(sections: Iterable[str], seed: int) -> Dict[str, float]:
+    return pesos_secciones(sections, seed)
+
+
+def run_episode(ep: Episode) -> Dict[str, Any]:
+    return correr_episodio(ep)
+
+
+def run_episodes(eps: Sequence[Episode], workers: Optional[int] = None, chunk: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    return correr_episodios(eps, workers, chunk)
+
+
+def run_sweep(eps: Sequence[Episode], out: str, workers: Optional[int] = None) -> Dict[str, Any]:
+    return correr_barrido(eps, out, workers)
+
+
+def _default_out() -> Path:
+    return Path(__file__).resolve().parents[1] / "logs" / "batch_episodes.csv"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Episodios de World en lote (sin HTTP), en paralelo")
+    ap.add_argument("--branches", nargs="*", default=None, help="nombres o rutas (default: data/Hipermaxi_*.json)")
+    ap.add_argument("--vouchers", nargs="*", type=float, default=[20, 60, 120, 500])
+    ap.add_argument("--voucher-range", nargs=3, type=float, metavar=("MIN", "MAX", "STEP"), default=None)
+    ap.add_argument("--algos", nargs="*", default=["bfs", "astar"])
+    ap.add_argument("--seeds", nargs="*", type=int, default=[0])
+    ap.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--out", default=str(_default_out()), help=".csv, .jsonl o '-' (stdout)")
+    args = ap.parse_args(argv)
+
+    vouchers: Iterable[float] = args.vouchers
+    if args.voucher_range:
+        lo, hi, paso = args.voucher_range
+        cuantos = int((hi - lo) / paso + 1e-9) + 1 if paso > 0 else 1
+        vouchers = [round(lo + k * paso, 2) for k in range(cuantos)]
+    eps = episodios(sucursales(args.branches), list(vouchers), args.algos, args.seeds, args.max_ticks)
+    print(f"{len(eps)} episodios -> {args.out}", file=sys.stderr)
+    print(json.dumps(correr_barrido(eps, args.out, args.workers)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark de pathfinding sobre todas las sucursales y grids sintéticos grandes.
+
+Uso (desde backend/):
+    python -m app.benchmark
+    python -m app.benchmark --queries 100 --sizes 200 500 --algos astar jps hpa
+    python -m app.benchmark --out logs/bench_pathfinding.json
+    python -m app.benchmark --sizes 1000 --maps ../data/synthetic/*.json
+
+Por cada (mapa, algoritmo) corre el mismo conjunto de consultas inicio/meta
+(sembrado con --seed) y reporta tiempo, nodos expandidos, inserciones y pico
+de la frontera, memoria pico y largo de ruta. El resultado se guarda en JSON para comparar entre commits.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .data_loader import _project_root, load_map, parse_map
+from .mapgen import generar_mapa
+from .models import Grid, Pos
+from .pathfinding import available_algorithms, compile_grid, find_path_with_stats
+
+
+Query = Tuple[Pos, Pos]
+
+DEFAULT_SIZES = [200, 500]
+
+
+def _default_out() -> Path:
+    return Path(__file__).resolve().parents[1] / "logs" / "bench_pathfinding.json"
+
+
+def grid_sintetico(size: int, seed: int = 0) -> Grid:
+    """Grid del supermercado sintético cuadrado de `mapgen` (sembrado)."""
+    return parse_map(generar_mapa(size, size, seed)).grid
+
+
+def mapas(sizes: List[int], seed: int, files: Optional[List[Path]] = None) -> List[Tuple[str, Grid]]:
+    out: List[Tuple[str, Grid]] = []
+    for f in sorted((_project_root() / "data").glob("Hipermaxi_*.json")):
+        out.append((f.stem, load_map(f).grid))
+    for f in files or []:
+        out.append((Path(f).stem, load_map(Path(f)).grid))
+    for n in sizes:
+        out.append((f"synthetic_{n}x{n}", grid_sintetico(n, seed)))
+    return out
+
+
+def consultas(grid: Grid, n: int, seed: int) -> List[Query]:
+    """`n` pares (inicio, meta) sobre celdas caminables, reproducibles con `seed`."""
+    cg = compile_grid(grid)
+    libres = [c for c in range(cg.size) if cg.walk[c]]
+    rng = random.Random(seed)
+    return [(cg.pos(rng.choice(libres)), cg.pos(rng.choice(libres))) for _ in range(n)]
+
+
+def medir(algo: str, grid: Grid, qs: List[Query], optimos: Optional[List[int]] = None) -> Dict[str, Any]:
+    tiempos: List[float] = []
+    expandidos: List[int] = []
+    pushes: List[int] = []
+    picos: List[int] = []
+    largos: List[int] = []
+    encontrados = 0
+    suboptimas = 0
+
+    # Calentamiento: estructuras perezosas (grafo jerárquico, etc.) fuera de la medición
+    if qs:
+        find_path_with_stats(algo, grid, *qs[0])
+
+    for i, (a, b) in enumerate(qs):
+        t0 = time.perf_counter()
+        path, stats = find_path_with_stats(algo, grid, a, b)
+        tiempos.append(time.perf_counter() - t0)
+        expandidos.append(stats.expanded)
+        pushes.append(stats.pushes)
+        picos.append(stats.peak_frontier)
+        if path:
+            encontrados += 1
+            largos.append(len(path) - 1)
+            if optimos is not None and len(path) - 1 > optimos[i]:
+                suboptimas += 1
+
+    # Memoria pico en una segunda pasada (tracemalloc distorsiona los tiempos)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for a, b in qs:
+        find_path_with_stats(algo, grid, a, b)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiempos_ms = sorted(t * 1e3 for t in tiempos)
+    return {
+        "algo": algo,
+        "queries": len(qs),
+        "found": encontrados,
+        "suboptimal": suboptimas,
+        "wall_ms_total": round(sum(tiempos_ms), 3),
+        "wall_ms_mean": round(statistics.fmean(tiempos_ms), 4) if tiempos_ms else 0.0,
+        "wall_ms_p95": round(tiempos_ms[int(0.95 * (len(tiempos_ms) - 1))], 4) if tiempos_ms else 0.0,
+        "expanded_total": sum(expandidos),
+        "expanded_mean": round(statistics.fmean(expandidos), 2) if expandidos else 0.0,
+        "pushes_mean": round(statistics.fmean(pushes), 2) if pushes else 0.0,
+        "peak_frontier_max": max(picos, default=0),
+        "peak_kb": round(peak / 1024, 1),
+        "path_len_mean": round(statistics.fmean(largos), 2) if largos else 0.0,
+    }
+
+
+def correr(
+    algos: Optional[List[str]] = None,
+    sizes: Optional[List[int]] = None,
+    queries: int = 50,
+    seed: int = 1,
+    files: Optional[List[Path]] = None,
+) -> Dict[str, Any]:
+    algos = algos or available_algorithms()
+    sizes = DEFAULT_SIZES if sizes is None else sizes
+    resultados: List[Dict[str, Any]] = []
+
+    for nombre, grid in mapas(sizes, seed, files):
+        qs = consultas(grid, queries, seed)
+        # Referencia óptima (BFS) para marcar rutas subóptimas (p.ej. hpa)
+        optimos = [len(find_path_with_stats("bfs", grid, a, b)[0]) - 1 for a, b in qs]
+        for algo in algos:
+            fila = {"map": nombre, "width": grid.width, "height": grid.height}
+            fila.update(medir(algo, grid, qs, optimos))
+            resultados.append(fila)
+            print(
+                f"{nombre:32s} {fila['algo']:10s} mean={fila['wall_ms_mean']:9.3f}ms "
+                f"exp={fila['expanded_mean']:10.1f} peak={fila['peak_kb']:9.1f}KB len={fila['path_len_mean']:.1f}"
+            )
+
+    return {
+        "meta": {
+            "ts": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "seed": seed,
+            "queries": queries,
+            "sizes": sizes,
+            "maps": [str(f) for f in files or []],
+            "algos": algos,
+        },
+        "results": resultados,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de algoritmos de pathfinding")
+    ap.add_argument("--algos", nargs="*", default=None, help="algoritmos (default: todos)")
+    ap.add_argument("--sizes", nargs="*", type=int, default=None, help="lados de grids sintéticos")
+    ap.add_argument("--maps", nargs="*", type=Path, default=None, help="mapas JSON extra (p.ej. de app.mapgen)")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", type=Path, default=_default_out())
+    args = ap.parse_args(argv)
+
+    report = correr(algos=args.algos, sizes=args.sizes, queries=args.queries, seed=args.seed, files=args.maps)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,8 +16,15 @@ def _default_path() -> Path:
     return Path(__file__).resolve().parents[2] / "data" / "bitacora.jsonl"
 
 
+def enabled() -> bool:
+    """La bitácora se desactiva con BITACORA=0 (p.ej. corridas en lote)."""
+    return os.getenv("BITACORA", "1") != "0"
+
+
 def write_event(event: Dict[str, Any]) -> None:
     """Escribe un evento en una bitácora JSONL (1 línea = 1 evento)."""
+    if not enabled():
+        return
     try:
         path = _default_path()
         path.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,228 @@
+"""
+Componentes conexos del grid (4-conexo) para descartar metas inalcanzables en O(1).
+
+- `label[c]`: componente de la celda c (-1 si está bloqueada).
+- Se calcula al cargar el mapa y se cachea en `CompiledGrid.derived`.
+- Los parches se aplican en forma incremental a partir de `cg.changes_since`:
+  - abrir una celda une los componentes vecinos (se reetiquetan los más chicos);
+  - cerrar una celda solo reetiqueta si partió su componente; si sus vecinos
+    siguen unidos por el anillo de 8 celdas alrededor, es O(1).
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List
+
+from .models import Grid, Pos
+from .pathfinding import CompiledGrid, compile_grid
+
+
+class GridComponents:
+    def __init__(self, cg: CompiledGrid):
+        self.cg = cg
+        self.label = array("i", [-1]) * cg.size
+        self.sizes: Dict[int, int] = {}
+        self._next = 0
+        self._version = -1
+        self._construir()
+
+    # ---------- Construcción ----------
+    def _construir(self) -> None:
+        cg = self.cg
+        self.label = array("i", [-1]) * cg.size
+        self.sizes = {}
+        self._next = 0
+        walk, label = cg.walk, self.label
+        for c in range(cg.size):
+            if walk[c] and label[c] < 0:
+                self._inundar(c, self._nuevo(), -1)
+        self._version = cg.version
+
+    def _nuevo(self) -> int:
+        k = self._next
+        self._next += 1
+        self.sizes[k] = 0
+        return k
+
+    def _inundar(self, c: int, nuevo: int, viejo: int) -> int:
+        """Reetiqueta como `nuevo` todo lo alcanzable desde c con etiqueta `viejo`."""
+        label, nbrs = self.label, self.cg.neighbors
+        label[c] = nuevo
+        pila = [c]
+        n = 1
+        while pila:
+            u = pila.pop()
+            for v in nbrs[u]:
+                if label[v] == viejo:
+                    label[v] = nuevo
+                    pila.append(v)
+                    n += 1
+        self.sizes[nuevo] = self.sizes.get(nuevo, 0) + n
+        if viejo >= 0:
+            self.sizes[viejo] -= n
+            if self.sizes[viejo] <= 0:
+                del self.sizes[viejo]
+        return n
+
+    # ---------- Actualización incremental ----------
+    def _sincronizar(self) -> None:
+        cg = self.cg
+        if self._version == cg.version:
+            return
+        cambios = cg.changes_since(self._version)
+        if cambios is None:
+            self._construir()
+            return
+        cambios = list(dict.fromkeys(cambios))
+        # Primero los cierres (agrupados por componente): así ninguna celda ya
+        # bloqueada conserva etiqueta cuando las aperturas unen componentes
+        cerrados: Dict[int, List[int]] = {}
+        for c in cambios:
+            k = self.label[c]
+            if not cg.walk[c] and k >= 0:
+                cerrados.setdefault(k, []).append(c)
+                self.label[c] = -1
+                self.sizes[k] -= 1
+                if self.sizes[k] <= 0:
+                    del self.sizes[k]
+        for k, celdas in cerrados.items():
+            if len(celdas) == 1:
+                self._cerrar(celdas[0], k)
+            else:
+                # Varias celdas de un mismo componente pueden cortarlo entre todas
+                self._partir(k, celdas)
+        for c in cambios:
+            if cg.walk[c] and self.label[c] < 0:
+                self._abrir(c)
+        self._version = cg.version
+
+    def _abrir(self, c: int) -> None:
+        vecinos = {self.label[v] for v in self.cg.neighbors[c] if self.label[v] >= 0}
+        if not vecinos:
+            k = self._nuevo()
+            self.label[c] = k
+            self.sizes[k] = 1
+            return
+        # El componente más grande se queda con su etiqueta; los demás se le suman
+        k = max(vecinos, key=lambda j: self.sizes[j])
+        self.label[c] = k
+        self.sizes[k] += 1
+        # Desde cada vecino: dos trozos con la misma etiqueta pueden estar unidos
+        # solo a través de c (un cierre del mismo lote contó con esta apertura)
+        for v in self.cg.neighbors[c]:
+            j = self.label[v]
+            if j >= 0 and j != k:
+                self._inundar(v, k, j)
+
+    def _anillo_conecta(self, c: int) -> bool:
+        """True si los vecinos caminables de c siguen unidos por el anillo de 8 celdas."""
+        cg = self.cg
+        w, x, y = cg.width, cg.xs[c], cg.ys[c]
+        # Anillo en orden cíclico: consecutivos son 4-adyacentes
+        anillo = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+        libre = [
+            0 <= x + dx < w and 0 <= y + dy < cg.height and bool(cg.walk[(y + dy) * w + x + dx])
+            for dx, dy in anillo
+        ]
+        if all(libre):
+            return True
+        # Tramos de celdas libres consecutivas (cíclico), empezando tras una ocupada
+        inicio = libre.index(False)
+        tramos_con_vecino = 0
+        en_tramo = tiene_vecino = False
+        for k in range(1, 9):
+            i = (inicio + k) % 8
+            if libre[i]:
+                en_tramo = True
+                tiene_vecino = tiene_vecino or i % 2 == 0  # pares = N, E, S, O
+            elif en_tramo:
+                tramos_con_vecino += tiene_vecino
+                en_tramo = tiene_vecino = False
+        return tramos_con_vecino <= 1
+
+    def _cerrar(self, c: int, viejo: int) -> None:
+        """Única celda cerrada de su componente (ya sin etiqueta)."""
+        vecinos = [v for v in self.cg.neighbors[c] if self.label[v] == viejo]
+        if len(vecinos) <= 1 or self._anillo_conecta(c):
+            return
+        # Posible corte: cada vecino que siga con la etiqueta vieja arma un componente nuevo
+        for v in vecinos[1:]:
+            if self.label[v] == viejo:
+                self._inundar(v, self._nuevo(), viejo)
+
+    def _partir(self, viejo: int, celdas: List[int]) -> None:
+        """Reetiqueta lo que queda de `viejo` desde los vecinos de las celdas cerradas."""
+        for c in celdas:
+            for v in self.cg.neighbors[c]:
+                if self.label[v] == viejo:
+                    self._inundar(v, self._nuevo(), viejo)
+
+    # ---------- Consultas ----------
+    def componente(self, p: Pos) -> int:
+        """Componente de `p` (-1 si está bloqueada o fuera del grid)."""
+        self._sincronizar()
+        c = self.cg.cell_id(p)
+        return self.label[c] if c >= 0 else -1
+
+    def conectados_ids(self, s: int, t: int) -> bool:
+        """
+        True si existe ruta de s a t. Si s está bloqueada (agente parado sobre una
+        celda recién bloqueada) vale salir por cualquier vecino caminable.
+        """
+        self._sincronizar()
+        label = self.label
+        lt = label[t]
+        if s == t:
+            return True
+        if lt < 0:
+            return False
+        if label[s] >= 0:
+            return label[s] == lt
+        return any(label[v] == lt for v in self.cg.neighbors[s])
+
+    def conectados(self, a: Pos, b: Pos) -> bool:
+        s, t = self.cg.cell_id(a), self.cg.cell_id(b)
+        if s < 0 or t < 0:
+            return False
+        return self.conectados_ids(s, t)
+
+    def cantidad(self) -> int:
+        self._sincronizar()
+        return len(self.sizes)
+
+    # --- Alias de compatibilidad (inglés) ---
+    def component(self, p: Pos) -> int:
+        return self.componente(p)
+
+    def connected(self, a: Pos, b: Pos) -> bool:
+        return self.conectados(a, b)
+
+    def count(self) -> int:
+        return self.cantidad()
+
+
+def componentes_de(cg: CompiledGrid) -> GridComponents:
+    comp = cg.derived.get("components")
+    if comp is None:
+        comp = GridComponents(cg)
+        cg.derived["components"] = comp
+    return comp
+
+
+def componentes(grid: Grid) -> GridComponents:
+    """Componentes del grid (se calculan una vez y se mantienen con los parches)."""
+    return componentes_de(compile_grid(grid))
+
+
+def alcanzable(grid: Grid, a: Pos, b: Pos) -> bool:
+    """Consulta O(1): ¿hay ruta caminando de `a` a `b`?"""
+    return componentes(grid).conectados(a, b)
+
+
+# --- Alias de compatibilidad (inglés) ---
+def components(grid: Grid) -> GridComponents:
+    return componentes(grid)
+
+
+def reachable(grid: Grid, a: Pos, b: Pos) -> bool:
+    return alcanzable(grid, a, b)
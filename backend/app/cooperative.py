@@ -0,0 +1,396 @@
+"""
+Pathfinding cooperativo multi-agente: A* espacio-tiempo con ventana (WHCA*,
+Silver 2005) sobre una tabla de reservas (celda, tick).
+
+- Cada agente sigue una ruta guía estática (`find_path`, cacheada) y solo
+  resuelve los choques con los demás dentro de una ventana de `window` ticks:
+  A* sobre estados (celda, tick) con movimientos 4-conexos + esperar, que
+  respeta las celdas y los cruces (intercambios) ya reservados.
+- Al planificar, el agente reserva su ventana y además "estaciona" la última
+  celda hasta su próxima replanificación; así esperar en el lugar siempre es
+  válido y dos agentes nunca ocupan la misma celda ni se cruzan.
+- Solo replanifica quien lo necesita: el que agotó media ventana, el que
+  cambió de meta y aquellos cuyas reservas toca un cambio del grid.
+
+Uso (desde backend/), prueba de carga con N compradores en un mapa sintético:
+    python -m app.cooperative --buyers 300 --size 200 --ticks 300
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .models import Grid, Pos
+from .pathfinding import CompiledGrid, SearchStats, compile_grid, find_path
+
+
+DEFAULT_WINDOW = 16
+
+
+@dataclass(slots=True)
+class CoopAgent:
+    id: str
+    cell: int
+    goal: int
+    # plan[i] = celda en el tick plan_t0 + i (plan[0] = celda al planificar)
+    plan: List[int] = field(default_factory=list)
+    plan_t0: int = 0
+    # Ruta guía estática (ids) e índice celda -> posición en ella
+    guide: List[int] = field(default_factory=list)
+    guide_index: Dict[int, int] = field(default_factory=dict)
+    # Avance sobre la guía (-1 = sin guía); sirve también si el agente se desvió
+    guide_pos: int = -1
+    replan: bool = True
+    waits: int = 0
+    replans: int = 0
+
+
+class ReservationTable:
+    """
+    Reservas espacio-tiempo: (celda, tick) -> agente, cruces (a, b, tick) ->
+    agente (moverse de a a b entre tick y tick+1) y celdas "estacionadas"
+    (ocupadas por un agente desde un tick en adelante, sin fin).
+    """
+
+    def __init__(self) -> None:
+        self.cells: Dict[Tuple[int, int], str] = {}
+        self.edges: Dict[Tuple[int, int, int], str] = {}
+        self.parked: Dict[int, Tuple[str, int]] = {}
+        # Por celda: ticks reservados (para saber si se puede estacionar ahí)
+        self._ticks: Dict[int, Set[int]] = {}
+
+    def ocupada(self, c: int, t: int, quien: str) -> bool:
+        otro = self.cells.get((c, t))
+        if otro is not None and otro != quien:
+            return True
+        p = self.parked.get(c)
+        return p is not None and p[0] != quien and t >= p[1]
+
+    def cruce_ocupado(self, a: int, b: int, t: int, quien: str) -> bool:
+        """True si otro agente va de b a a entre t y t+1 (intercambio)."""
+        otro = self.edges.get((b, a, t))
+        return otro is not None and otro != quien
+
+    def se_puede_estacionar(self, c: int, t: int, quien: str) -> bool:
+        """True si nadie más usa la celda `c` desde el tick `t` en adelante."""
+        p = self.parked.get(c)
+        if p is not None and p[0] != quien:
+            return False
+        for tt in self._ticks.get(c, ()):
+            if tt >= t and self.cells.get((c, tt)) != quien:
+                return False
+        return True
+
+    def reservar(self, agente: CoopAgent) -> None:
+        t0, plan = agente.plan_t0, agente.plan
+        for i, c in enumerate(plan):
+            self.cells[(c, t0 + i)] = agente.id
+            self._ticks.setdefault(c, set()).add(t0 + i)
+            if i:
+                self.edges[(plan[i - 1], c, t0 + i - 1)] = agente.id
+        self.parked[plan[-1]] = (agente.id, t0 + len(plan) - 1)
+
+    def liberar(self, agente: CoopAgent, desde: int) -> None:
+        """Quita las reservas del agente a partir del tick `desde` (y su estacionamiento)."""
+        t0, plan = agente.plan_t0, agente.plan
+        for i, c in enumerate(plan):
+            t = t0 + i
+            if t < desde:
+                continue
+            if self.cells.get((c, t)) == agente.id:
+                del self.cells[(c, t)]
+                ts = self._ticks.get(c)
+                if ts is not None:
+                    ts.discard(t)
+                    if not ts:
+                        del self._ticks[c]
+            if i and self.edges.get((plan[i - 1], c, t - 1)) == agente.id:
+                del self.edges[(plan[i - 1], c, t - 1)]
+        if plan:
+            p = self.parked.get(plan[-1])
+            if p is not None and p[0] == agente.id:
+                del self.parked[plan[-1]]
+
+    def olvidar(self, c: int, t: int, quien: str, siguiente: int) -> None:
+        """Borra la reserva (c, t) ya vencida y el cruce c -> siguiente de ese tick."""
+        if self.edges.get((c, siguiente, t)) == quien:
+            del self.edges[(c, siguiente, t)]
+        if self.cells.get((c, t)) == quien:
+            del self.cells[(c, t)]
+            ts = self._ticks.get(c)
+            if ts is not None:
+                ts.discard(t)
+                if not ts:
+                    del self._ticks[c]
+
+
+class CooperativePlanner:
+    """
+    Planificador WHCA* para muchos agentes sobre un mismo grid.
+
+    `agregar(id, inicio, meta)`, `asignar_meta(id, meta)`, `quitar(id)` y
+    `paso()` (avanza un tick y devuelve los agentes que llegaron a su meta).
+    Las posiciones actuales están en `posiciones()`.
+    """
+
+    def __init__(self, grid: Grid, window: int = DEFAULT_WINDOW, algo: str = "astar"):
+        self.grid = grid
+        self.cg: CompiledGrid = compile_grid(grid)
+        self.window = max(2, int(window))
+        self.algo = algo
+        self.t = 0
+        self.agents: Dict[str, CoopAgent] = {}
+        self.table = ReservationTable()
+        self.stats = SearchStats()
+        self.replans = 0
+        self.waits = 0
+
+    # ---------- Agentes ----------
+    def agregar(self, agent_id: str, start: Pos, goal: Pos) -> None:
+        s = self.cg.cell_id(start)
+        if s < 0:
+            raise ValueError(f"start out of grid: {start}")
+        if self.table.ocupada(s, self.t, agent_id):
+            raise ValueError(f"start cell already taken: {start}")
+        a = CoopAgent(id=agent_id, cell=s, goal=self.cg.cell_id(goal), plan=[s], plan_t0=self.t)
+        self.agents[agent_id] = a
+        self.table.reservar(a)
+
+    def asignar_meta(self, agent_id: str, goal: Pos) -> None:
+        a = self.agents[agent_id]
+        a.goal = self.cg.cell_id(goal)
+        a.guide = []
+        a.guide_index = {}
+        a.guide_pos = -1
+        a.replan = True
+
+    def quitar(self, agent_id: str) -> None:
+        a = self.agents.pop(agent_id, None)
+        if a is not None:
+            self.table.liberar(a, self.t)
+
+    def posiciones(self) -> Dict[str, Pos]:
+        return {aid: self.cg.pos(a.cell) for aid, a in self.agents.items()}
+
+    def actualizar_celdas(self, celdas: Iterable[Pos]) -> List[str]:
+        """Marca para replanificar a los agentes cuyas reservas o guías tocan `celdas`."""
+        ids = {self.cg.cell_id(p) for p in celdas}
+        tocados: List[str] = []
+        for a in self.agents.values():
+            if ids.intersection(a.plan) or ids.intersection(a.guide_index):
+                a.guide = []
+                a.guide_index = {}
+                a.guide_pos = -1
+                a.replan = True
+                tocados.append(a.id)
+        return tocados
+
+    # ---------- Planificación ----------
+    def _guia(self, a: CoopAgent) -> None:
+        path = find_path(self.algo, self.grid, self.cg.pos(a.cell), self.cg.pos(a.goal))
+        a.guide = [self.cg.cell_id(p) for p in path]
+        a.guide_index = {c: i for i, c in enumerate(a.guide)}
+        a.guide_pos = 0 if a.guide else -1
+
+    def _planificar(self, a: CoopAgent) -> None:
+        """A* espacio-tiempo desde la celda actual hacia un punto de la guía a `window` pasos."""
+        table, t0 = self.table, self.t
+        table.liberar(a, t0)
+        a.replan = False
+        a.replans += 1
+        self.replans += 1
+
+        if a.goal < 0:
+            a.plan, a.plan_t0 = [a.cell], t0
+            table.reservar(a)
+            return
+        # La guía se calcula una vez por meta; si el agente se desvió para
+        # esquivar a otros, se sigue desde el último avance conocido.
+        if a.guide_pos < 0:
+            self._guia(a)
+        if a.guide_pos < 0:
+            # Meta inalcanzable: quedarse quieto
+            a.plan, a.plan_t0 = [a.cell], t0
+            table.reservar(a)
+            return
+
+        k = min(a.guide_index.get(a.cell, a.guide_pos) + self.window, len(a.guide) - 1)
+        wp = a.guide[k]
+        xs, ys = self.cg.xs, self.cg.ys
+        wx, wy = xs[wp], ys[wp]
+        nbrs = self.cg.neighbors
+        limite = 2 * self.window
+
+        start = a.cell
+        h0 = abs(xs[start] - wx) + abs(ys[start] - wy)
+        counter = 0
+        heap: List[Tuple[int, int, int, int, int]] = [(h0, h0, counter, start, 0)]
+        parent: Dict[Tuple[int, int], Tuple[int, int]] = {(start, 0): (-1, -1)}
+        closed: Set[Tuple[int, int]] = set()
+        fin: Optional[Tuple[int, int]] = None
+        pops = 0
+        peak = 1
+
+        while heap:
+            _, _, _, c, dt = heapq.heappop(heap)
+            pops += 1
+            if (c, dt) in closed:
+                continue
+            closed.add((c, dt))
+            t = t0 + dt
+            # Terminal: llegó al punto de la guía o se acabó el horizonte, y
+            # la celda queda libre para estacionarse.
+            if (c == wp or dt == limite) and table.se_puede_estacionar(c, t, a.id):
+                fin = (c, dt)
+                break
+            if dt == limite:
+                continue
+            for nb in nbrs[c] + (c,):
+                if table.ocupada(nb, t + 1, a.id):
+                    continue
+                if nb != c and table.cruce_ocupado(c, nb, t, a.id):
+                    continue
+                key = (nb, dt + 1)
+                if key in parent:
+                    continue
+                parent[key] = (c, dt)
+                h = abs(xs[nb] - wx) + abs(ys[nb] - wy)
+                counter += 1
+                heapq.heappush(heap, (dt + 1 + h, h, counter, nb, dt + 1))
+            if len(heap) > peak:
+                peak = len(heap)
+
+        self.stats.sumar(len(closed), counter + 1, pops, peak)
+
+        if fin is None:
+            # Sin salida por ahora: esperar (la celda propia sigue reservada)
+            a.plan, a.plan_t0 = [a.cell], t0
+            a.waits += 1
+            self.waits += 1
+            table.reservar(a)
+            return
+
+        plan: List[int] = []
+        node = fin
+        while node[0] != -1:
+            plan.append(node[0])
+            node = parent[node]
+        plan.reverse()
+        a.plan, a.plan_t0 = plan, t0
+        a.guide_pos = max([a.guide_pos] + [a.guide_index[c] for c in plan if c in a.guide_index])
+        table.reservar(a)
+
+    def _necesita_replan(self, a: CoopAgent) -> bool:
+        if a.replan:
+            return True
+        if a.cell == a.goal:
+            return False
+        restante = a.plan_t0 + len(a.plan) - 1 - self.t
+        return restante < self.window // 2
+
+    # ---------- Tick ----------
+    def paso(self) -> List[str]:
+        """Replanifica solo a quien lo necesita, avanza un tick y devuelve quién llegó."""
+        for a in sorted(self.agents.values(), key=lambda a: a.id):
+            if self._necesita_replan(a):
+                self._planificar(a)
+
+        self.t += 1
+        llegaron: List[str] = []
+        for a in self.agents.values():
+            i = self.t - a.plan_t0
+            prev = a.cell
+            if 0 < i < len(a.plan):
+                a.cell = a.plan[i]
+            # la reserva del tick anterior ya no sirve
+            self.table.olvidar(prev, self.t - 1, a.id, a.cell)
+            if a.cell == a.goal and prev != a.goal:
+                llegaron.append(a.id)
+        return llegaron
+
+    def resumen(self) -> Dict[str, int]:
+        return {
+            "tick": self.t,
+            "agents": len(self.agents),
+            "replans": self.replans,
+            "waits": self.waits,
+            "reserved_cells": len(self.table.cells),
+            "expanded": self.stats.expanded,
+        }
+
+    # --- Alias de compatibilidad (inglés) ---
+    def add(self, agent_id: str, start: Pos, goal: Pos) -> None:
+        return self.agregar(agent_id, start, goal)
+
+    def set_goal(self, agent_id: str, goal: Pos) -> None:
+        return self.asignar_meta(agent_id, goal)
+
+    def remove(self, agent_id: str) -> None:
+        return self.quitar(agent_id)
+
+    def positions(self) -> Dict[str, Pos]:
+        return self.posiciones()
+
+    def update_cells(self, cells: Iterable[Pos]) -> List[str]:
+        return self.actualizar_celdas(cells)
+
+    def step(self) -> List[str]:
+        return self.paso()
+
+    def summary(self) -> Dict[str, int]:
+        return self.resumen()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .data_loader import parse_map
+    from .mapgen import generar_mapa
+
+    ap = argparse.ArgumentParser(description="Prueba de carga del planificador cooperativo")
+    ap.add_argument("--buyers", type=int, default=300)
+    ap.add_argument("--size", type=int, default=200)
+    ap.add_argument("--ticks", type=int, default=300)
+    ap.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    md = parse_map(generar_mapa(args.size, args.size, args.seed))
+    rng = random.Random(args.seed)
+    picks = list(dict.fromkeys(p.pick for p in md.products.values()))
+    cg = compile_grid(md.grid)
+    libres = [cg.pos(c) for c in range(cg.size) if cg.walk[c]]
+
+    coop = CooperativePlanner(md.grid, window=args.window)
+    for i, start in enumerate(rng.sample(libres, args.buyers)):
+        coop.agregar(f"B{i}", start, rng.choice(picks))
+
+    choques = 0
+    llegadas = 0
+    prev = coop.posiciones()
+    t0 = time.perf_counter()
+    for _ in range(args.ticks):
+        for aid in coop.paso():
+            llegadas += 1
+            coop.asignar_meta(aid, rng.choice(picks))
+        pos = coop.posiciones()
+        choques += len(pos) - len(set(pos.values()))
+        # intercambios: a va donde estaba b y b donde estaba a
+        quien_estaba = {p: aid for aid, p in prev.items()}
+        choques += sum(
+            1 for aid, p in pos.items()
+            if p != prev[aid] and (b := quien_estaba.get(p)) is not None and b != aid and pos[b] == prev[aid]
+        ) // 2
+        prev = pos
+    dt = time.perf_counter() - t0
+
+    print(
+        f"{args.buyers} compradores, {args.ticks} ticks en {args.size}x{args.size}: "
+        f"{dt / args.ticks * 1e3:.2f} ms/tick, llegadas={llegadas}, choques={choques}, {coop.resumen()}"
+    )
+
+
+if __name__ == "__main__":
+    main()
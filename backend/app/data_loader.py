@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import json
+import threading
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict
 
 from .models import Grid, MapData, Pos, Rect, Register, Product, Section, Shelf
+from .components import componentes
+from .distances import GoalFields, PoiDistances
 
 
 def _project_root() -> Path:
@@ -17,7 +20,32 @@ def load_map(map_path: Path | None = None) -> MapData:
         map_path = _project_root() / "data" / "Hipermaxi_El_Prado.json"
 
     data = json.loads(Path(map_path).read_text(encoding="utf-8"))
+    return parse_map(data)
 
+
+_SHARED_MAPS: Dict[str, MapData] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def load_shared_map(map_path: Path | None = None) -> MapData:
+    """
+    Mapa compartido de solo lectura: se carga una vez por archivo y proceso, y
+    todas las sesiones usan el mismo objeto (y sus distancias, campos y
+    componentes ya calculados). Para parchearlo, usar `copia_editable()`.
+    """
+    if map_path is None:
+        map_path = _project_root() / "data" / "Hipermaxi_El_Prado.json"
+    key = str(Path(map_path).resolve())
+    with _SHARED_LOCK:
+        md = _SHARED_MAPS.get(key)
+        if md is None:
+            md = load_map(Path(key))
+            _SHARED_MAPS[key] = md
+        return md
+
+
+def parse_map(data: Dict[str, Any]) -> MapData:
+    """Construye MapData desde el JSON de un mapa ya leído (mismo esquema que data/*.json)."""
     width = int(data["grid"]["width"])
     height = int(data["grid"]["height"])
     grid = Grid(width=width, height=height, walkable=[[True for _ in range(width)] for _ in range(height)])
@@ -69,12 +97,17 @@ def load_map(map_path: Path | None = None) -> MapData:
         # Pick points must be walkable
         grid.set_blocked(prod.pick, False)
 
+    # Costos opcionales por zona: [{"rect": {...}, "cost": 3}, ...]
+    for z in data.get("costs", []):
+        for cell in Rect(**z["rect"]).iter_cells():
+            grid.set_cost(cell, int(z["cost"]))
+
     entrance = Pos(**data["entrance"])
     exit_ = Pos(**data["exit"])
     grid.set_blocked(entrance, False)
     grid.set_blocked(exit_, False)
 
-    return MapData(
+    md = MapData(
         name=data["meta"]["name"],
         city=data["meta"]["city"],
         grid=grid,
@@ -86,6 +119,14 @@ def load_map(map_path: Path | None = None) -> MapData:
         products=products
     )
 
+    # Componentes conexos (metas inalcanzables se descartan en O(1)), un BFS
+    # por punto de interés (picks, colas, entrada, salida) y un BFS inverso por
+    # meta compartida (salida, colas de caja)
+    componentes(md.grid)
+    md.distances = PoiDistances(md)
+    md.fields = GoalFields(md)
+    return md
+
 def _project_root() -> Path:
     # Ajusta si tu estructura difiere:
     # backend/app/data_loader.py -> backend/app -> backend -> project_root
@@ -0,0 +1,473 @@
+from __future__ import annotations
+
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .models import MapData, Pos, Register
+from .pathfinding import (
+    OPTIMAL_ALGOS,
+    PATH_METRICS,
+    WEIGHTED_ALGOS,
+    CompiledGrid,
+    SearchStats,
+    canonical_algo,
+    compile_grid,
+    find_path,
+)
+
+
+# Si (#puntos x #celdas) supera este valor, las filas se calculan bajo demanda
+# en lugar de hacerlo todo al cargar el mapa (mapas sintéticos enormes).
+EAGER_MAX_CELLS = 20_000_000
+
+# Algoritmos cuyo árbol de búsqueda coincide con el de un BFS completo
+# (costo unitario + desempate FIFO): sus rutas se pueden servir desde la tabla.
+BFS_TREE_ALGOS = ("bfs", "dijkstra", "dial")
+
+
+def points_of_interest(md: MapData) -> List[Pos]:
+    """Entrada, salida, colas de caja y puntos pick (sin repetir, orden estable)."""
+    pts: List[Pos] = [md.entrance, md.exit]
+    pts.extend(r.queue_spot for r in md.registers.values())
+    pts.extend(p.pick for p in md.products.values())
+    return list(dict.fromkeys(pts))
+
+
+class PoiDistances:
+    """
+    Matriz de distancias caminando entre puntos de interés de un mapa.
+
+    - Un BFS completo por punto de interés (sobre el grid compilado).
+    - Por cada origen se guarda distancia y predecesor de cada celda, así que
+      distancia y ruta entre dos puntos de interés son una consulta a tabla.
+    - Se invalida sola si cambia la transitabilidad (`grid.walk_version`; los
+      costos por celda no cambian pasos); `invalidar()` la fuerza (p.ej.
+      cuando se mueve un producto). Invalidar solo descarta: cada fila se
+      rehace al consultarla, y la matriz completa al cargar el mapa (`eager`)
+      o cuando alguien la pide (`precalcular`, al planificar una canasta).
+    """
+
+    def __init__(self, map_data: MapData, eager: bool = True):
+        self.map_data = map_data
+        self.points: List[Pos] = []
+        self.index: Dict[Pos, int] = {}
+        self.matrix: List[List[int]] = []
+        self._rows: Dict[int, Tuple[array, array]] = {}
+        self._version = -1
+        self.invalidar()
+        if eager:
+            self.precalcular()
+
+    # ---------- Construcción / invalidación ----------
+    def invalidar(self) -> None:
+        """Descarta filas y matriz (se rehacen bajo demanda) y vuelve a tomar los puntos de interés del mapa."""
+        md = self.map_data
+        self.points = points_of_interest(md)
+        self.index = {p: i for i, p in enumerate(self.points)}
+        self._rows = {}
+        self.matrix = []
+        self._version = md.grid.walk_version
+
+    def precalcular(self) -> bool:
+        """
+        Todas las filas y la matriz, si el mapa entra en EAGER_MAX_CELLS (si ya
+        están, no hace nada). True si la matriz completa está disponible.
+        """
+        self._fresh()
+        if not self.matrix and self.points:
+            cg = compile_grid(self.map_data.grid)
+            if len(self.points) * cg.size > EAGER_MAX_CELLS:
+                return False
+            for i in range(len(self.points)):
+                self._row(i)
+            self._build_matrix()
+        return bool(self.matrix)
+
+    def _fresh(self) -> None:
+        if self._version != self.map_data.grid.walk_version:
+            self.invalidar()
+
+    def _row(self, i: int) -> Tuple[array, array]:
+        row = self._rows.get(i)
+        if row is None:
+            row = self._bfs_completo(self.points[i])
+            self._rows[i] = row
+        return row
+
+    def _bfs_completo(self, src: Pos) -> Tuple[array, array]:
+        cg = compile_grid(self.map_data.grid)
+        dist = array("i", [-1]) * cg.size
+        parent = array("i", [-1]) * cg.size
+        s = cg.cell_id(src)
+        if s < 0:
+            return dist, parent
+
+        nbrs = cg.neighbors
+        dist[s] = 0
+        frontier = [s]
+        d = 0
+        while frontier:
+            d += 1
+            nxt: List[int] = []
+            for cur in frontier:
+                for nb in nbrs[cur]:
+                    if dist[nb] < 0:
+                        dist[nb] = d
+                        parent[nb] = cur
+                        nxt.append(nb)
+            frontier = nxt
+        return dist, parent
+
+    def _build_matrix(self) -> None:
+        cg = compile_grid(self.map_data.grid)
+        ids = [cg.cell_id(p) for p in self.points]
+        self.matrix = []
+        for i in range(len(self.points)):
+            dist, _ = self._rows[i]
+            self.matrix.append([dist[c] if c >= 0 else -1 for c in ids])
+
+    # ---------- Consultas ----------
+    def es_punto(self, p: Pos) -> bool:
+        """True si `p` es un punto de interés del mapa."""
+        self._fresh()
+        return p in self.index
+
+    def distancia(self, a: Pos, b: Pos) -> Optional[int]:
+        """
+        Distancia caminando entre dos puntos de interés.
+        None si alguno no es punto de interés o si b es inalcanzable desde a.
+        """
+        self._fresh()
+        i = self.index.get(a)
+        j = self.index.get(b)
+        if i is None or j is None:
+            return None
+        if self.matrix:
+            d = self.matrix[i][j]
+        else:
+            cg = compile_grid(self.map_data.grid)
+            d = self._row(i)[0][cg.cell_id(b)]
+        return d if d >= 0 else None
+
+    def ruta(self, a: Pos, b: Pos) -> Optional[List[Pos]]:
+        """
+        Ruta (celda a celda, incluyendo extremos) entre dos puntos de interés.
+        None si alguno no es punto de interés; [] si b es inalcanzable.
+        """
+        self._fresh()
+        i = self.index.get(a)
+        if i is None or b not in self.index:
+            return None
+        if a == b:
+            return [a]
+
+        cg = compile_grid(self.map_data.grid)
+        dist, parent = self._row(i)
+        cur = cg.cell_id(b)
+        if dist[cur] < 0:
+            return []
+        ids: List[int] = []
+        while cur != -1:
+            ids.append(cur)
+            cur = parent[cur]
+        ids.reverse()
+        return cg.to_positions(ids)
+
+    def bytes_estimados(self) -> int:
+        """Memoria de filas (distancia + predecesor por celda) y matriz ya calculadas."""
+        filas = sum(d.itemsize * len(d) + p.itemsize * len(p) for d, p in self._rows.values())
+        return filas + 8 * sum(len(r) for r in self.matrix)
+
+    # --- Alias de compatibilidad (inglés) ---
+    def invalidate(self) -> None:
+        return self.invalidar()
+
+    def precompute(self) -> bool:
+        return self.precalcular()
+
+    def is_point(self, p: Pos) -> bool:
+        return self.es_punto(p)
+
+    def distance(self, a: Pos, b: Pos) -> Optional[int]:
+        return self.distancia(a, b)
+
+    def path(self, a: Pos, b: Pos) -> Optional[List[Pos]]:
+        return self.ruta(a, b)
+
+
+def poi_distances(md: MapData) -> PoiDistances:
+    """Devuelve (y cachea en MapData) la matriz de distancias del mapa."""
+    if md.distances is None:
+        md.distances = PoiDistances(md)
+    return md.distances
+
+
+# ---------- Campos de distancia (metas compartidas) ----------
+
+class DistanceField:
+    """
+    Campo de distancias hacia una o varias metas (BFS inverso multi-fuente).
+
+    - `dist[c]`: pasos desde la celda c hasta la meta más cercana (-1 si no llega).
+    - `owner[c]`: índice (en `goals`) de esa meta más cercana.
+    - `offsets` (opcional): costo inicial de cada meta; el campo mide entonces
+      min(pasos hasta la meta + offset), p.ej. cola de caja + tramo a la salida
+      (en ese caso solo tienen sentido `dist`/`owner`, no las rutas).
+    El siguiente paso desde cualquier celda es el vecino con menor distancia.
+    """
+
+    def __init__(self, cg: CompiledGrid, goals: List[Pos], offsets: Optional[List[int]] = None):
+        self.cg = cg
+        self.goals = list(goals)
+        self.dist = array("i", [-1]) * cg.size
+        self.owner = array("i", [-1]) * cg.size
+
+        w, size, walk, xs = cg.width, cg.size, cg.walk, cg.xs
+        # Metas por nivel inicial: cada una entra al BFS cuando llega su nivel
+        por_nivel: Dict[int, List[int]] = {}
+        for i, p in enumerate(self.goals):
+            off = offsets[i] if offsets is not None else 0
+            if off >= 0 and cg.cell_id(p) >= 0:
+                por_nivel.setdefault(off, []).append(i)
+        niveles = sorted(por_nivel, reverse=True)
+
+        frontier: List[int] = []
+        d = niveles[-1] if niveles else 0
+        while frontier or niveles:
+            if niveles and niveles[-1] == d:
+                for i in por_nivel[niveles.pop()]:
+                    c = cg.cell_id(self.goals[i])
+                    if self.dist[c] < 0:
+                        self.dist[c] = d
+                        self.owner[c] = i
+                        if walk[c]:
+                            frontier.append(c)
+            d += 1
+            nxt: List[int] = []
+            for u in frontier:
+                x = xs[u]
+                # Cualquier vecino puede entrar a u (u es caminable); solo se
+                # sigue propagando desde los vecinos caminables.
+                for v in (u + 1 if x + 1 < w else -1, u - 1 if x > 0 else -1, u + w, u - w):
+                    if 0 <= v < size and self.dist[v] < 0:
+                        self.dist[v] = d
+                        self.owner[v] = self.owner[u]
+                        if walk[v]:
+                            nxt.append(v)
+            frontier = nxt
+
+    def distancia(self, p: Pos) -> Optional[int]:
+        c = self.cg.cell_id(p)
+        if c < 0 or self.dist[c] < 0:
+            return None
+        return self.dist[c]
+
+    def meta_mas_cercana(self, p: Pos) -> Optional[int]:
+        """Índice de la meta más cercana caminando desde `p` (None si ninguna llega)."""
+        c = self.cg.cell_id(p)
+        if c < 0 or self.owner[c] < 0:
+            return None
+        return self.owner[c]
+
+    def _siguiente(self, c: int) -> int:
+        dist = self.dist
+        best, nxt = dist[c], -1
+        for nb in self.cg.neighbors[c]:
+            d = dist[nb]
+            if 0 <= d < best:
+                best, nxt = d, nb
+        return nxt
+
+    def siguiente_paso(self, p: Pos) -> Optional[Pos]:
+        """Celda vecina que acerca a la meta (None si ya llegó o no hay ruta)."""
+        c = self.cg.cell_id(p)
+        if c < 0 or self.dist[c] <= 0:
+            return None
+        nxt = self._siguiente(c)
+        return self.cg.pos(nxt) if nxt >= 0 else None
+
+    def ruta_desde(self, p: Pos) -> List[Pos]:
+        """Ruta completa bajando por el campo ([] si la meta no es alcanzable)."""
+        c = self.cg.cell_id(p)
+        if c < 0 or self.dist[c] < 0:
+            return []
+        ids = [c]
+        while self.dist[c] > 0:
+            c = self._siguiente(c)
+            if c < 0:
+                return []
+            ids.append(c)
+        return self.cg.to_positions(ids)
+
+    # --- Alias de compatibilidad (inglés) ---
+    def distance(self, p: Pos) -> Optional[int]:
+        return self.distancia(p)
+
+    def nearest_goal(self, p: Pos) -> Optional[int]:
+        return self.meta_mas_cercana(p)
+
+    def next_step(self, p: Pos) -> Optional[Pos]:
+        return self.siguiente_paso(p)
+
+    def path_from(self, p: Pos) -> List[Pos]:
+        return self.ruta_desde(p)
+
+
+class GoalFields:
+    """
+    Campos de distancia por mapa para las metas que comparten todos los
+    compradores: salida y colas de caja (uno por meta), más un campo
+    multi-fuente de "caja más cercana caminando" para cada celda y otro de
+    "mejor cierre" (cola de caja + tramo cola -> salida).
+    Con `eager` se construyen todos al cargar el mapa; después de un cambio
+    de transitabilidad (`grid.walk_version`; los costos no cambian pasos) se descartan y cada uno se rehace recién cuando se lo consulta.
+    """
+
+    def __init__(self, map_data: MapData, eager: bool = True):
+        self.map_data = map_data
+        self._fields: Dict[Pos, DistanceField] = {}
+        self._cajas: Optional[DistanceField] = None
+        self._cierre: Optional[DistanceField] = None
+        self._registers: List[Register] = []
+        self._version = -1
+        self.invalidar()
+        cg = compile_grid(map_data.grid)
+        if eager and (len(self._registers) + 3) * cg.size <= EAGER_MAX_CELLS:
+            for goal in self.metas():
+                self.campo(goal)
+            self._campo_cajas()
+            self._campo_cierre()
+
+    def invalidar(self) -> None:
+        """Descarta los campos (se rehacen bajo demanda, no acá: un parche no espera BFS de todo el grid)."""
+        md = self.map_data
+        self._fields = {}
+        self._cajas = None
+        self._cierre = None
+        self._registers = list(md.registers.values())
+        self._version = md.grid.walk_version
+
+    def _fresh(self) -> None:
+        if self._version != self.map_data.grid.walk_version:
+            self.invalidar()
+
+    def metas(self) -> List[Pos]:
+        """Metas compartidas del mapa (salida + colas de caja)."""
+        return list(dict.fromkeys([self.map_data.exit] + [r.queue_spot for r in self._registers]))
+
+    def es_meta_compartida(self, p: Pos) -> bool:
+        return p == self.map_data.exit or self.map_data.caja_en_cola(p) is not None
+
+    def campo(self, goal: Pos) -> DistanceField:
+        """Campo de distancias hacia `goal` (se construye una vez por versión de transitabilidad)."""
+        self._fresh()
+        f = self._fields.get(goal)
+        if f is None:
+            f = DistanceField(compile_grid(self.map_data.grid), [goal])
+            self._fields[goal] = f
+        return f
+
+    def _campo_cajas(self) -> DistanceField:
+        if self._cajas is None:
+            cg = compile_grid(self.map_data.grid)
+            self._cajas = DistanceField(cg, [r.queue_spot for r in self._registers])
+        return self._cajas
+
+    def _campo_cierre(self) -> DistanceField:
+        if self._cierre is None:
+            salida = self.campo(self.map_data.exit)
+            colas = [r.queue_spot for r in self._registers]
+            offsets = [-1 if (d := salida.distancia(q)) is None else d for q in colas]
+            self._cierre = DistanceField(compile_grid(self.map_data.grid), colas, offsets)
+        return self._cierre
+
+    def caja_mas_cercana(self, p: Pos) -> Optional[Register]:
+        """Caja cuya cola está más cerca caminando desde `p` (consulta O(1))."""
+        self._fresh()
+        i = self._campo_cajas().meta_mas_cercana(p)
+        return self._registers[i] if i is not None else None
+
+    def mejor_cierre(self, p: Pos) -> Optional[Tuple[int, Register]]:
+        """
+        (pasos, caja) que minimizan p -> cola de caja -> salida (consulta O(1)).
+        None si ninguna caja permite llegar a la salida desde `p`.
+        """
+        self._fresh()
+        f = self._campo_cierre()
+        c = f.cg.cell_id(p)
+        if c < 0 or f.dist[c] < 0:
+            return None
+        return f.dist[c], self._registers[f.owner[c]]
+
+    def bytes_estimados(self) -> int:
+        """Memoria de los campos ya construidos (distancia + meta por celda)."""
+        campos = list(self._fields.values()) + [f for f in (self._cajas, self._cierre) if f is not None]
+        return sum(f.dist.itemsize * len(f.dist) + f.owner.itemsize * len(f.owner) for f in campos)
+
+    # --- Alias de compatibilidad (inglés) ---
+    def invalidate(self) -> None:
+        return self.invalidar()
+
+    def field(self, goal: Pos) -> DistanceField:
+        return self.campo(goal)
+
+    def nearest_register(self, p: Pos) -> Optional[Register]:
+        return self.caja_mas_cercana(p)
+
+    def best_checkout(self, p: Pos) -> Optional[Tuple[int, Register]]:
+        return self.mejor_cierre(p)
+
+
+def goal_fields(md: MapData) -> GoalFields:
+    """Devuelve (y cachea en MapData) los campos de distancia del mapa."""
+    if md.fields is None:
+        md.fields = GoalFields(md)
+    return md.fields
+
+
+def find_route(
+    md: MapData,
+    algo: str,
+    start: Pos,
+    goal: Pos,
+    stats: Optional[SearchStats] = None,
+    goal_kind: Optional[str] = None,
+) -> List[Pos]:
+    """
+    Igual que `find_path`, pero sin buscar cuando no hace falta:
+    - ambos extremos son puntos de interés y el algoritmo produce el árbol BFS:
+      la ruta sale de la tabla precalculada (idéntica a la de la búsqueda);
+    - la meta es compartida (salida / cola de caja) y el algoritmo es óptimo:
+      la ruta baja por el campo de distancias (mismo largo óptimo).
+    Tabla y campos cuentan pasos: con costos por celda, los algoritmos
+    ponderados siempre buscan.
+
+    Cada consulta se registra en PATH_METRICS (por mapa, algoritmo y
+    `goal_kind`); si se pasa `stats` además se acumula ahí.
+    """
+    algo = canonical_algo(algo)
+    st = SearchStats()
+    t0 = time.perf_counter()
+    path = _ruta(md, algo, start, goal, st)
+    st.wall_ms = (time.perf_counter() - t0) * 1e3
+    PATH_METRICS.registrar(md.name, algo, st, goal_kind, start, goal)
+    if stats is not None:
+        stats.acumular(st)
+    return path
+
+
+def _ruta(md: MapData, algo: str, start: Pos, goal: Pos, st: SearchStats) -> List[Pos]:
+    if algo in WEIGHTED_ALGOS and compile_grid(md.grid).weighted:
+        return find_path(algo, md.grid, start, goal, stats=st)
+    if algo in BFS_TREE_ALGOS:
+        path = poi_distances(md).ruta(start, goal)
+        if path is not None:
+            st.source = "table"
+            return path
+    if algo in OPTIMAL_ALGOS:
+        fields = goal_fields(md)
+        if fields.es_meta_compartida(goal):
+            st.source = "field"
+            return fields.campo(goal).ruta_desde(start)
+    return find_path(algo, md.grid, start, goal, stats=st)
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import heapq
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .models import Grid, Pos
+from .pathfinding import CompiledGrid, SearchStats, _reconstruct_ids, compile_grid
+
+
+# Tamaño de cluster por defecto (celdas por lado)
+CLUSTER_SIZE = 16
+
+# Segmentos de borde de este largo o más aportan dos entradas (extremos)
+_SEGMENTO_LARGO = 6
+
+BorderKey = Tuple[int, int, str]  # (cx, cy, "h"|"v")
+Edge = Tuple[int, int]  # (nodo, costo)
+
+
+class HierarchicalGraph:
+    """
+    Grafo abstracto tipo HPA* (Botea et al.) sobre el grid compilado.
+
+    - El grid se divide en clusters de `cluster_size` x `cluster_size`.
+    - En cada borde entre clusters vecinos, cada tramo caminable aporta una o
+      dos entradas (pares de celdas enfrentadas, costo 1 entre ellas).
+    - Dentro de cada cluster las entradas se conectan con su distancia real
+      (BFS limitado al cluster).
+    - Una consulta inserta inicio/meta en su cluster, busca en el grafo
+      abstracto y refina cada tramo con un BFS local (solo esas celdas).
+
+    Las rutas son casi óptimas (típicamente unas pocas celdas más que A*).
+    Los cambios del grid se reparan rehaciendo solo los clusters tocados.
+    """
+
+    def __init__(self, cg: CompiledGrid, cluster_size: int = CLUSTER_SIZE):
+        self.cg = cg
+        self.k = max(2, int(cluster_size))
+        self.ncx = (cg.width + self.k - 1) // self.k
+        self.ncy = (cg.height + self.k - 1) // self.k
+        self._borders: Dict[BorderKey, List[Tuple[int, int]]] = {}
+        self._partners: Dict[int, List[int]] = {}
+        self._intra: Dict[Tuple[int, int], Dict[int, List[Edge]]] = {}
+        self.stats = SearchStats()
+        self._construir()
+
+    # ---------- Construcción ----------
+    def _construir(self) -> None:
+        self._version = self.cg.version
+        self._borders = {}
+        self._partners = {}
+        self._intra = {}
+        for cy in range(self.ncy):
+            for cx in range(self.ncx):
+                if cx + 1 < self.ncx:
+                    self._set_border((cx, cy, "h"))
+                if cy + 1 < self.ncy:
+                    self._set_border((cx, cy, "v"))
+        for cy in range(self.ncy):
+            for cx in range(self.ncx):
+                self._set_intra(cx, cy)
+
+    def _cluster_de(self, c: int) -> Tuple[int, int]:
+        return self.cg.xs[c] // self.k, self.cg.ys[c] // self.k
+
+    def _limites(self, cx: int, cy: int) -> Tuple[int, int, int, int]:
+        k = self.k
+        return cx * k, cy * k, min((cx + 1) * k, self.cg.width), min((cy + 1) * k, self.cg.height)
+
+    def _calc_border(self, key: BorderKey) -> List[Tuple[int, int]]:
+        cx, cy, kind = key
+        cg, k = self.cg, self.k
+        w, walk = cg.width, cg.walk
+        if kind == "h":
+            xa = (cx + 1) * k - 1
+            pares = [(y * w + xa, y * w + xa + 1) for y in range(cy * k, min((cy + 1) * k, cg.height))]
+        else:
+            ya = (cy + 1) * k - 1
+            pares = [(ya * w + x, (ya + 1) * w + x) for x in range(cx * k, min((cx + 1) * k, cg.width))]
+
+        out: List[Tuple[int, int]] = []
+        tramo: List[Tuple[int, int]] = []
+        for a, b in pares + [(-1, -1)]:
+            if a >= 0 and walk[a] and walk[b]:
+                tramo.append((a, b))
+                continue
+            if tramo:
+                if len(tramo) >= _SEGMENTO_LARGO:
+                    out.append(tramo[0])
+                    out.append(tramo[-1])
+                else:
+                    out.append(tramo[len(tramo) // 2])
+                tramo = []
+        return out
+
+    def _set_border(self, key: BorderKey) -> None:
+        for a, b in self._borders.get(key, []):
+            for u, v in ((a, b), (b, a)):
+                self._partners[u].remove(v)
+                if not self._partners[u]:
+                    del self._partners[u]
+        nuevos = self._calc_border(key)
+        self._borders[key] = nuevos
+        for a, b in nuevos:
+            self._partners.setdefault(a, []).append(b)
+            self._partners.setdefault(b, []).append(a)
+
+    def _nodos_cluster(self, cx: int, cy: int) -> List[int]:
+        nodos: Set[int] = set()
+        for key, lado in (((cx, cy, "h"), 0), ((cx - 1, cy, "h"), 1), ((cx, cy, "v"), 0), ((cx, cy - 1, "v"), 1)):
+            for par in self._borders.get(key, []):
+                nodos.add(par[lado])
+        return sorted(nodos)
+
+    def _bfs_local(self, src: int, cx: int, cy: int) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """BFS desde `src` sin salir del cluster (cx, cy): (distancias, padres)."""
+        cg = self.cg
+        x0, y0, x1, y1 = self._limites(cx, cy)
+        xs, ys, nbrs = cg.xs, cg.ys, cg.neighbors
+        dist = {src: 0}
+        parent = {src: -1}
+        q = deque([src])
+        while q:
+            cur = q.popleft()
+            d = dist[cur] + 1
+            for nb in nbrs[cur]:
+                if nb in dist or not (x0 <= xs[nb] < x1 and y0 <= ys[nb] < y1):
+                    continue
+                dist[nb] = d
+                parent[nb] = cur
+                q.append(nb)
+        return dist, parent
+
+    def _set_intra(self, cx: int, cy: int) -> None:
+        nodos = self._nodos_cluster(cx, cy)
+        adj: Dict[int, List[Edge]] = {}
+        for n in nodos:
+            dist, _ = self._bfs_local(n, cx, cy)
+            adj[n] = [(m, dist[m]) for m in nodos if m != n and m in dist]
+        self._intra[(cx, cy)] = adj
+
+    # ---------- Mantenimiento ----------
+    def actualizar_celdas(self, celdas: Iterable[int]) -> None:
+        """Rehace bordes y aristas internas solo de los clusters que tocan `celdas`."""
+        k = self.k
+        clusters: Set[Tuple[int, int]] = set()
+        for c in celdas:
+            cx, cy = self._cluster_de(c)
+            x, y = self.cg.xs[c], self.cg.ys[c]
+            clusters.add((cx, cy))
+            # Bordes en los que participa la celda (y el cluster del otro lado)
+            if x % k == k - 1 and cx + 1 < self.ncx:
+                self._set_border((cx, cy, "h"))
+                clusters.add((cx + 1, cy))
+            if x % k == 0 and cx > 0:
+                self._set_border((cx - 1, cy, "h"))
+                clusters.add((cx - 1, cy))
+            if y % k == k - 1 and cy + 1 < self.ncy:
+                self._set_border((cx, cy, "v"))
+                clusters.add((cx, cy + 1))
+            if y % k == 0 and cy > 0:
+                self._set_border((cx, cy - 1, "v"))
+                clusters.add((cx, cy - 1))
+        for cx, cy in clusters:
+            self._set_intra(cx, cy)
+
+    def _sincronizar(self) -> None:
+        if self._version == self.cg.version:
+            return
+        cambios = self.cg.changes_since(self._version)
+        if cambios is None:
+            self._construir()
+        else:
+            self.actualizar_celdas(set(cambios))
+            self._version = self.cg.version
+
+    # ---------- Consulta ----------
+    def ruta_ids(self, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+        self._sincronizar()
+        cg = self.cg
+        if start == goal:
+            return [start]
+        if not cg.walk[goal]:
+            return []
+
+        if not cg.walk[start]:
+            # Parado sobre una celda recién bloqueada: salir por el mejor vecino
+            # (sus vecinos pueden estar en otro cluster y no ser entradas).
+            best: List[int] = []
+            for nb in cg.neighbors[start]:
+                sub = self.ruta_ids(nb, goal, stats)
+                if sub and (not best or len(sub) + 1 < len(best)):
+                    best = [start] + sub
+            return best
+
+        cs = self._cluster_de(start)
+        ct = self._cluster_de(goal)
+        # Insertar inicio y meta en el grafo abstracto (aristas temporales)
+        dist_s, _ = self._bfs_local(start, *cs)
+        desde_s: List[Edge] = [(n, dist_s[n]) for n in self._intra[cs] if n in dist_s and n != start]
+        if goal in dist_s:
+            desde_s.append((goal, dist_s[goal]))
+        dist_t, _ = self._bfs_local(goal, *ct)
+        hacia_t: Dict[int, int] = {n: dist_t[n] for n in self._intra[ct] if n in dist_t and n != goal}
+
+        xs, ys = cg.xs, cg.ys
+        gx, gy = xs[goal], ys[goal]
+        counter = 0
+        g: Dict[int, int] = {start: 0}
+        came_from: Dict[int, int] = {start: -1}
+        closed: Set[int] = set()
+        pq: List[Tuple[int, int, int]] = [(abs(xs[start] - gx) + abs(ys[start] - gy), counter, start)]
+        abstracta: List[int] = []
+        pops = 0
+        peak = 1
+
+        while pq:
+            _, _, cur = heapq.heappop(pq)
+            pops += 1
+            if cur == goal:
+                abstracta = _reconstruct_ids(came_from, goal) if goal in came_from else []
+                break
+            if cur in closed:
+                continue
+            closed.add(cur)
+
+            if cur == start:
+                aristas = list(desde_s)
+            else:
+                aristas = list(self._intra[self._cluster_de(cur)].get(cur, ()))
+                if cur in hacia_t:
+                    aristas.append((goal, hacia_t[cur]))
+            aristas.extend((p, 1) for p in self._partners.get(cur, ()))
+
+            for nb, w in aristas:
+                ng = g[cur] + w
+                if ng < g.get(nb, 10**18):
+                    g[nb] = ng
+                    came_from[nb] = cur
+                    counter += 1
+                    heapq.heappush(pq, (ng + abs(xs[nb] - gx) + abs(ys[nb] - gy), counter, nb))
+            if len(pq) > peak:
+                peak = len(pq)
+
+        self.stats.sumar(len(closed), counter + 1, pops, peak)
+        if stats is not None:
+            stats.sumar(len(closed), counter + 1, pops, peak)
+        return self._refinar(abstracta)
+
+    def _refinar(self, abstracta: List[int]) -> List[int]:
+        """Convierte la ruta abstracta en celdas (BFS local por tramo)."""
+        if not abstracta:
+            return []
+        path = [abstracta[0]]
+        for u, v in zip(abstracta, abstracta[1:]):
+            cu = self._cluster_de(u)
+            if cu != self._cluster_de(v):
+                path.append(v)  # cruce de borde: celdas enfrentadas
+                continue
+            _, parent = self._bfs_local(u, *cu)
+            tramo = _reconstruct_ids(parent, v) if v in parent else []
+            path.extend(tramo[1:])
+        return path
+
+    def ruta(self, start: Pos, goal: Pos) -> List[Pos]:
+        """Ruta celda a celda entre dos posiciones ([] si no hay)."""
+        if start == goal:
+            return [start]
+        s = self.cg.cell_id(start)
+        t = self.cg.cell_id(goal)
+        if s < 0 or t < 0:
+            return []
+        return self.cg.to_positions(self.ruta_ids(s, t))
+
+    # ---------- Info ----------
+    def resumen(self) -> Dict[str, int]:
+        return {
+            "cluster_size": self.k,
+            "clusters": self.ncx * self.ncy,
+            "nodes": len(self._partners),
+            "inter_edges": sum(len(v) for v in self._borders.values()),
+            "intra_edges": sum(len(e) for adj in self._intra.values() for e in adj.values()),
+        }
+
+    # --- Alias de compatibilidad (inglés) ---
+    def update_cells(self, cells: Iterable[int]) -> None:
+        return self.actualizar_celdas(cells)
+
+    def path(self, start: Pos, goal: Pos) -> List[Pos]:
+        return self.ruta(start, goal)
+
+    def summary(self) -> Dict[str, int]:
+        return self.resumen()
+
+
+def hierarchical_graph(grid: Grid, cluster_size: int = CLUSTER_SIZE) -> HierarchicalGraph:
+    """Devuelve (y cachea junto al grid compilado) el grafo jerárquico del grid."""
+    cg = compile_grid(grid)
+    return _grafo_de(cg, cluster_size)
+
+
+def _grafo_de(cg: CompiledGrid, cluster_size: int = CLUSTER_SIZE) -> HierarchicalGraph:
+    hg = cg.derived.get("hpa")
+    if hg is None or hg.k != cluster_size:
+        hg = HierarchicalGraph(cg, cluster_size)
+        cg.derived["hpa"] = hg
+    return hg
+
+
+def hpa_search(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    """Adaptador para `find_path(algo="hpa")`."""
+    return _grafo_de(cg).ruta_ids(start, goal, stats)
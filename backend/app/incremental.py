@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import copy
+import heapq
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .models import Grid, Pos
+from .pathfinding import CompiledGrid, SearchStats, compile_grid
+
+
+INF = 10**9
+
+Key = Tuple[int, int]
+
+
+class DStarLite:
+    """
+    Planificador incremental D* Lite (Koenig & Likhachev) sobre el grid compilado.
+
+    - Busca hacia atrás desde la meta y conserva g/rhs/cola entre llamadas.
+    - `ruta(inicio)` devuelve la ruta desde la posición actual; si el agente se
+      movió solo se ajusta `km` y se reutiliza todo lo calculado.
+    - `actualizar_celdas(celdas)` recibe las celdas que cambiaron de
+      transitabilidad y repara únicamente la parte afectada.
+    """
+
+    def __init__(self, grid: Optional[Grid], goal: Pos, cg: Optional[CompiledGrid] = None):
+        # grid=None: modo de una sola consulta sobre un grid compilado fijo
+        self.grid = grid
+        self.goal = goal
+        self.cg: CompiledGrid = cg if cg is not None else compile_grid(grid)
+        self.stats = SearchStats()
+        self._reiniciar()
+
+    def _vigente(self) -> bool:
+        g = self.grid
+        return g is None or (g.compiled is self.cg and g.version == self._version)
+
+    def _reiniciar(self) -> None:
+        if self.grid is not None:
+            self.cg = compile_grid(self.grid)
+            self._version = self.grid.version
+        else:
+            self._version = 0
+        self._goal = self.cg.cell_id(self.goal)
+        self._start = -1
+        self._last = -1
+        self._km = 0
+        self._g: Dict[int, int] = {}
+        self._rhs: Dict[int, int] = {}
+        self._open: Dict[int, Key] = {}
+        self._heap: List[Tuple[int, int, int]] = []
+        if self._goal >= 0:
+            self._rhs[self._goal] = 0
+            self._push(self._goal, (self._h(self._goal), 0))
+
+    # ---------- Helpers ----------
+    def _h(self, c: int) -> int:
+        # Heurística hacia el inicio actual (la búsqueda va meta -> inicio)
+        if self._start < 0:
+            return 0
+        xs, ys = self.cg.xs, self.cg.ys
+        return abs(xs[c] - xs[self._start]) + abs(ys[c] - ys[self._start])
+
+    def _key(self, c: int) -> Key:
+        m = min(self._g.get(c, INF), self._rhs.get(c, INF))
+        return (m + self._h(c) + self._km, m)
+
+    def _push(self, c: int, key: Key) -> None:
+        self._open[c] = key
+        self.stats.pushes += 1
+        heapq.heappush(self._heap, (key[0], key[1], c))
+
+    def _pred(self, c: int) -> Tuple[int, ...]:
+        # Predecesores de c: celdas vecinas desde las que se puede entrar a c
+        cg = self.cg
+        if not cg.walk[c]:
+            return ()
+        w = cg.width
+        x = cg.xs[c]
+        out = []
+        if x + 1 < w:
+            out.append(c + 1)
+        if x > 0:
+            out.append(c - 1)
+        if c + w < cg.size:
+            out.append(c + w)
+        if c >= w:
+            out.append(c - w)
+        return tuple(out)
+
+    def _update_vertex(self, u: int) -> None:
+        if u != self._goal:
+            g = self._g
+            best = INF
+            for s in self.cg.neighbors[u]:
+                v = g.get(s, INF)
+                if v < best:
+                    best = v
+            self._rhs[u] = best + 1 if best < INF else INF
+        if self._g.get(u, INF) != self._rhs.get(u, INF):
+            self._push(u, self._key(u))
+        else:
+            self._open.pop(u, None)
+
+    def _top(self) -> Optional[Tuple[Key, int]]:
+        heap, open_ = self._heap, self._open
+        while heap:
+            k1, k2, u = heap[0]
+            if open_.get(u) == (k1, k2):
+                return (k1, k2), u
+            heapq.heappop(heap)  # entrada vieja
+            self.stats.pops += 1
+        return None
+
+    def _compute(self) -> int:
+        """Procesa la cola hasta que el inicio sea consistente; devuelve el pico de la cola."""
+        g, rhs = self._g, self._rhs
+        s = self._start
+        expanded = 0
+        peak = len(self._heap)
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            k_old, u = top
+            if k_old >= self._key(s) and rhs.get(s, INF) == g.get(s, INF):
+                break
+            heapq.heappop(self._heap)
+            self.stats.pops += 1
+            del self._open[u]
+            expanded += 1
+
+            k_new = self._key(u)
+            gu, ru = g.get(u, INF), rhs.get(u, INF)
+            if k_old < k_new:
+                self._push(u, k_new)
+            elif gu > ru:
+                g[u] = ru
+                for p in self._pred(u):
+                    self._update_vertex(p)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for p in self._pred(u):
+                    self._update_vertex(p)
+            if len(self._heap) > peak:
+                peak = len(self._heap)
+        self.stats.sumar(expanded, frontier=peak)
+        return peak
+
+    # ---------- API ----------
+    def sirve_para(self, grid: Grid, goal: Optional[Pos]) -> bool:
+        """True si este planificador sigue siendo válido para (grid, meta)."""
+        return grid is self.grid and goal == self.goal and grid.compiled is self.cg
+
+    def actualizar_celdas(self, celdas: Iterable[Pos]) -> None:
+        """Repara el plan después de que `celdas` cambiaron de transitabilidad."""
+        if self.grid is not None and self.grid.compiled is not self.cg:
+            self._reiniciar()
+            return
+        cg = self.cg
+        for p in celdas:
+            c = cg.cell_id(p)
+            if c < 0:
+                continue
+            self._update_vertex(c)
+            x, y = cg.xs[c], cg.ys[c]
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < cg.width and 0 <= ny < cg.height:
+                    self._update_vertex(ny * cg.width + nx)
+        if self.grid is not None:
+            self._version = self.grid.version
+
+    def ruta_ids(self, start: int, stats: Optional[SearchStats] = None) -> List[int]:
+        """Ruta por ids desde `start`; `stats` recibe solo el trabajo de esta llamada."""
+        if not self._vigente():
+            # Cambios que no se notificaron: no hay forma segura de repararlos
+            self._reiniciar()
+        if self._goal < 0 or start < 0:
+            return []
+
+        if self._last >= 0 and start != self._last:
+            xs, ys = self.cg.xs, self.cg.ys
+            self._km += abs(xs[start] - xs[self._last]) + abs(ys[start] - ys[self._last])
+        self._start = start
+        self._last = start
+        antes = (self.stats.expanded, self.stats.pushes, self.stats.pops)
+        peak = self._compute()
+        if stats is not None:
+            st = self.stats
+            stats.sumar(st.expanded - antes[0], st.pushes - antes[1], st.pops - antes[2], peak)
+
+        g = self._g
+        if g.get(start, INF) >= INF and self._rhs.get(start, INF) >= INF:
+            return []
+
+        # Descenso por g: siempre existe un vecino con g = g(actual) - 1
+        path = [start]
+        cur = start
+        nbrs = self.cg.neighbors
+        limit = self.cg.size
+        while cur != self._goal and len(path) <= limit:
+            best, nxt = INF, -1
+            for s in nbrs[cur]:
+                v = g.get(s, INF)
+                if v < best:
+                    best, nxt = v, s
+            if nxt < 0:
+                return []
+            path.append(nxt)
+            cur = nxt
+        return path if cur == self._goal else []
+
+    def ruta(self, start: Pos, stats: Optional[SearchStats] = None) -> List[Pos]:
+        """Ruta celda a celda desde `start` hasta la meta ([] si no hay)."""
+        if start == self.goal:
+            return [start]
+        ids = self.ruta_ids(self.cg.cell_id(start), stats)
+        return self.cg.to_positions(ids)
+
+    def copia(self) -> "DStarLite":
+        """Copia independiente del estado de búsqueda (mismo grid y meta), para bifurcar una simulación."""
+        d = copy.copy(self)
+        d.stats = replace(self.stats)
+        d._g = dict(self._g)
+        d._rhs = dict(self._rhs)
+        d._open = dict(self._open)
+        d._heap = list(self._heap)
+        return d
+
+    # --- Alias de compatibilidad (inglés) ---
+    def copy(self) -> "DStarLite":
+        return self.copia()
+
+    def is_valid_for(self, grid: Grid, goal: Optional[Pos]) -> bool:
+        return self.sirve_para(grid, goal)
+
+    def update_cells(self, cells: Iterable[Pos]) -> None:
+        return self.actualizar_celdas(cells)
+
+    def path(self, start: Pos, stats: Optional[SearchStats] = None) -> List[Pos]:
+        return self.ruta(start, stats)
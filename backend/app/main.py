@@ -4,9 +4,15 @@ import json
 from pathlib import Path
 from typing import Any
 
-from fastapi import Body, FastAPI, Query
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 
+from .data_loader import load_shared_map
+from .models import Pos
+from .parallel import find_paths
+from .pathfinding import PATH_CACHE, PATH_METRICS
+from .sessions import SessionRegistry, normalizar_sesion
+from .sim.crowd import PHASES, CrowdWorld
 from .sim.world import World
 from .sim.travel import TravelWorld
 
@@ -19,10 +25,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-WORLD = World()
-WORLD.reset(voucher_amount=120.0, algo="astar", cashier_register_id="R1")
+# Una simulación por sesión (header X-Session-Id o ?session=...; sin ninguno,
+# la sesión "default"). Mapas y grafo de ciudad se comparten entre sesiones.
+WORLDS: SessionRegistry[World] = SessionRegistry(lambda: World(load_shared_map(), shared_map=True))
+TRAVELS: SessionRegistry[TravelWorld] = SessionRegistry(TravelWorld)
+CROWDS: SessionRegistry[CrowdWorld] = SessionRegistry(lambda: CrowdWorld(load_shared_map()))
 
-TRAVEL = TravelWorld()
+
+def session_id(
+    x_session_id: str | None = Header(None),
+    session: str | None = Query(None),
+) -> str:
+    return normalizar_sesion(session or x_session_id)
+
+
+def world(sid: str = Depends(session_id)) -> World:
+    return WORLDS.get(sid)
+
+
+def travel(sid: str = Depends(session_id)) -> TravelWorld:
+    return TRAVELS.get(sid)
+
+
+def crowd(sid: str = Depends(session_id), w: World = Depends(world)) -> CrowdWorld:
+    # La multitud simula sobre el mapa del World de la sesión, que pasa a ser
+    # una copia propia al primer parche (o al bifurcarse): se la sigue
+    c = CROWDS.get(sid)
+    c.usar_mapa(w.map_data)
+    return c
 
 
 def _project_root() -> Path:
@@ -45,8 +75,8 @@ def _safe_read_json(path: Path) -> dict[str, Any] | None:
 
 
 @app.get("/api/state")
-def state():
-    return WORLD.to_dict()
+def state(w: World = Depends(world)):
+    return w.to_dict()
 
 
 @app.post("/api/reset")
@@ -54,27 +84,74 @@ def reset(
     voucher: float = Query(120.0, ge=0, le=10_000),
     algo: str = Query("astar"),
     cashier_register: str = Query("R1"),
+    w: World = Depends(world),
 ):
-    WORLD.reset(voucher_amount=voucher, algo=algo, cashier_register_id=cashier_register)
-    return WORLD.to_dict()
+    w.reset(voucher_amount=voucher, algo=algo, cashier_register_id=cashier_register)
+    return w.to_dict()
 
 
 @app.post("/api/step")
-def step(n: int = Query(1, ge=1, le=500)):
-    WORLD.step(steps=n)
-    return WORLD.to_dict()
+def step(n: int = Query(1, ge=1, le=500), w: World = Depends(world)):
+    w.step(steps=n)
+    return w.to_dict()
 
 
 @app.post("/api/reload")
-def reload_map(map_file: str | None = Query(None)):
-    WORLD.recargar_mapa(map_file=map_file)
-    return WORLD.to_dict()
+def reload_map(map_file: str | None = Query(None), w: World = Depends(world)):
+    w.recargar_mapa(map_file=map_file)
+    return w.to_dict()
 
 
 @app.post("/api/patch")
-def patch_env(payload: dict = Body(...)):
-    WORLD.aplicar_parche(payload)
-    return WORLD.to_dict()
+def patch_env(payload: dict = Body(...), w: World = Depends(world)):
+    w.aplicar_parche(payload)
+    return w.to_dict()
+
+
+@app.post("/api/fork")
+def fork(
+    into: str = Query(..., min_length=1, max_length=64),
+    algo: str | None = Query(None),
+    sid: str = Depends(session_id),
+    w: World = Depends(world),
+):
+    """Bifurca el mundo de esta sesión en la sesión `into` (la reemplaza); el mapa se comparte hasta el primer parche."""
+    if normalizar_sesion(into) == sid:
+        raise HTTPException(status_code=400, detail="cannot fork a session into itself")
+    return WORLDS.put(into, w.fork(algo=algo)).to_dict()
+
+
+@app.post("/api/paths")
+def batch_paths(payload: dict = Body(...), w: World = Depends(world)):
+    """
+    Rutas en lote sobre el mapa actual (pool de procesos si el lote es grande):
+    {"queries": [{"start": {"x":1,"y":2}, "goal": {"x":9,"y":4}, "algo": "astar"}, ...]}
+    """
+    try:
+        queries = [
+            (Pos(int(q["start"]["x"]), int(q["start"]["y"])), Pos(int(q["goal"]["x"]), int(q["goal"]["y"])), q.get("algo", "astar"))
+            for q in payload.get("queries", [])
+        ]
+        paths = find_paths(w.map_data.grid, queries)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid queries: {e}")
+    return {"paths": [[{"x": p.x, "y": p.y} for p in path] for path in paths]}
+
+
+@app.get("/api/path-cache")
+def path_cache():
+    return PATH_CACHE.stats()
+
+
+@app.get("/api/path-metrics")
+def path_metrics(map_name: str | None = Query(None, alias="map")):
+    return {**PATH_METRICS.resumen(map_name), "cache": PATH_CACHE.stats()}
+
+
+@app.post("/api/path-metrics/reset")
+def path_metrics_reset():
+    PATH_METRICS.reset()
+    return PATH_METRICS.resumen()
 
 
 @app.get("/api/branches")
@@ -118,28 +195,100 @@ def health():
     return {"ok": True}
 
 
+@app.get("/api/sessions")
+def sessions():
+    return {"world": WORLDS.summary(), "travel": TRAVELS.summary(), "crowd": CROWDS.summary()}
+
+
+@app.delete("/api/sessions/{sid}")
+def drop_session(sid: str):
+    removed = [name for name, reg in (("world", WORLDS), ("travel", TRAVELS), ("crowd", CROWDS)) if reg.remove(sid)]
+    return {"session": normalizar_sesion(sid), "removed": removed}
+
+
+# ---------------- MULTI-COMPRADOR ----------------
+# Avanzar devuelve solo el resumen agregado; el detalle por comprador se pide aparte.
+
+@app.get("/api/crowd/summary")
+def crowd_summary(c: CrowdWorld = Depends(crowd)):
+    return c.summary()
+
+
+@app.post("/api/crowd/reset")
+def crowd_reset(
+    buyers: int = Query(100, ge=0, le=100_000),
+    spawn: int = Query(5, ge=1, le=10_000),
+    voucher_min: float = Query(20.0, ge=0, le=10_000),
+    voucher_max: float = Query(120.0, ge=0, le=10_000),
+    algo: str = Query("astar"),
+    seed: int = Query(0),
+    c: CrowdWorld = Depends(crowd),
+    w: World = Depends(world),
+):
+    return c.reset(
+        buyers=buyers,
+        spawn_per_tick=spawn,
+        voucher_min=voucher_min,
+        voucher_max=voucher_max,
+        algo=algo,
+        seed=seed,
+        map_data=w.map_data,
+    )
+
+
+@app.post("/api/crowd/step")
+def crowd_step(n: int = Query(1, ge=1, le=5_000), c: CrowdWorld = Depends(crowd)):
+    return c.step(steps=n)
+
+
+@app.get("/api/crowd/buyers")
+def crowd_buyers(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    phase: str | None = Query(None),
+    c: CrowdWorld = Depends(crowd),
+):
+    if phase is not None and phase not in PHASES:
+        raise HTTPException(status_code=400, detail=f"invalid phase: {phase} (expected one of {', '.join(PHASES)})")
+    return c.buyers(offset=offset, limit=limit, phase=phase)
+
+
+@app.get("/api/crowd/buyers/{buyer_id}")
+def crowd_buyer(buyer_id: int, c: CrowdWorld = Depends(crowd)):
+    try:
+        return c.buyer(buyer_id)
+    except IndexError:
+        raise HTTPException(status_code=404, detail=f"buyer not found: {buyer_id}")
+
+
+@app.get("/api/crowd/positions")
+def crowd_positions(c: CrowdWorld = Depends(crowd)):
+    return c.positions()
+
+
 # ---------------- TRAVEL (TAXI) ----------------
 
 @app.get("/api/travel/graph")
-def travel_graph():
-    return TRAVEL.graph_dict()
+def travel_graph(t: TravelWorld = Depends(travel)):
+    return t.graph_dict()
 
 
 @app.get("/api/travel/state")
-def travel_state():
-    return TRAVEL.to_dict()
+def travel_state(t: TravelWorld = Depends(travel)):
+    return t.to_dict()
 
 
 @app.post("/api/travel/reset")
 def travel_reset(
     home_id: str | None = Query(None),
     taxi_start: str | None = Query(None),
+    t: TravelWorld = Depends(travel),
 ):
-    TRAVEL.reset(home_id=home_id, taxi_start=taxi_start)
-    return TRAVEL.to_dict()
+    t.reset(home_id=home_id, taxi_start=taxi_start)
+    return t.to_dict()
 
 
 @app.post("/api/travel/step")
-def travel_step(n: int = Query(1, ge=1, le=500)):
-    TRAVEL.step(n=n)
-    return TRAVEL.to_dict()
+def travel_step(n: int = Query(1, ge=1, le=500), t: TravelWorld = Depends(travel)):
+    t.step(n=n)
+    return t.to_dict()
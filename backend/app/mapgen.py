@@ -0,0 +1,268 @@
+"""
+Generador sembrado de supermercados sintéticos (mismo esquema que data/*.json).
+
+Uso (desde backend/):
+    python -m app.mapgen --size 1000
+    python -m app.mapgen --width 1600 --height 900 --skus 50000 --seed 7
+    python -m app.mapgen --size 300 --out ../data/synthetic/prueba.json
+
+Distribución (de izquierda a derecha):
+- pasillo de entrada (entrada en el borde izquierdo, a media altura);
+- bloque de góndolas: columnas de estantes de 2 celdas de ancho separadas por
+  pasillos de 2 celdas, cortadas por pasillos transversales; las secciones
+  ocupan franjas contiguas de columnas;
+- zona de cajas (colas y cajeros apilados) y salida en el borde derecho.
+
+Todo pasillo vertical va de la fila 1 a la penúltima, así que cualquier punto
+pick (siempre en un pasillo junto a su estante) es alcanzable; además se
+verifica con un BFS antes de devolver el mapa.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .data_loader import _project_root
+
+
+MIN_WIDTH = 30
+MIN_HEIGHT = 16
+
+SHELF_W = 2
+AISLE_W = 2
+LEFT_MARGIN = 4     # pasillo de entrada
+CHECKOUT_W = 10     # zona de cajas + salida
+
+SECTIONS = [
+    ("FRUTAS_VERDURAS", "Frutas y Verduras", 9.0),
+    ("ABARROTES", "Abarrotes", 12.0),
+    ("LACTEOS", "Lácteos", 10.0),
+    ("CARNES", "Carnes y Embutidos", 35.0),
+    ("LIMPIEZA", "Limpieza", 18.0),
+    ("HIGIENE", "Higiene Personal", 16.0),
+    ("BEBIDAS", "Bebidas", 11.0),
+    ("SNACKS", "Snacks", 7.0),
+    ("PANADERIA", "Panadería", 6.0),
+    ("CONGELADOS", "Congelados", 25.0),
+    ("MASCOTAS", "Mascotas", 30.0),
+    ("HOGAR", "Hogar", 40.0),
+]
+
+
+def _pos(x: int, y: int) -> Dict[str, int]:
+    return {"x": x, "y": y}
+
+
+def generar_mapa(
+    width: int,
+    height: int,
+    seed: int = 0,
+    skus: Optional[int] = None,
+    registers: Optional[int] = None,
+    sections: Optional[int] = None,
+    name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Devuelve el JSON (dict) de un supermercado de `width` x `height` celdas.
+
+    - `skus`: cantidad de productos (default: ~2 por estante).
+    - `registers`: cantidad de cajas (default: una cada ~40 filas, 2..40).
+    - `sections`: cantidad de secciones (default: todas, máx. len(SECTIONS)).
+    Mismo `seed` y parámetros => mismo mapa.
+    """
+    if width < MIN_WIDTH or height < MIN_HEIGHT:
+        raise ValueError(f"grid too small: {width}x{height} (min {MIN_WIDTH}x{MIN_HEIGHT})")
+    rng = random.Random(seed)
+
+    mid = height // 2
+    entrance = (1, mid)
+    exit_ = (width - 2, mid)
+
+    # ---------- Góndolas ----------
+    x0 = LEFT_MARGIN
+    x1 = width - CHECKOUT_W  # primera columna de la zona de cajas
+    y0, y1 = 3, height - 3   # filas 1-2 y las dos últimas quedan como pasillo
+    cols = list(range(x0, x1 - SHELF_W, SHELF_W + AISLE_W))
+
+    n_sec = max(1, min(sections or len(SECTIONS), len(SECTIONS), len(cols)))
+    secciones = SECTIONS[:n_sec]
+
+    shelves: List[Dict[str, Any]] = []
+    for ci, x in enumerate(cols):
+        sec_id = secciones[ci * n_sec // len(cols)][0]
+        y = y0
+        while y < y1:
+            largo = min(rng.randint(6, 20), y1 - y)
+            if largo >= 2:
+                shelves.append(
+                    {"id": f"S{len(shelves) + 1}", "rect": {"x": x, "y": y, "w": SHELF_W, "h": largo}, "section": sec_id}
+                )
+            y += largo + rng.randint(2, 3)
+
+    if not shelves:
+        raise ValueError(f"no room for shelves in {width}x{height}")
+
+    # ---------- Cajas ----------
+    cashier_x = width - 5
+    queue_x = width - 7
+    filas = [y for y in range(3, height - 3, 3) if y != mid]
+    n_reg = registers if registers is not None else min(40, max(2, height // 40))
+    n_reg = max(1, min(n_reg, len(filas)))
+    # repartidas a lo alto de la zona de cajas
+    elegidas = [filas[i * len(filas) // n_reg] for i in range(n_reg)]
+    regs = [
+        {"id": f"R{i + 1}", "cashier_spot": _pos(cashier_x, y), "queue_spot": _pos(queue_x, y)}
+        for i, y in enumerate(elegidas)
+    ]
+
+    # ---------- Productos ----------
+    n_skus = skus if skus is not None else 2 * len(shelves)
+    precio_base = {sid: base for sid, _, base in secciones}
+    label = {sid: lab for sid, lab, _ in secciones}
+    # Caras libres de cada estante (pasillo a la izquierda y a la derecha)
+    usados: set = set()
+    products: List[Dict[str, Any]] = []
+    for i in range(n_skus):
+        sh = shelves[i % len(shelves)] if i < len(shelves) else rng.choice(shelves)
+        r = sh["rect"]
+        pick = None
+        for _ in range(8):
+            px = r["x"] - 1 if rng.random() < 0.5 else r["x"] + r["w"]
+            py = rng.randrange(r["y"], r["y"] + r["h"])
+            if (px, py) not in usados:
+                pick = (px, py)
+                break
+        if pick is None:
+            pick = (px, py)  # estante lleno: se comparte el punto pick
+        usados.add(pick)
+
+        sec = sh["section"]
+        precio = max(0.5, round(rng.lognormvariate(0.0, 0.5) * precio_base[sec] * 2) / 2)
+        products.append(
+            {
+                "sku": f"SYN{i + 1:06d}",
+                "name": f"{label[sec]} {i + 1:06d}",
+                "price": precio,
+                "section": sec,
+                "shelf": sh["id"],
+                "pick": _pos(*pick),
+            }
+        )
+
+    data = {
+        "meta": {
+            "name": name or f"Sintético {width}x{height} (seed {seed})",
+            "city": "Sintética",
+            "units": "cells",
+            "generator": {"width": width, "height": height, "seed": seed, "skus": n_skus, "registers": n_reg},
+        },
+        "grid": {"width": width, "height": height},
+        "entrance": _pos(*entrance),
+        "exit": _pos(*exit_),
+        "walls": [{"type": "border", "note": "Pared perimetral (se maneja en código como no-walkable)"}],
+        "registers": regs,
+        "shelves": shelves,
+        "sections": [{"id": sid, "label": lab} for sid, lab, _ in secciones],
+        "products": products,
+    }
+    inalcanzables = verificar_alcance(data)
+    if inalcanzables:
+        raise RuntimeError(f"generated map has unreachable points: {inalcanzables[:5]}")
+    return data
+
+
+def verificar_alcance(data: Dict[str, Any]) -> List[Dict[str, int]]:
+    """
+    Puntos (picks, colas, salida) que no se alcanzan desde la entrada, con la
+    misma ocupación que arma `load_map`. Lista vacía = mapa válido.
+    """
+    w, h = int(data["grid"]["width"]), int(data["grid"]["height"])
+    walk = bytearray(b"\x01") * (w * h)
+    for x in range(w):
+        walk[x] = walk[(h - 1) * w + x] = 0
+    for y in range(h):
+        walk[y * w] = walk[y * w + w - 1] = 0
+    for s in data.get("shelves", []):
+        r = s["rect"]
+        for yy in range(r["y"], r["y"] + r["h"]):
+            walk[yy * w + r["x"]: yy * w + r["x"] + r["w"]] = b"\x00" * r["w"]
+
+    puntos = [data["exit"]]
+    for r in data.get("registers", []):
+        puntos += [r["cashier_spot"], r["queue_spot"]]
+    puntos += [p["pick"] for p in data.get("products", [])]
+    puntos.append(data["entrance"])
+    for p in puntos:
+        walk[p["y"] * w + p["x"]] = 1  # load_map los fuerza caminables
+
+    start = data["entrance"]["y"] * w + data["entrance"]["x"]
+    seen = bytearray(w * h)
+    seen[start] = 1
+    q = deque([start])
+    while q:
+        c = q.popleft()
+        x = c % w
+        for nb in (c + 1 if x + 1 < w else -1, c - 1 if x > 0 else -1, c + w, c - w):
+            if 0 <= nb < w * h and walk[nb] and not seen[nb]:
+                seen[nb] = 1
+                q.append(nb)
+    return [p for p in puntos if not seen[p["y"] * w + p["x"]]]
+
+
+def escribir_mapa(data: Dict[str, Any], path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    return path
+
+
+def _default_out(width: int, height: int, seed: int) -> Path:
+    # Subcarpeta: no aparece en /api/branches ni en el benchmark de sucursales
+    return _project_root() / "data" / "synthetic" / f"Sintetico_{width}x{height}_s{seed}.json"
+
+
+# --- Alias de compatibilidad (inglés) ---
+def generate_map(
+    width: int,
+    height: int,
+    seed: int = 0,
+    skus: Optional[int] = None,
+    registers: Optional[int] = None,
+    sections: Optional[int] = None,
+    name: Optional[str] = None,
+) -> Dict[str, Any]:
+    return generar_mapa(width, height, seed, skus, registers, sections, name)
+
+
+def write_map(data: Dict[str, Any], path: Path) -> Path:
+    return escribir_mapa(data, path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Generador de supermercados sintéticos")
+    ap.add_argument("--size", type=int, default=None, help="lado (grid cuadrado)")
+    ap.add_argument("--width", type=int, default=None)
+    ap.add_argument("--height", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--skus", type=int, default=None, help="cantidad de productos (default: 2 por estante)")
+    ap.add_argument("--registers", type=int, default=None)
+    ap.add_argument("--sections", type=int, default=None)
+    ap.add_argument("--out", type=Path, default=None)
+    args = ap.parse_args(argv)
+
+    width = args.width or args.size or 1000
+    height = args.height or args.size or 1000
+    data = generar_mapa(width, height, args.seed, args.skus, args.registers, args.sections)
+    out = escribir_mapa(data, args.out or _default_out(width, height, args.seed))
+    print(
+        f"{data['meta']['name']}: {len(data['shelves'])} estantes, {len(data['products'])} productos, "
+        f"{len(data['registers'])} cajas -> {out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
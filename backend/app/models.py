@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Iterator
+import heapq
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, List, Optional, Iterator, Set, Tuple, Union
 
 
 @dataclass(frozen=True, slots=True)
@@ -56,12 +59,38 @@ class Rect:
 
 
 
+# Costo máximo por celda (los costos se guardan en un byte en el grid compilado)
+MAX_CELL_COST = 255
+
+
 @dataclass(slots=True)
 class Grid:
     width: int
     height: int
     walkable: List[List[bool]]
 
+    # Se incrementa cada vez que cambia la transitabilidad o el costo de alguna
+    # celda (permite invalidar cachés derivados del grid).
+    version: int = 0
+    # Igual que `version`, pero solo cuenta cambios de transitabilidad: lo que
+    # cuenta pasos (tabla de puntos de interés, campos de distancia) no depende
+    # de los costos y sobrevive a un `fijar_costo`.
+    walk_version: int = 0
+
+    # Costo entero (>= 1) de entrar a cada celda (congestión, promos, pasillos
+    # lentos). None = todas cuestan 1; se crea al fijar el primer costo != 1.
+    costs: Optional[List[List[int]]] = field(default=None, repr=False)
+
+    # Representación compilada (pathfinding.CompiledGrid), se crea bajo demanda
+    # y se mantiene sincronizada celda a celda en `bloquear`.
+    compiled: Optional[Any] = field(default=None, repr=False, compare=False)
+
+    # Copy-on-write entre copias (`copia`): filas de `walkable` / `costs` que ya
+    # son propias (None = todas) y si `compiled` lo comparte otra copia.
+    _filas_propias: Optional[Set[int]] = field(default=None, repr=False, compare=False)
+    _costos_propios: Optional[Set[int]] = field(default=None, repr=False, compare=False)
+    _compilado_compartido: bool = field(default=False, repr=False, compare=False)
+
     # ---- Helpers en español ----
     def en_limites(self, p: Pos) -> bool:
         """True si p está dentro de [0,width) x [0,height)."""
@@ -76,19 +105,94 @@ class Grid:
     def bloquear(self, p: Pos, bloqueado: bool = True) -> None:
         """Marca una celda como bloqueada (no caminable)."""
         if self.en_limites(p):
-            self.walkable[p.y][p.x] = not bloqueado
+            if bool(self.walkable[p.y][p.x]) == (not bloqueado):
+                return
+            self._fila_propia(p.y)[p.x] = not bloqueado
+            self.version += 1
+            self.walk_version += 1
+            if self.compiled is not None:
+                self._compilado_propio().update_cell(p.x, p.y, not bloqueado)
 
     def bloquear_rectangulo(self, r: Rect) -> None:
         """Bloquea todas las celdas cubiertas por un rectángulo."""
         for cell in r.iter_cells():
             self.bloquear(cell, True)
 
+    def costo(self, p: Pos) -> int:
+        """Costo de entrar a la celda (1 si no tiene costo propio)."""
+        if self.costs is None or not self.en_limites(p):
+            return 1
+        return self.costs[p.y][p.x]
+
+    def fijar_costo(self, p: Pos, costo: int) -> None:
+        """Fija el costo de entrar a una celda (entero en [1, MAX_CELL_COST])."""
+        costo = int(costo)
+        if not 1 <= costo <= MAX_CELL_COST:
+            raise ValueError(f"cost must be in [1, {MAX_CELL_COST}]: {costo}")
+        if not self.en_limites(p) or self.costo(p) == costo:
+            return
+        if self.costs is None:
+            self.costs = [[1] * self.width for _ in range(self.height)]
+            self._costos_propios = None
+        self._fila_costos_propia(p.y)[p.x] = costo
+        self.version += 1
+        if self.compiled is not None:
+            self._compilado_propio().update_cost(p.x, p.y, costo)
+
+    def es_ponderado(self) -> bool:
+        """True si alguna celda cuesta distinto de 1."""
+        return self.costs is not None and any(c != 1 for row in self.costs for c in row)
+
     def iterar_celdas(self):
         """Itera todas las posiciones (Pos) del grid."""
         for y in range(self.height):
             for x in range(self.width):
                 yield Pos(x, y)
 
+    def copia(self) -> "Grid":
+        """
+        Copia independiente con copy-on-write: las filas y el grid compilado se
+        comparten con el original, y cada uno copia una fila (o el compilado) recién
+        la primera vez que la modifica. Cuesta O(alto), no O(ancho x alto).
+        """
+        # A partir de acá ninguno de los dos es dueño exclusivo de nada
+        self._filas_propias = set()
+        self._costos_propios = set()
+        self._compilado_compartido = self.compiled is not None
+        return Grid(
+            width=self.width,
+            height=self.height,
+            walkable=list(self.walkable),
+            version=self.version,
+            walk_version=self.walk_version,
+            costs=list(self.costs) if self.costs is not None else None,
+            compiled=self.compiled,
+            _filas_propias=set(),
+            _costos_propios=set(),
+            _compilado_compartido=self.compiled is not None,
+        )
+
+    def _fila_propia(self, y: int) -> List[bool]:
+        propias = self._filas_propias
+        if propias is not None and y not in propias:
+            self.walkable[y] = self.walkable[y][:]
+            propias.add(y)
+        return self.walkable[y]
+
+    def _fila_costos_propia(self, y: int) -> List[int]:
+        assert self.costs is not None
+        propias = self._costos_propios
+        if propias is not None and y not in propias:
+            self.costs[y] = self.costs[y][:]
+            propias.add(y)
+        return self.costs[y]
+
+    def _compilado_propio(self) -> Any:
+        if self._compilado_compartido:
+            self.compiled = self.compiled.copia()
+            self._compilado_compartido = False
+        return self.compiled
+
     # ---- Alias de compatibilidad (inglés) ----
     def in_bounds(self, p: Pos) -> bool:
         return self.en_limites(p)
@@ -102,6 +206,18 @@ class Grid:
     def block_rect(self, r: Rect) -> None:
         return self.bloquear_rectangulo(r)
 
+    def cost(self, p: Pos) -> int:
+        return self.costo(p)
+
+    def set_cost(self, p: Pos, cost: int) -> None:
+        return self.fijar_costo(p, cost)
+
+    def is_weighted(self) -> bool:
+        return self.es_ponderado()
+
+    def copy(self) -> "Grid":
+        return self.copia()
+
     def iter_cells(self):
         return self.iterar_celdas()
 
@@ -149,6 +265,190 @@ class MapData:
     sections: Dict[str, Section]
     products: Dict[str, Product]
 
+    # Caché de distancias entre puntos de interés (distances.PoiDistances)
+    distances: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Campos de distancia hacia metas compartidas (distances.GoalFields)
+    fields: Optional[Any] = field(default=None, repr=False, compare=False)
+    # queue_spot -> id de caja (las cajas no cambian después de cargar el mapa)
+    queue_registers: Dict[Pos, str] = field(default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.queue_registers = {r.queue_spot: r.id for r in self.registers.values()}
+
+    def caja_en_cola(self, p: Pos) -> Optional[str]:
+        """Id de la caja cuyo queue_spot es `p` (None si no es una cola). O(1)."""
+        return self.queue_registers.get(p)
+
+    def copia_editable(self) -> "MapData":
+        """
+        Copia que se puede parchear sin afectar a quienes comparten este mapa:
+        grid propio (copy-on-write por fila, ver `Grid.copia`) y diccionario de
+        productos propio (un producto movido se reemplaza, no se modifica);
+        estantes, cajas y secciones se comparten (no cambian después de
+        cargar). Distancias y campos se rehacen bajo demanda.
+        """
+        return MapData(
+            name=self.name,
+            city=self.city,
+            grid=self.grid.copia(),
+            entrance=self.entrance,
+            exit=self.exit,
+            shelves=self.shelves,
+            registers=self.registers,
+            sections=self.sections,
+            products=dict(self.products),
+        )
+
+    # Alias de compatibilidad (inglés)
+    def register_at_queue(self, p: Pos) -> Optional[str]:
+        return self.caja_en_cola(p)
+
+    def editable_copy(self) -> "MapData":
+        return self.copia_editable()
+
+
+class CompactPath:
+    """
+    Ruta como arreglo de ids de celda (id = y * ancho + x) con cursor de lectura.
+
+    - `avanzar()` mueve el cursor en O(1), sin copiar lo que queda de la ruta.
+    - Los giros se precalculan al cargar la ruta: `esquinas()` devuelve solo los
+      vértices (posición actual, giros y final) de lo que falta recorrer, así que
+      serializar una ruta larga cuesta lo mismo que una corta con igual forma.
+    - `len()`, iteración, índices y `in` se refieren a lo que falta (desde el cursor).
+    """
+
+    __slots__ = ("width", "ids", "cursor", "_giros")
+
+    def __init__(self, cells: Iterable[Pos] = (), width: int = 0):
+        self.width = width
+        self.ids = array("i")
+        self.cursor = 0
+        self._giros = array("i")
+        if cells:
+            self.cargar(cells, width)
+
+    def cargar(self, cells: Iterable[Pos], width: int) -> None:
+        """Reemplaza la ruta (lista de Pos contiguas) y pone el cursor al inicio."""
+        self.width = width
+        self.ids = array("i", (p.y * width + p.x for p in cells))
+        self.cursor = 0
+        # Índices donde cambia la dirección (más el último): fin de cada tramo recto
+        ids = self.ids
+        giros = array("i")
+        for i in range(1, len(ids) - 1):
+            if ids[i] - ids[i - 1] != ids[i + 1] - ids[i]:
+                giros.append(i)
+        if len(ids) > 1:
+            giros.append(len(ids) - 1)
+        self._giros = giros
+
+    def limpiar(self) -> None:
+        self.ids = array("i")
+        self.cursor = 0
+        self._giros = array("i")
+
+    def copia(self) -> "CompactPath":
+        """Copia con cursor propio; los arreglos se comparten (`cargar` y `limpiar` los reemplazan, nunca los modifican)."""
+        p = CompactPath()
+        p.width, p.ids, p.cursor, p._giros = self.width, self.ids, self.cursor, self._giros
+        return p
+
+    def _pos(self, c: int) -> Pos:
+        return Pos(c % self.width, c // self.width)
+
+    def actual(self) -> Optional[Pos]:
+        """Celda bajo el cursor (None si la ruta está vacía)."""
+        return self._pos(self.ids[self.cursor]) if self.cursor < len(self.ids) else None
+
+    def avanzar(self) -> Pos:
+        """Mueve el cursor una celda y devuelve la nueva posición."""
+        self.cursor += 1
+        return self._pos(self.ids[self.cursor])
+
+    def saltar(self, k: int) -> Pos:
+        """Mueve el cursor `k` celdas de una vez (como `k` llamadas a `avanzar`)."""
+        self.cursor += k
+        return self._pos(self.ids[self.cursor])
+
+    def esquinas(self) -> List[Pos]:
+        """Vértices de lo que falta: posición actual, cada giro y el final."""
+        if self.cursor >= len(self.ids):
+            return []
+        out = [self._pos(self.ids[self.cursor])]
+        for i in self._giros[bisect_right(self._giros, self.cursor) :]:
+            out.append(self._pos(self.ids[i]))
+        return out
+
+    def tramos(self) -> List[List[int]]:
+        """RLE de lo que falta: [dx, dy, largo] por tramo recto."""
+        out: List[List[int]] = []
+        prev = self.cursor
+        for i in self._giros[bisect_right(self._giros, self.cursor) :]:
+            paso = self.ids[prev + 1] - self.ids[prev]
+            dx, dy = (paso, 0) if abs(paso) == 1 else (0, paso // self.width)
+            out.append([dx, dy, i - prev])
+            prev = i
+        return out
+
+    def __len__(self) -> int:
+        return max(0, len(self.ids) - self.cursor)
+
+    def __bool__(self) -> bool:
+        return self.cursor < len(self.ids)
+
+    def __iter__(self) -> Iterator[Pos]:
+        for i in range(self.cursor, len(self.ids)):
+            yield self._pos(self.ids[i])
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Pos, List[Pos]]:
+        if isinstance(i, slice):
+            return list(self)[i]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("path index out of range")
+        return self._pos(self.ids[self.cursor + i])
+
+    def __contains__(self, p: object) -> bool:
+        if not isinstance(p, Pos) or not (0 <= p.x < self.width):
+            return False
+        c = p.y * self.width + p.x
+        return any(self.ids[i] == c for i in range(self.cursor, len(self.ids)))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompactPath):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    # Alias de compatibilidad (inglés)
+    def load(self, cells: Iterable[Pos], width: int) -> None:
+        return self.cargar(cells, width)
+
+    def clear(self) -> None:
+        return self.limpiar()
+
+    def copy(self) -> "CompactPath":
+        return self.copia()
+
+    def current(self) -> Optional[Pos]:
+        return self.actual()
+
+    def advance(self) -> Pos:
+        return self.avanzar()
+
+    def skip(self, k: int) -> Pos:
+        return self.saltar(k)
+
+    def corners(self) -> List[Pos]:
+        return self.esquinas()
+
+    def runs(self) -> List[List[int]]:
+        return self.tramos()
+
 
 @dataclass(slots=True)
 class BuyerState:
@@ -162,9 +462,13 @@ class BuyerState:
 
     goal: Optional[Pos] = None
     goal_kind: str = "idle"  # idle | pick | register | exit
-    path: List[Pos] = field(default_factory=list)
+    # Ruta actual: ids de celda + cursor (se avanza en el lugar, ver CompactPath)
+    path: CompactPath = field(default_factory=CompactPath)
     goal_queue: List[Pos] = field(default_factory=list)
 
+    # Estado de búsqueda que se conserva entre ticks (algoritmos incrementales)
+    planner: Optional[Any] = field(default=None, repr=False, compare=False)
+
     paid: bool = False
 
     # ✅ Utilidad + cambio
@@ -174,10 +478,84 @@ class BuyerState:
 
     # métricas
     steps_moved: int = 0
+    # Contadores de la última consulta de ruta (pathfinding.SearchStats)
+    last_search: Optional[Any] = field(default=None, repr=False, compare=False)
 
     # bitácora del buyer (pick)
     purchase_log: List[dict] = field(default_factory=list)
 
+    # Índices de lo seleccionado que aún no está en el carrito (se mantienen
+    # incrementalmente: cada tick consulta en O(1) en vez de recorrer la canasta)
+    pending_skus: Set[str] = field(default_factory=set, repr=False, compare=False)
+    pending_by_pick: Dict[Pos, List[str]] = field(default_factory=dict, repr=False, compare=False)
+    pending_prices: List[Tuple[float, str]] = field(default_factory=list, repr=False, compare=False)
+
+    def indexar_pendientes(self, products: Dict[str, "Product"]) -> None:
+        """Reconstruye los índices a partir de `selected_skus` y `cart`."""
+        en_carrito = set(self.cart)
+        self.pending_skus = {sku for sku in self.selected_skus if sku not in en_carrito}
+        self.pending_by_pick = {}
+        self.pending_prices = []
+        for sku in self.selected_skus:
+            if sku in self.pending_skus:
+                self.pending_by_pick.setdefault(products[sku].pick, []).append(sku)
+                self.pending_prices.append((float(products[sku].price), sku))
+        heapq.heapify(self.pending_prices)
+
+    def sku_pendiente_en(self, p: Pos) -> Optional[str]:
+        """SKU pendiente cuyo pick es `p` (el último seleccionado si comparten punto)."""
+        skus = self.pending_by_pick.get(p)
+        return skus[-1] if skus else None
+
+    def retirar_pendiente(self, sku: str, pick: Pos) -> None:
+        """Quita `sku` de los pendientes (ya está en el carrito)."""
+        self.pending_skus.discard(sku)
+        skus = self.pending_by_pick.get(pick)
+        if skus and sku in skus:
+            skus.remove(sku)
+            if not skus:
+                del self.pending_by_pick[pick]
+        # el heap se limpia perezosamente en precio_minimo_pendiente
+
+    def mover_pendiente(self, sku: str, old: Pos, new: Pos) -> None:
+        """Reubica un SKU pendiente cuyo punto pick cambió."""
+        if sku not in self.pending_skus:
+            return
+        skus = self.pending_by_pick.get(old)
+        if skus and sku in skus:
+            skus.remove(sku)
+            if not skus:
+                del self.pending_by_pick[old]
+        self.pending_by_pick.setdefault(new, []).append(sku)
+
+    def precio_minimo_pendiente(self) -> Optional[float]:
+        """Precio mínimo de lo pendiente (None si no queda nada). O(1) amortizado."""
+        heap = self.pending_prices
+        while heap and heap[0][1] not in self.pending_skus:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def copia(self) -> "BuyerState":
+        """
+        Copia independiente para bifurcar una simulación: contenedores propios
+        (canasta, carrito, metas, índices, bitácora) y ruta con cursor propio
+        que comparte sus arreglos. Lo inmutable (Pos, eventos ya registrados,
+        última búsqueda) se comparte.
+        """
+        return replace(
+            self,
+            selected_skus=self.selected_skus[:],
+            cart=self.cart[:],
+            path=self.path.copia(),
+            goal_queue=self.goal_queue[:],
+            planner=self.planner.copia() if self.planner is not None else None,
+            section_weights=dict(self.section_weights),
+            purchase_log=self.purchase_log[:],
+            pending_skus=set(self.pending_skus),
+            pending_by_pick={p: skus[:] for p, skus in self.pending_by_pick.items()},
+            pending_prices=self.pending_prices[:],
+        )
+
     # --- Alias en español (propiedades) ---
     @property
     def posicion(self) -> Pos:
@@ -236,7 +614,7 @@ class BuyerState:
         self.goal_kind = value
 
     @property
-    def ruta(self) -> List[Pos]:
+    def ruta(self) -> CompactPath:
         return self.path
 
     @property
@@ -267,6 +645,19 @@ class BuyerState:
     def bitacora_compra(self) -> List[dict]:
         return self.purchase_log
 
+    # Alias de compatibilidad (inglés)
+    def index_pending(self, products: Dict[str, "Product"]) -> None:
+        return self.indexar_pendientes(products)
+
+    def pending_sku_at(self, p: Pos) -> Optional[str]:
+        return self.sku_pendiente_en(p)
+
+    def min_pending_price(self) -> Optional[float]:
+        return self.precio_minimo_pendiente()
+
+    def copy(self) -> "BuyerState":
+        return self.copia()
+
 
 
 @dataclass(slots=True)
@@ -288,6 +679,14 @@ class CashierState:
     last_scan: Optional[dict] = None
     scan_log: List[dict] = field(default_factory=list)
 
+    def copia(self) -> "CashierState":
+        """Copia independiente (listas propias; los escaneos ya registrados se comparten)."""
+        return replace(self, scanned_skus=list(self.scanned_skus or []), scan_log=list(self.scan_log or []))
+
+    # Alias de compatibilidad (inglés)
+    def copy(self) -> "CashierState":
+        return self.copia()
+
     # --- Alias en español (propiedades) ---
     @property
     def posicion(self) -> Pos:
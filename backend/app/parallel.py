@@ -0,0 +1,242 @@
+"""
+Rutas en lote sobre un pool de procesos, con el grid en memoria compartida.
+
+- La ocupación y los costos del grid compilado se copian UNA vez por versión
+  del grid a un bloque `multiprocessing.shared_memory`; cada worker lo lee al
+  primer uso y arma su propio CompiledGrid (se reutiliza mientras la versión
+  no cambie). Las tareas solo llevan ids de celda, nunca el grid.
+- Las consultas se agrupan en pocos lotes por worker para amortizar el IPC;
+  los lotes chicos se resuelven en el proceso actual.
+- PATH_CACHE se consulta antes y se llena después, igual que `find_path`.
+
+Uso (desde backend/), mide la aceleración contra la versión serial:
+    python -m app.parallel --size 400 --queries 2000 --workers 1 2 4
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+from .models import Grid, Pos
+from .components import componentes_de
+from .pathfinding import _ALGORITHMS, PATH_CACHE, CompiledGrid, cache_key, canonical_algo, compile_grid
+
+
+Query = Tuple[Pos, Pos, str]
+GridDesc = Tuple[str, int, int]  # (nombre del bloque compartido, ancho, alto)
+Task = Tuple[int, int, str]      # (id inicio, id meta, algoritmo canónico)
+
+# Lotes con menos consultas pendientes se resuelven sin el pool
+MIN_PARALLEL_BATCH = 64
+# Lotes por worker (más lotes = mejor balance, más IPC)
+CHUNKS_PER_WORKER = 4
+
+
+class SharedGrid:
+    """Ocupación (1 byte/celda) + costos (1 byte/celda) de un grid compilado en memoria compartida."""
+
+    def __init__(self, cg: CompiledGrid, version: int):
+        self.key = (cg.uid, version)
+        self.width = cg.width
+        self.height = cg.height
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * cg.size))
+        self.shm.buf[: cg.size] = cg.walk
+        self.shm.buf[cg.size : 2 * cg.size] = cg.cost
+
+    def descriptor(self) -> GridDesc:
+        return (self.shm.name, self.width, self.height)
+
+    def cerrar(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+# ---------- Lado del worker ----------
+
+_GRIDS_WORKER: "OrderedDict[str, CompiledGrid]" = OrderedDict()
+
+
+def _grid_en_worker(desc: GridDesc) -> CompiledGrid:
+    name, width, height = desc
+    cg = _GRIDS_WORKER.get(name)
+    if cg is None:
+        # Los workers (spawn) comparten el resource tracker del padre: el
+        # registro al adjuntar es idempotente y el padre hace el unlink.
+        shm = shared_memory.SharedMemory(name=name)
+        size = width * height
+        try:
+            walk = bytes(shm.buf[:size])
+            cost = bytes(shm.buf[size : 2 * size])
+        finally:
+            shm.close()
+        cg = CompiledGrid.desde_buffers(width, height, walk, cost)
+        _GRIDS_WORKER[name] = cg
+        # Solo interesan las versiones recientes del grid
+        while len(_GRIDS_WORKER) > 2:
+            _GRIDS_WORKER.popitem(last=False)
+    return cg
+
+
+def _resolver_lote(desc: GridDesc, tareas: List[Task]) -> List[List[int]]:
+    cg = _grid_en_worker(desc)
+    return [_ALGORITHMS[algo](cg, s, t) for s, t, algo in tareas]
+
+
+# ---------- Lado del proceso principal ----------
+
+class PathPool:
+    """
+    Pool de procesos para resolver muchas consultas de ruta sobre un mismo grid.
+    `find_paths(grid, [(inicio, meta, algo), ...])` devuelve las rutas en orden.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_batch: int = MIN_PARALLEL_BATCH):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.min_batch = max(1, int(min_batch))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._shared: Optional[SharedGrid] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: los workers no heredan hilos ni estado del servidor
+            ctx = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        return self._executor
+
+    def _compartir(self, grid: Grid) -> SharedGrid:
+        cg = compile_grid(grid)
+        key = (cg.uid, grid.version)
+        if self._shared is None or self._shared.key != key:
+            if self._shared is not None:
+                self._shared.cerrar()
+            self._shared = SharedGrid(cg, grid.version)
+        return self._shared
+
+    def find_paths(self, grid: Grid, queries: Sequence[Query], use_cache: bool = True) -> List[List[Pos]]:
+        cg = compile_grid(grid)
+        comp = componentes_de(cg)
+        out: List[List[Pos]] = [[] for _ in queries]
+        pendientes: List[int] = []
+        tareas: List[Task] = []
+
+        for i, (start, goal, algo) in enumerate(queries):
+            algo = canonical_algo(algo)
+            if start == goal:
+                out[i] = [start]
+                continue
+            s, t = cg.cell_id(start), cg.cell_id(goal)
+            if s < 0 or t < 0 or not comp.conectados_ids(s, t):
+                continue
+            if use_cache:
+                cached = PATH_CACHE.get(cache_key(grid, start, goal, algo))
+                if cached is not None:
+                    out[i] = list(cached)
+                    continue
+            pendientes.append(i)
+            tareas.append((s, t, algo))
+
+        if not tareas:
+            return out
+
+        if self.workers <= 1 or len(tareas) < self.min_batch:
+            rutas = [_ALGORITHMS[algo](cg, s, t) for s, t, algo in tareas]
+        else:
+            with self._lock:
+                desc = self._compartir(grid).descriptor()
+                n = min(len(tareas), self.workers * CHUNKS_PER_WORKER)
+                lotes = [tareas[k::n] for k in range(n)]
+                futuros = [self._pool().submit(_resolver_lote, desc, lote) for lote in lotes]
+                # lotes intercalados (k::n): reordenar al juntar
+                rutas = [[] for _ in tareas]
+                for k, fut in enumerate(futuros):
+                    for j, ids in enumerate(fut.result()):
+                        rutas[k + j * n] = ids
+
+        for i, ids, (_, _, algo) in zip(pendientes, rutas, tareas):
+            path = cg.to_positions(ids)
+            out[i] = path
+            if use_cache:
+                q = queries[i]
+                PATH_CACHE.put(cache_key(grid, q[0], q[1], algo), path)
+        return out
+
+    def cerrar(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+            if self._shared is not None:
+                self._shared.cerrar()
+                self._shared = None
+
+    # Alias de compatibilidad (inglés)
+    def close(self) -> None:
+        return self.cerrar()
+
+
+_POOL: Optional[PathPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def path_pool() -> PathPool:
+    """Pool compartido del proceso (PATH_POOL_WORKERS fija el tamaño; default: núcleos)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = PathPool(int(os.getenv("PATH_POOL_WORKERS", "0")) or None)
+            atexit.register(_POOL.cerrar)
+        return _POOL
+
+
+def find_paths(grid: Grid, queries: Sequence[Query], use_cache: bool = True) -> List[List[Pos]]:
+    """Rutas para un lote de (inicio, meta, algoritmo), en paralelo si el lote lo amerita."""
+    return path_pool().find_paths(grid, queries, use_cache)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .benchmark import grid_sintetico
+
+    ap = argparse.ArgumentParser(description="Aceleración de rutas en lote con pool de procesos")
+    ap.add_argument("--size", type=int, default=400)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--algo", default="astar")
+    ap.add_argument("--workers", nargs="*", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    grid = grid_sintetico(args.size, args.seed)
+    cg = compile_grid(grid)
+    libres = [c for c in range(cg.size) if cg.walk[c]]
+    rng = random.Random(args.seed)
+    qs: List[Query] = [(cg.pos(rng.choice(libres)), cg.pos(rng.choice(libres)), args.algo) for _ in range(args.queries)]
+
+    t0 = time.perf_counter()
+    ref = PathPool(workers=1).find_paths(grid, qs, use_cache=False)
+    serial = time.perf_counter() - t0
+    print(f"serial: {serial:.2f}s ({args.queries} consultas {args.algo}, {args.size}x{args.size})")
+
+    for w in args.workers or [os.cpu_count() or 1]:
+        pool = PathPool(workers=w, min_batch=1)
+        try:
+            pool.find_paths(grid, qs[: w * 2], use_cache=False)  # arranque de workers + grid compartido
+            t0 = time.perf_counter()
+            res = pool.find_paths(grid, qs, use_cache=False)
+            dt = time.perf_counter() - t0
+        finally:
+            pool.cerrar()
+        iguales = all(len(a) == len(b) for a, b in zip(ref, res))
+        print(f"workers={w}: {dt:.2f}s  speedup x{serial / dt:.2f}  mismas rutas={iguales}")
+
+
+if __name__ == "__main__":
+    main()
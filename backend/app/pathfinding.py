@@ -1,11 +1,183 @@
 from __future__ import annotations
 
 import heapq
-from typing import Dict, List, Optional, Tuple
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Protocol, Tuple
 
 from .models import Grid, Pos
 
 
+# ---------- Grid compilado (ids enteros) ----------
+# Cada celda se identifica con `id = y * width + x`. Las búsquedas trabajan
+# solo con enteros sobre una ocupación plana (bytearray) y tablas de vecinos
+# precalculadas; la conversión a Pos ocurre únicamente en los bordes del API.
+
+_SIN_VECINOS: Tuple[int, ...] = ()
+_UIDS = itertools.count(1)
+_MAX_CAMBIOS = 4096
+
+
+class CompiledGrid:
+    """Ocupación plana + tabla de vecinos 4-conexos por id de celda (+ costos)."""
+
+    __slots__ = (
+        "uid", "width", "height", "size", "walk", "cost", "max_cost", "_pesadas",
+        "xs", "ys", "neighbors", "version", "changes", "derived",
+    )
+
+    def __init__(self, grid: Grid):
+        walk = bytearray(grid.width * grid.height)
+        for y, row in enumerate(grid.walkable):
+            base = y * grid.width
+            for x, w in enumerate(row):
+                if w:
+                    walk[base + x] = 1
+
+        # Costo de entrar a cada celda (1 byte por celda; todo 1 si no hay costos)
+        cost = bytearray(b"\x01") * len(walk)
+        if grid.costs is not None:
+            for y, row in enumerate(grid.costs):
+                base = y * grid.width
+                for x, c in enumerate(row):
+                    if c != 1:
+                        cost[base + x] = c
+        self._inicializar(grid.width, grid.height, walk, cost)
+
+    @classmethod
+    def desde_buffers(cls, width: int, height: int, walk: bytes, cost: bytes) -> "CompiledGrid":
+        """Grid compilado a partir de ocupación y costos planos (p.ej. memoria compartida)."""
+        cg = cls.__new__(cls)
+        cg._inicializar(width, height, bytearray(walk), bytearray(cost))
+        return cg
+
+    def _inicializar(self, width: int, height: int, walk: bytearray, cost: bytearray) -> None:
+        # Identificador único (para claves de caché; id() se puede reciclar)
+        self.uid = next(_UIDS)
+        # Cambios aplicados con update_cell (versión + últimas celdas cambiadas),
+        # para que las estructuras derivadas puedan repararse localmente.
+        self.version = 0
+        self.changes: Deque[int] = deque(maxlen=_MAX_CAMBIOS)
+        # Estructuras derivadas del grid (grafo jerárquico, campos, ...), por nombre
+        self.derived: Dict[str, Any] = {}
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.walk = walk
+        self.cost = cost
+        self._pesadas = self.size - self.cost.count(1)
+        self.max_cost = max(self.cost) if self.size else 1
+
+        self.xs: List[int] = [c % self.width for c in range(self.size)]
+        self.ys: List[int] = [c // self.width for c in range(self.size)]
+
+        # Vecinos caminables de TODAS las celdas (también de las bloqueadas, para
+        # que un agente parado sobre una celda recién bloqueada pueda salir).
+        self.neighbors: List[Tuple[int, ...]] = [self._calc_neighbors(c) for c in range(self.size)]
+
+    def _calc_neighbors(self, c: int) -> Tuple[int, ...]:
+        # Mismo orden que neighbors4: (+1,0), (-1,0), (0,+1), (0,-1)
+        w = self.width
+        x = c % w
+        walk = self.walk
+        out = []
+        if x + 1 < w and walk[c + 1]:
+            out.append(c + 1)
+        if x > 0 and walk[c - 1]:
+            out.append(c - 1)
+        if c + w < self.size and walk[c + w]:
+            out.append(c + w)
+        if c >= w and walk[c - w]:
+            out.append(c - w)
+        return tuple(out) if out else _SIN_VECINOS
+
+    def copia(self) -> "CompiledGrid":
+        """
+        Copia para un Grid que deja de compartir este compilado (copy-on-write):
+        ocupación, costos y vecinos propios (copias planas, sin recalcular);
+        xs/ys se comparten (no cambian). Las estructuras derivadas se rehacen.
+        """
+        cg = CompiledGrid.__new__(CompiledGrid)
+        cg.uid = next(_UIDS)
+        cg.version = self.version
+        cg.changes = deque(self.changes, maxlen=_MAX_CAMBIOS)
+        cg.derived = {}
+        cg.width, cg.height, cg.size = self.width, self.height, self.size
+        cg.walk = bytearray(self.walk)
+        cg.cost = bytearray(self.cost)
+        cg._pesadas = self._pesadas
+        cg.max_cost = self.max_cost
+        cg.xs, cg.ys = self.xs, self.ys
+        cg.neighbors = list(self.neighbors)
+        return cg
+
+    def bytes_estimados(self) -> int:
+        """Memoria aproximada: ocupación y costos (1 byte por celda), xs/ys y tabla de vecinos."""
+        # ~8 bytes por puntero de cada lista y ~64 por tupla de vecinos
+        return self.size * (2 + 8 * 3 + 64)
+
+    @property
+    def weighted(self) -> bool:
+        """True si alguna celda cuesta distinto de 1 (si no, costo = pasos)."""
+        return self._pesadas > 0
+
+    def cell_id(self, p: Pos) -> int:
+        """Id de la celda `p`, o -1 si está fuera del grid."""
+        if 0 <= p.x < self.width and 0 <= p.y < self.height:
+            return p.y * self.width + p.x
+        return -1
+
+    def pos(self, c: int) -> Pos:
+        return Pos(self.xs[c], self.ys[c])
+
+    def to_positions(self, ids: List[int]) -> List[Pos]:
+        xs, ys = self.xs, self.ys
+        return [Pos(xs[c], ys[c]) for c in ids]
+
+    def changes_since(self, version: int) -> Optional[List[int]]:
+        """Celdas cambiadas desde `version`, o None si el registro ya no alcanza."""
+        n = self.version - version
+        if n < 0 or n > len(self.changes):
+            return None
+        return list(self.changes)[len(self.changes) - n:] if n else []
+
+    def update_cell(self, x: int, y: int, walkable: bool) -> None:
+        """Actualiza una celda y las tablas de vecinos afectadas (O(1))."""
+        c = y * self.width + x
+        self.walk[c] = 1 if walkable else 0
+        self.version += 1
+        self.changes.append(c)
+        for nb in (c + 1, c - 1, c + self.width, c - self.width):
+            if 0 <= nb < self.size and abs(self.xs[nb] - x) + abs(self.ys[nb] - y) == 1:
+                self.neighbors[nb] = self._calc_neighbors(nb)
+
+    def update_cost(self, x: int, y: int, cost: int) -> None:
+        """Actualiza el costo de una celda (los vecinos no cambian)."""
+        c = y * self.width + x
+        self._pesadas += (cost != 1) - (self.cost[c] != 1)
+        self.cost[c] = cost
+        # max_cost solo crece: es la cota del anillo de cubetas de Dial
+        if cost > self.max_cost:
+            self.max_cost = cost
+        self.version += 1
+        self.changes.append(c)
+
+
+def compile_grid(grid: Grid) -> CompiledGrid:
+    """Devuelve (y cachea en el Grid) su representación compilada."""
+    cg = grid.compiled
+    if cg is None or cg.width != grid.width or cg.height != grid.height:
+        cg = CompiledGrid(grid)
+        grid.compiled = cg
+    return cg
+
+
+# ---------- API basado en Pos (compatibilidad) ----------
+
 def neighbors4(grid: Grid, p: Pos) -> List[Pos]:
     candidates = [Pos(p.x + 1, p.y), Pos(p.x - 1, p.y), Pos(p.x, p.y + 1), Pos(p.x, p.y - 1)]
     return [c for c in candidates if grid.is_walkable(c)]
@@ -23,88 +195,938 @@ def reconstruct(came_from: Dict[Pos, Optional[Pos]], goal: Pos) -> List[Pos]:
     return path
 
 
-def bfs(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
-    if start == goal:
-        return [start]
-    from collections import deque
+# ---------- Búsquedas sobre ids ----------
+
+@dataclass(slots=True)
+class SearchStats:
+    """
+    Contadores de una búsqueda (se llenan solo si se pasa una instancia).
+
+    `pushes`/`pops` cuentan inserciones y extracciones de la frontera (heap,
+    cola o cubetas), `peak_frontier` su tamaño máximo. `source` dice de dónde
+    salió la ruta: "search" (búsqueda real), "cache" (PATH_CACHE), "table"
+    (distances.PoiDistances) o "field" (distances.GoalFields).
+    """
+    expanded: int = 0
+    pushes: int = 0
+    pops: int = 0
+    peak_frontier: int = 0
+    wall_ms: float = 0.0
+    source: str = "search"
+
+    @property
+    def cache_hit(self) -> bool:
+        return self.source != "search"
+
+    def sumar(self, expanded: int = 0, pushes: int = 0, pops: int = 0, frontier: int = 0) -> None:
+        """Acumula contadores de una (sub)búsqueda; el pico de frontera es un máximo."""
+        self.expanded += expanded
+        self.pushes += pushes
+        self.pops += pops
+        if frontier > self.peak_frontier:
+            self.peak_frontier = frontier
+
+    def acumular(self, other: "SearchStats") -> None:
+        """Suma otra consulta completa (contadores, tiempo y origen de la última)."""
+        self.sumar(other.expanded, other.pushes, other.pops, other.peak_frontier)
+        self.wall_ms += other.wall_ms
+        self.source = other.source
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "expanded": self.expanded,
+            "pushes": self.pushes,
+            "pops": self.pops,
+            "peak_frontier": self.peak_frontier,
+            "wall_ms": round(self.wall_ms, 4),
+            "source": self.source,
+            "cache_hit": self.cache_hit,
+        }
+
+    # Alias de compatibilidad (inglés)
+    def to_dict(self) -> Dict[str, Any]:
+        return self.a_dict()
+
+
+def _reconstruct_ids(came_from: Dict[int, int], goal: int) -> List[int]:
+    path: List[int] = []
+    cur = goal
+    while cur != -1:
+        path.append(cur)
+        cur = came_from[cur]
+    path.reverse()
+    return path
+
+
+def _bfs(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    nbrs = cg.neighbors
+    came_from: Dict[int, int] = {start: -1}
     q = deque([start])
-    came_from: Dict[Pos, Optional[Pos]] = {start: None}
+    expanded = 0
+    peak = 1
+    path: List[int] = []
     while q:
         cur = q.popleft()
-        for nb in neighbors4(grid, cur):
+        expanded += 1
+        for nb in nbrs[cur]:
             if nb in came_from:
                 continue
             came_from[nb] = cur
             if nb == goal:
-                return reconstruct(came_from, goal)
+                path = _reconstruct_ids(came_from, goal)
+                q.clear()
+                break
             q.append(nb)
-    return []
-
+        if len(q) > peak:
+            peak = len(q)
+    if stats is not None:
+        stats.sumar(expanded, len(came_from), expanded, peak)
+    return path
 
-def dijkstra(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
-    if start == goal:
-        return [start]
 
-    # ✅ contador para desempates (evita comparar Pos en heap)
+def _dijkstra(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    nbrs, cost = cg.neighbors, cg.cost
+    # contador para desempates (mantiene el mismo orden de expansión de siempre)
     counter = 0
-    pq: List[Tuple[int, int, Pos]] = [(0, counter, start)]
-    dist: Dict[Pos, int] = {start: 0}
-    came_from: Dict[Pos, Optional[Pos]] = {start: None}
+    pq: List[Tuple[int, int, int]] = [(0, counter, start)]
+    dist: Dict[int, int] = {start: 0}
+    came_from: Dict[int, int] = {start: -1}
+    expanded = 0
+    pops = 0
+    peak = 1
+    path: List[int] = []
 
     while pq:
         d, _, cur = heapq.heappop(pq)
+        pops += 1
         if cur == goal:
-            return reconstruct(came_from, goal)
-        if d != dist.get(cur, 10**18):
+            path = _reconstruct_ids(came_from, goal)
+            break
+        if d != dist[cur]:
             continue
+        expanded += 1
 
-        for nb in neighbors4(grid, cur):
-            nd = d + 1
+        for nb in nbrs[cur]:
+            nd = d + cost[nb]
             if nd < dist.get(nb, 10**18):
                 dist[nb] = nd
                 came_from[nb] = cur
                 counter += 1
                 heapq.heappush(pq, (nd, counter, nb))
+        if len(pq) > peak:
+            peak = len(pq)
 
-    return []
+    if stats is not None:
+        stats.sumar(expanded, counter + 1, pops, peak)
+    return path
 
 
-def astar(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
-    if start == goal:
-        return [start]
+def _astar(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    # Costo por celda >= 1: Manhattan sigue siendo admisible y consistente
+    nbrs, xs, ys, cost = cg.neighbors, cg.xs, cg.ys, cg.cost
+    gx, gy = xs[goal], ys[goal]
 
     counter = 0
-    g: Dict[Pos, int] = {start: 0}
-    came_from: Dict[Pos, Optional[Pos]] = {start: None}
+    g: Dict[int, int] = {start: 0}
+    came_from: Dict[int, int] = {start: -1}
+    closed = set()
+    path: List[int] = []
+    pops = 0
+    peak = 1
 
     # (f, counter, node)
-    pq: List[Tuple[int, int, Pos]] = [(start.manhattan(goal), counter, start)]
+    pq: List[Tuple[int, int, int]] = [(abs(xs[start] - gx) + abs(ys[start] - gy), counter, start)]
 
     while pq:
         _, _, cur = heapq.heappop(pq)
+        pops += 1
         if cur == goal:
-            return reconstruct(came_from, goal)
+            path = _reconstruct_ids(came_from, goal)
+            break
+        # Heurística consistente: re-expandir una entrada vieja no mejora nada
+        if cur in closed:
+            continue
+        closed.add(cur)
+
+        gc = g[cur]
+        for nb in nbrs[cur]:
+            ng = gc + cost[nb]
+            if ng < g.get(nb, 10**18):
+                g[nb] = ng
+                came_from[nb] = cur
+                counter += 1
+                heapq.heappush(pq, (ng + abs(xs[nb] - gx) + abs(ys[nb] - gy), counter, nb))
+        if len(pq) > peak:
+            peak = len(pq)
+
+    if stats is not None:
+        stats.sumar(len(closed), counter + 1, pops, peak)
+    return path
+
+
+# ---------- Dial (cola de cubetas) ----------
+# Dijkstra para costos enteros pequeños: en lugar de un heap, un anillo de
+# max_cost + 1 cubetas indexadas por distancia (mod max_cost + 1). Insertar y
+# sacar son O(1); cada nodo se procesa cuando la distancia actual llega a su
+# cubeta. Con costo 1 en todas las celdas se comporta como un BFS.
+
+def _dial(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    nbrs, cost = cg.neighbors, cg.cost
+    n = cg.max_cost + 1
+    buckets: List[List[int]] = [[] for _ in range(n)]
+    buckets[0].append(start)
+    dist: Dict[int, int] = {start: 0}
+    came_from: Dict[int, int] = {start: -1}
+    pending = 1
+    expanded = 0
+    pushes = 1
+    pops = 0
+    peak = 1
+    path: List[int] = []
+    d = 0
 
-        gcost = g.get(cur, 10**18)
+    while pending:
+        i = d % n
+        bucket = buckets[i]
+        if not bucket:
+            d += 1
+            continue
+        # Todo lo que se inserta ahora cae en otra cubeta (costo en [1, n-1])
+        buckets[i] = []
+        pending -= len(bucket)
+        for cur in bucket:
+            pops += 1
+            if dist[cur] != d:
+                continue  # entrada vieja (se encontró un camino más barato)
+            if cur == goal:
+                path = _reconstruct_ids(came_from, goal)
+                pending = 0
+                break
+            expanded += 1
+            for nb in nbrs[cur]:
+                nd = d + cost[nb]
+                if nd < dist.get(nb, 10**18):
+                    dist[nb] = nd
+                    came_from[nb] = cur
+                    buckets[nd % n].append(nb)
+                    pending += 1
+                    pushes += 1
+        if pending > peak:
+            peak = pending
+        d += 1
+
+    if stats is not None:
+        stats.sumar(expanded, pushes, pops, peak)
+    return path
+
+
+# ---------- Jump Point Search (4-conexo) ----------
+# Orden canónico "primero horizontal": un salto horizontal se detiene en la
+# celda desde la cual un salto vertical encuentra algo; un salto vertical se
+# detiene donde aparece un vecino lateral forzado (celda lateral libre cuya
+# celda lateral anterior está bloqueada). Solo se expanden esos puntos de
+# salto; luego se rellenan las celdas intermedias (siempre están alineados).
+
+def _jps(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    W, H = cg.width, cg.height
+    walk, xs, ys = cg.walk, cg.xs, cg.ys
+    gx, gy = xs[goal], ys[goal]
+    if not walk[goal]:
+        return []
+
+    def libre(x: int, y: int) -> bool:
+        return 0 <= x < W and 0 <= y < H and walk[y * W + x] == 1
+
+    def saltar_v(x: int, y: int, dy: int) -> int:
+        step = dy * W
+        c = y * W + x
+        der = x + 1 < W
+        izq = x > 0
+        while True:
+            y += dy
+            if y < 0 or y >= H:
+                return -1
+            c += step
+            if not walk[c]:
+                return -1
+            if c == goal:
+                return c
+            # vecino lateral forzado: libre ahora, bloqueado en la fila anterior
+            if der and walk[c + 1] and not walk[c + 1 - step]:
+                return c
+            if izq and walk[c - 1] and not walk[c - 1 - step]:
+                return c
+
+    def saltar_h(x: int, y: int, dx: int) -> int:
+        c = y * W + x
+        while True:
+            x += dx
+            if x < 0 or x >= W:
+                return -1
+            c += dx
+            if not walk[c]:
+                return -1
+            if c == goal or saltar_v(x, y, 1) >= 0 or saltar_v(x, y, -1) >= 0:
+                return c
+
+    counter = 0
+    g: Dict[int, int] = {start: 0}
+    came_from: Dict[int, int] = {start: -1}
+    closed = set()
+    pq: List[Tuple[int, int, int]] = [(abs(xs[start] - gx) + abs(ys[start] - gy), counter, start)]
+    jumps: List[int] = []
+    pops = 0
+    peak = 1
 
-        for nb in neighbors4(grid, cur):
-            ng = gcost + 1
+    while pq:
+        _, _, cur = heapq.heappop(pq)
+        pops += 1
+        if cur == goal:
+            jumps = _reconstruct_ids(came_from, goal)
+            break
+        if cur in closed:
+            continue
+        closed.add(cur)
+
+        x, y = xs[cur], ys[cur]
+        parent = came_from[cur]
+        if parent < 0:
+            dirs = ((1, 0), (-1, 0), (0, 1), (0, -1))
+        elif ys[parent] == y:
+            dx = 1 if x > xs[parent] else -1
+            dirs = ((dx, 0), (0, 1), (0, -1))
+        else:
+            dy = 1 if y > ys[parent] else -1
+            side = [(0, dy)]
+            for sx in (1, -1):
+                if libre(x + sx, y) and not libre(x + sx, y - dy):
+                    side.append((sx, 0))
+            dirs = tuple(side)
+
+        for dx, dy in dirs:
+            nb = saltar_h(x, y, dx) if dx else saltar_v(x, y, dy)
+            if nb < 0:
+                continue
+            ng = g[cur] + abs(xs[nb] - x) + abs(ys[nb] - y)
             if ng < g.get(nb, 10**18):
                 g[nb] = ng
                 came_from[nb] = cur
                 counter += 1
-                f = ng + nb.manhattan(goal)
-                heapq.heappush(pq, (f, counter, nb))
+                heapq.heappush(pq, (ng + abs(xs[nb] - gx) + abs(ys[nb] - gy), counter, nb))
+        if len(pq) > peak:
+            peak = len(pq)
+
+    if stats is not None:
+        stats.sumar(len(closed), counter + 1, pops, peak)
+    return _expandir_saltos(cg, jumps)
+
+
+def _expandir_saltos(cg: CompiledGrid, jumps: List[int]) -> List[int]:
+    """Convierte la secuencia de puntos de salto en la ruta celda a celda."""
+    if not jumps:
+        return []
+    path = [jumps[0]]
+    for a, b in zip(jumps, jumps[1:]):
+        step = (1 if b > a else -1) if cg.ys[a] == cg.ys[b] else (cg.width if b > a else -cg.width)
+        path.extend(range(a + step, b + step, step))
+    return path
+
+
+# ---------- Búsquedas bidireccionales ----------
+# Hacia adelante: u -> v existe si v es caminable. Hacia atrás (desde la meta)
+# los predecesores de u son sus vecinos caminables, más el inicio si está
+# bloqueado y es vecino (es la única celda bloqueada desde la que se sale).
+
+def _unir_rutas(par_f: Dict[int, int], par_b: Dict[int, int], meet: int) -> List[int]:
+    path = _reconstruct_ids(par_f, meet)
+    cur = par_b[meet]
+    while cur != -1:
+        path.append(cur)
+        cur = par_b[cur]
+    return path
+
+
+def _bibfs(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    if not cg.walk[goal]:
+        return []
+    nbrs = cg.neighbors
+    sale_de_inicio = set() if cg.walk[start] else set(nbrs[start])
+
+    dist_f: Dict[int, int] = {start: 0}
+    dist_b: Dict[int, int] = {goal: 0}
+    par_f: Dict[int, int] = {start: -1}
+    par_b: Dict[int, int] = {goal: -1}
+    front_f, front_b = [start], [goal]
+    best, meet = 10**18, -1
+    expanded = 0
+    peak = 2
+
+    # Por niveles completos, siempre del lado con menos frontera. Al terminar
+    # el primer nivel en el que los lados se tocan, el mejor cruce es óptimo.
+    while front_f and front_b and meet < 0:
+        nxt: List[int] = []
+        if len(front_f) <= len(front_b):
+            for u in front_f:
+                expanded += 1
+                d = dist_f[u] + 1
+                for v in nbrs[u]:
+                    if v in dist_f:
+                        continue
+                    dist_f[v] = d
+                    par_f[v] = u
+                    nxt.append(v)
+                    if v in dist_b and d + dist_b[v] < best:
+                        best, meet = d + dist_b[v], v
+            front_f = nxt
+        else:
+            for u in front_b:
+                expanded += 1
+                d = dist_b[u] + 1
+                preds = nbrs[u] + (start,) if u in sale_de_inicio else nbrs[u]
+                for v in preds:
+                    if v in dist_b:
+                        continue
+                    dist_b[v] = d
+                    par_b[v] = u
+                    nxt.append(v)
+                    if v in dist_f and d + dist_f[v] < best:
+                        best, meet = d + dist_f[v], v
+            front_b = nxt
+        if len(front_f) + len(front_b) > peak:
+            peak = len(front_f) + len(front_b)
+
+    if stats is not None:
+        stats.sumar(expanded, len(dist_f) + len(dist_b), expanded, peak)
+    return _unir_rutas(par_f, par_b, meet) if meet >= 0 else []
+
+
+def _biastar(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    if not cg.walk[goal]:
+        return []
+    nbrs, xs, ys = cg.neighbors, cg.xs, cg.ys
+    sale_de_inicio = set() if cg.walk[start] else set(nbrs[start])
+    sx, sy, gx, gy = xs[start], ys[start], xs[goal], ys[goal]
+
+    g_f: Dict[int, int] = {start: 0}
+    g_b: Dict[int, int] = {goal: 0}
+    par_f: Dict[int, int] = {start: -1}
+    par_b: Dict[int, int] = {goal: -1}
+    closed_f: set = set()
+    closed_b: set = set()
+    counter = 0
+    open_f: List[Tuple[int, int, int]] = [(abs(sx - gx) + abs(sy - gy), counter, start)]
+    open_b: List[Tuple[int, int, int]] = [(abs(sx - gx) + abs(sy - gy), counter, goal)]
+    best, meet = 10**18, -1
+    pops = 0
+    peak = 2
+
+    while open_f and open_b:
+        while open_f and open_f[0][2] in closed_f:
+            heapq.heappop(open_f)
+            pops += 1
+        while open_b and open_b[0][2] in closed_b:
+            heapq.heappop(open_b)
+            pops += 1
+        if not open_f or not open_b:
+            break
+        # Regla de parada: cada f mínimo es cota inferior de cualquier ruta
+        # que pase por nodos aún abiertos de ese lado.
+        if open_f[0][0] >= best or open_b[0][0] >= best:
+            break
+
+        adelante = len(open_f) <= len(open_b)
+        if adelante:
+            _, _, u = heapq.heappop(open_f)
+            pops += 1
+            closed_f.add(u)
+            ng = g_f[u] + 1
+            for v in nbrs[u]:
+                if ng < g_f.get(v, 10**18):
+                    g_f[v] = ng
+                    par_f[v] = u
+                    counter += 1
+                    heapq.heappush(open_f, (ng + abs(xs[v] - gx) + abs(ys[v] - gy), counter, v))
+                    if v in g_b and ng + g_b[v] < best:
+                        best, meet = ng + g_b[v], v
+        else:
+            _, _, u = heapq.heappop(open_b)
+            pops += 1
+            closed_b.add(u)
+            ng = g_b[u] + 1
+            preds = nbrs[u] + (start,) if u in sale_de_inicio else nbrs[u]
+            for v in preds:
+                if ng < g_b.get(v, 10**18):
+                    g_b[v] = ng
+                    par_b[v] = u
+                    counter += 1
+                    heapq.heappush(open_b, (ng + abs(xs[v] - sx) + abs(ys[v] - sy), counter, v))
+                    if v in g_f and ng + g_f[v] < best:
+                        best, meet = ng + g_f[v], v
+        if len(open_f) + len(open_b) > peak:
+            peak = len(open_f) + len(open_b)
+
+    if stats is not None:
+        stats.sumar(len(closed_f) + len(closed_b), counter + 2, pops, peak)
+    return _unir_rutas(par_f, par_b, meet) if meet >= 0 else []
+
+
+def _dstar(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    # Versión de una sola consulta; el uso incremental vive en incremental.DStarLite
+    from .incremental import DStarLite
+
+    planner = DStarLite(None, cg.pos(goal), cg)
+    return planner.ruta_ids(start, stats)
+
+
+def _hpa(cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+    # Búsqueda jerárquica (HPA*); el grafo abstracto se cachea en cg.derived
+    from .hierarchical import hpa_search
+
+    return hpa_search(cg, start, goal, stats)
 
-    return []
 
+class SearchFn(Protocol):
+    def __call__(self, cg: CompiledGrid, start: int, goal: int, stats: Optional[SearchStats] = None) -> List[int]:
+        ...
 
-def find_path(algo: str, grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
+
+_ALGORITHMS: Dict[str, SearchFn] = {
+    "bfs": _bfs,
+    "dijkstra": _dijkstra,
+    "astar": _astar,
+    "dial": _dial,
+    "jps": _jps,
+    "dstar": _dstar,
+    "hpa": _hpa,
+    "bibfs": _bibfs,
+    "biastar": _biastar,
+}
+
+# Algoritmos que conservan estado entre ticks (ver incremental.DStarLite)
+INCREMENTAL_ALGOS = ("dstar",)
+
+# Algoritmos que garantizan ruta de largo óptimo (en pasos, si el grid no tiene costos)
+OPTIMAL_ALGOS = ("bfs", "dijkstra", "astar", "dial", "jps", "dstar", "bibfs", "biastar")
+
+# Algoritmos que minimizan el costo por celda (Grid.costs); el resto cuenta pasos
+WEIGHTED_ALGOS = ("dijkstra", "astar", "dial")
+
+_ALIASES: Dict[str, str] = {
+    "dijsktra": "dijkstra",
+    "dj": "dijkstra",
+    "a*": "astar",
+    "a-star": "astar",
+    "jump-point": "jps",
+    "d*": "dstar",
+    "dstar-lite": "dstar",
+    "d*lite": "dstar",
+    "hpa*": "hpa",
+    "hierarchical": "hpa",
+    "bidirectional-bfs": "bibfs",
+    "bi-bfs": "bibfs",
+    "bidirectional-astar": "biastar",
+    "bi-astar": "biastar",
+    "bucket": "dial",
+    "bucket-queue": "dial",
+}
+
+
+def available_algorithms() -> List[str]:
+    """Nombres canónicos de los algoritmos que acepta `find_path`."""
+    return list(_ALGORITHMS)
+
+
+def canonical_algo(algo: str) -> str:
+    """Nombre canónico del algoritmo (resuelve alias). ValueError si no existe."""
     algo = (algo or "astar").lower()
-    if algo in ("bfs",):
-        return bfs(grid, start, goal)
-    if algo in ("dijkstra", "dijsktra", "dj"):
-        return dijkstra(grid, start, goal)
-    if algo in ("astar", "a*", "a-star"):
-        return astar(grid, start, goal)
-    raise ValueError(f"Unknown algo: {algo}")
+    algo = _ALIASES.get(algo, algo)
+    if algo not in _ALGORITHMS:
+        raise ValueError(f"Unknown algo: {algo}")
+    return algo
+
+
+def _run(search: SearchFn, grid: Grid, start: Pos, goal: Pos, stats: Optional[SearchStats] = None) -> List[Pos]:
+    if start == goal:
+        return [start]
+    cg = compile_grid(grid)
+    s = cg.cell_id(start)
+    t = cg.cell_id(goal)
+    if s < 0 or t < 0 or not _conectados(cg, s, t):
+        return []
+    return cg.to_positions(search(cg, s, t, stats))
+
+
+def _conectados(cg: CompiledGrid, s: int, t: int) -> bool:
+    # Consulta O(1) a los componentes conexos (evita explorar todo lo alcanzable
+    # cuando la meta está aislada)
+    from .components import componentes_de
+
+    return componentes_de(cg).conectados_ids(s, t)
+
+
+def bfs(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
+    return _run(_bfs, grid, start, goal)
+
+
+def dijkstra(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
+    return _run(_dijkstra, grid, start, goal)
+
+
+def astar(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
+    return _run(_astar, grid, start, goal)
+
+
+def dial(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
+    return _run(_dial, grid, start, goal)
+
+
+def jps(grid: Grid, start: Pos, goal: Pos) -> List[Pos]:
+    return _run(_jps, grid, start, goal)
+
+
+def path_cost(grid: Grid, path: List[Pos]) -> int:
+    """Costo de recorrer `path` (suma del costo de cada celda salvo la inicial)."""
+    return sum(grid.costo(p) for p in path[1:])
+
+
+def find_path_with_stats(algo: str, grid: Grid, start: Pos, goal: Pos) -> Tuple[List[Pos], SearchStats]:
+    """Como `find_path` (sin caché) pero devuelve también los contadores de la búsqueda."""
+    stats = SearchStats()
+    path = find_path(algo, grid, start, goal, use_cache=False, stats=stats)
+    return path, stats
+
+
+# ---------- Uno a muchos ----------
+
+@dataclass(slots=True)
+class OneToMany:
+    """Resultado de `one_to_many`: distancias (y rutas) a las metas alcanzables."""
+    distances: Dict[Pos, int]
+    paths: Dict[Pos, List[Pos]]
+
+
+def one_to_many(
+    grid: Grid,
+    start: Pos,
+    goals: List[Pos],
+    with_paths: bool = False,
+    stats: Optional[SearchStats] = None,
+) -> OneToMany:
+    """
+    Una sola búsqueda desde `start` con distancia exacta (en pasos) a cada meta.
+    Se detiene apenas todas las metas quedan resueltas; las inalcanzables no
+    aparecen en el resultado.
+    """
+    cg = compile_grid(grid)
+    s = cg.cell_id(start)
+    res = OneToMany(distances={}, paths={})
+    if s < 0:
+        return res
+
+    pendientes: Dict[int, List[Pos]] = {}
+    for p in goals:
+        c = cg.cell_id(p)
+        if c >= 0 and (c == s or (cg.walk[c] and _conectados(cg, s, c))):
+            pendientes.setdefault(c, []).append(p)
+
+    nbrs = cg.neighbors
+    parent: Dict[int, int] = {s: -1}
+    frontier = [s]
+    d = 0
+    expanded = 0
+    peak = 1
+    while frontier and pendientes:
+        nxt: List[int] = []
+        for cur in frontier:
+            hits = pendientes.pop(cur, None)
+            if hits is not None:
+                for p in hits:
+                    res.distances[p] = d
+                    if with_paths:
+                        res.paths[p] = cg.to_positions(_reconstruct_ids(parent, cur))
+                if not pendientes:
+                    break
+            expanded += 1
+            for nb in nbrs[cur]:
+                if nb not in parent:
+                    parent[nb] = cur
+                    nxt.append(nb)
+        frontier = nxt
+        if len(frontier) > peak:
+            peak = len(frontier)
+        d += 1
+
+    if stats is not None:
+        stats.sumar(expanded, len(parent), expanded, peak)
+    return res
+
+
+def compare_algorithms(grid: Grid, start: Pos, goal: Pos, algos: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Corre la misma consulta con varios algoritmos (sin caché) y devuelve, por
+    algoritmo, largo de la ruta (en pasos, -1 si no hay) y nodos expandidos.
+    """
+    out: Dict[str, Dict[str, int]] = {}
+    for algo in algos or ["bfs", "bibfs", "astar", "biastar"]:
+        path, stats = find_path_with_stats(algo, grid, start, goal)
+        out[canonical_algo(algo)] = {"length": len(path) - 1, "expanded": stats.expanded}
+    return out
+
+
+# ---------- Caché LRU de rutas ----------
+
+PathKey = Tuple[int, int, int, int, str]
+
+
+class PathCache:
+    """
+    LRU acotado de rutas: (grid, versión del grid, inicio, meta, algoritmo) -> ruta.
+
+    La versión del grid forma parte de la clave, así que una ruta vieja nunca
+    se devuelve después de un cambio; `invalidar(grid)` además libera las
+    entradas de ese grid.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[PathKey, Tuple[Pos, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: PathKey) -> Optional[Tuple[Pos, ...]]:
+        with self._lock:
+            path = self._data.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def put(self, key: PathKey, path: List[Pos]) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = tuple(path)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidar(self, grid: Optional[Grid] = None) -> int:
+        """Elimina las rutas de `grid` (o todas si es None). Devuelve cuántas borró."""
+        with self._lock:
+            if grid is None:
+                stale = list(self._data)
+            else:
+                if grid.compiled is None:
+                    return 0
+                uid = grid.compiled.uid
+                stale = [k for k in self._data if k[0] == uid]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    # Alias de compatibilidad (inglés)
+    def invalidate(self, grid: Optional[Grid] = None) -> int:
+        return self.invalidar(grid)
+
+
+def cache_key(grid: Grid, start: Pos, goal: Pos, algo: str) -> PathKey:
+    """Clave de PATH_CACHE para una consulta (`algo` ya canónico)."""
+    cg = compile_grid(grid)
+    return (cg.uid, grid.version, cg.cell_id(start), cg.cell_id(goal), algo)
+
+
+# Tamaño configurable con PATH_CACHE_SIZE (0 desactiva la caché)
+PATH_CACHE = PathCache(int(os.getenv("PATH_CACHE_SIZE", "4096")))
+
+
+# ---------- Métricas agregadas de búsquedas ----------
+
+@dataclass(slots=True)
+class _Agregado:
+    queries: int = 0
+    searches: int = 0
+    cache_hits: int = 0
+    expanded: int = 0
+    pushes: int = 0
+    pops: int = 0
+    peak_frontier: int = 0
+    wall_ms: float = 0.0
+    wall_ms_max: float = 0.0
+
+    def sumar(self, st: SearchStats) -> None:
+        self.queries += 1
+        if st.cache_hit:
+            self.cache_hits += 1
+        else:
+            self.searches += 1
+        self.expanded += st.expanded
+        self.pushes += st.pushes
+        self.pops += st.pops
+        self.peak_frontier = max(self.peak_frontier, st.peak_frontier)
+        self.wall_ms += st.wall_ms
+        self.wall_ms_max = max(self.wall_ms_max, st.wall_ms)
+
+    def a_dict(self) -> Dict[str, Any]:
+        n = self.queries or 1
+        return {
+            "queries": self.queries,
+            "searches": self.searches,
+            "cache_hits": self.cache_hits,
+            "hit_rate": round(self.cache_hits / n, 4),
+            "expanded_total": self.expanded,
+            "expanded_mean": round(self.expanded / n, 2),
+            "pushes_total": self.pushes,
+            "pops_total": self.pops,
+            "peak_frontier_max": self.peak_frontier,
+            "wall_ms_total": round(self.wall_ms, 3),
+            "wall_ms_mean": round(self.wall_ms / n, 4),
+            "wall_ms_max": round(self.wall_ms_max, 4),
+        }
+
+
+class PathMetrics:
+    """
+    Agregados de las consultas de ruta por (mapa, algoritmo) y por (mapa, tipo
+    de meta), más las consultas más lentas (para ver qué metas y qué mapas
+    hacen caro el pathfinding). Se desactiva con PATH_METRICS=0.
+    """
+
+    def __init__(self, enabled: bool = True, slowest: int = 20):
+        self.enabled = enabled
+        self.slowest = max(0, int(slowest))
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._por_algo: Dict[Tuple[str, str], _Agregado] = {}
+            self._por_meta: Dict[Tuple[str, str], _Agregado] = {}
+            # min-heap (wall_ms, seq, detalle) con las `slowest` consultas más lentas
+            self._lentas: List[Tuple[float, int, Dict[str, Any]]] = []
+            self._seq = 0
+
+    def registrar(
+        self,
+        map_name: str,
+        algo: str,
+        stats: SearchStats,
+        goal_kind: Optional[str] = None,
+        start: Optional[Pos] = None,
+        goal: Optional[Pos] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        kind = goal_kind or "-"
+        with self._lock:
+            self._por_algo.setdefault((map_name, algo), _Agregado()).sumar(stats)
+            self._por_meta.setdefault((map_name, kind), _Agregado()).sumar(stats)
+            if self.slowest and not stats.cache_hit:
+                self._seq += 1
+                detalle = {
+                    "map": map_name,
+                    "algo": algo,
+                    "goal_kind": kind,
+                    "start": {"x": start.x, "y": start.y} if start else None,
+                    "goal": {"x": goal.x, "y": goal.y} if goal else None,
+                    **stats.a_dict(),
+                }
+                item = (stats.wall_ms, self._seq, detalle)
+                if len(self._lentas) < self.slowest:
+                    heapq.heappush(self._lentas, item)
+                elif item[0] > self._lentas[0][0]:
+                    heapq.heapreplace(self._lentas, item)
+
+    def resumen(self, map_name: Optional[str] = None) -> Dict[str, Any]:
+        """Agregados (de un mapa o de todos) y las consultas más lentas."""
+        with self._lock:
+            def filas(tabla: Dict[Tuple[str, str], _Agregado], campo: str) -> List[Dict[str, Any]]:
+                return [
+                    {"map": m, campo: k, **agg.a_dict()}
+                    for (m, k), agg in sorted(tabla.items())
+                    if map_name is None or m == map_name
+                ]
+
+            lentas = [d for _, _, d in sorted(self._lentas, reverse=True) if map_name is None or d["map"] == map_name]
+            return {
+                "enabled": self.enabled,
+                "by_algo": filas(self._por_algo, "algo"),
+                "by_goal_kind": filas(self._por_meta, "goal_kind"),
+                "slowest": lentas,
+            }
+
+    # Alias de compatibilidad (inglés)
+    def record(
+        self,
+        map_name: str,
+        algo: str,
+        stats: SearchStats,
+        goal_kind: Optional[str] = None,
+        start: Optional[Pos] = None,
+        goal: Optional[Pos] = None,
+    ) -> None:
+        return self.registrar(map_name, algo, stats, goal_kind, start, goal)
+
+    def summary(self, map_name: Optional[str] = None) -> Dict[str, Any]:
+        return self.resumen(map_name)
+
+    def reset(self) -> None:
+        return self.reiniciar()
+
+
+PATH_METRICS = PathMetrics(enabled=os.getenv("PATH_METRICS", "1") != "0")
+
+
+def find_path(
+    algo: str,
+    grid: Grid,
+    start: Pos,
+    goal: Pos,
+    use_cache: bool = True,
+    stats: Optional[SearchStats] = None,
+) -> List[Pos]:
+    """
+    Ruta celda a celda de `start` a `goal` ([] si no hay). Si se pasa `stats`,
+    recibe los contadores de la búsqueda, el tiempo y si la ruta vino de caché.
+    """
+    algo = canonical_algo(algo)
+    t0 = time.perf_counter()
+    path = _buscar(algo, grid, start, goal, use_cache, stats)
+    if stats is not None:
+        stats.wall_ms += (time.perf_counter() - t0) * 1e3
+    return path
+
+
+def _buscar(algo: str, grid: Grid, start: Pos, goal: Pos, use_cache: bool, stats: Optional[SearchStats]) -> List[Pos]:
+    if start == goal or not use_cache:
+        return _run(_ALGORITHMS[algo], grid, start, goal, stats)
+
+    key = cache_key(grid, start, goal, algo)
+    cached = PATH_CACHE.get(key)
+    if cached is not None:
+        if stats is not None:
+            stats.source = "cache"
+        return list(cached)
+
+    path = _run(_ALGORITHMS[algo], grid, start, goal, stats)
+    PATH_CACHE.put(key, path)
+    return path
@@ -0,0 +1,235 @@
+"""
+Optimizador del orden de picks con distancias reales caminando.
+
+El recorrido es: posición actual -> todos los picks -> cola de una caja -> salida.
+- Matriz exacta de distancias entre inicio y picks (tabla de PoiDistances si
+  está precalculada; si no, búsquedas uno-a-muchos).
+- La caja se elige junto con el orden: el cierre desde cada pick es
+  min_caja(pick -> cola + cola -> salida), una consulta O(1) al campo
+  `GoalFields.mejor_cierre`.
+- Canastas chicas (<= HELD_KARP_MAX puntos distintos): Held-Karp exacto.
+- Canastas grandes: vecino más cercano + 2-opt / Or-opt hasta agotar el
+  presupuesto de tiempo (`budget_ms`).
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .distances import goal_fields, poi_distances
+from .models import MapData, Pos, Register
+from .pathfinding import one_to_many
+
+
+# Held-Karp es O(2^n * n^2): hasta aquí se resuelve exacto en pocos ms
+HELD_KARP_MAX = 9
+DEFAULT_BUDGET_MS = 20.0
+
+# Distancia para puntos inalcanzables (quedan al final del recorrido)
+UNREACHABLE = 10**6
+
+
+@dataclass(slots=True)
+class PickPlan:
+    """Orden de visita (con repeticiones si varios productos comparten pick) y caja elegida."""
+    order: List[Pos]
+    register: Optional[Register]
+    length: int
+    exact: bool
+
+
+def _matriz(md: MapData, start: Pos, puntos: List[Pos]) -> Tuple[List[int], List[List[int]]]:
+    """
+    Distancias caminando inicio -> punto (`d0`) y punto -> punto (`D`);
+    UNREACHABLE si no llega. En grid de 4 vecinos la distancia es simétrica,
+    así que cada fila solo busca los puntos que le siguen.
+    """
+    n = len(puntos)
+    d0 = [UNREACHABLE] * n
+    D = [[0] * n for _ in range(n)]
+    pd = poi_distances(md)
+    # La tabla solo sirve si se puede precalcular entera (en mapas grandes cada
+    # fila perezosa es un BFS completo; uno-a-muchos corta al hallar los destinos)
+    if all(pd.es_punto(p) for p in puntos) and pd.precalcular():
+        def fila(o: Pos, destinos: List[Pos]) -> List[int]:
+            return [UNREACHABLE if (v := pd.distancia(o, d)) is None else v for d in destinos]
+    else:
+        def fila(o: Pos, destinos: List[Pos]) -> List[int]:
+            dist = one_to_many(md.grid, o, destinos).distances
+            return [dist.get(d, UNREACHABLE) for d in destinos]
+
+    d0 = fila(start, puntos)
+    for i in range(n - 1):
+        for j, v in enumerate(fila(puntos[i], puntos[i + 1 :]), start=i + 1):
+            D[i][j] = D[j][i] = v
+    return d0, D
+
+
+def _costo(order: List[int], d0: List[int], D: List[List[int]], end: List[int]) -> int:
+    if not order:
+        return 0
+    c = d0[order[0]] + end[order[-1]]
+    for a, b in zip(order, order[1:]):
+        c += D[a][b]
+    return c
+
+
+def _held_karp(d0: List[int], D: List[List[int]], end: List[int]) -> List[int]:
+    """Camino abierto óptimo: inicio fijo, visita todos, cierre `end[último]`."""
+    n = len(d0)
+    full = (1 << n) - 1
+    inf = UNREACHABLE * (n + 2)
+    dp = [[inf] * n for _ in range(1 << n)]
+    par = [[-1] * n for _ in range(1 << n)]
+    for j in range(n):
+        dp[1 << j][j] = d0[j]
+
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(n):
+            c = row[j]
+            if c >= inf or not (mask >> j) & 1:
+                continue
+            Dj = D[j]
+            for k in range(n):
+                if (mask >> k) & 1:
+                    continue
+                nm = mask | (1 << k)
+                v = c + Dj[k]
+                if v < dp[nm][k]:
+                    dp[nm][k] = v
+                    par[nm][k] = j
+
+    last = min(range(n), key=lambda j: dp[full][j] + end[j])
+    order: List[int] = []
+    mask = full
+    while last >= 0:
+        order.append(last)
+        prev = par[mask][last]
+        mask ^= 1 << last
+        last = prev
+    order.reverse()
+    return order
+
+
+def _vecino_mas_cercano(d0: List[int], D: List[List[int]]) -> List[int]:
+    n = len(d0)
+    libres = set(range(n))
+    cur = min(libres, key=lambda j: (d0[j], j))
+    order = [cur]
+    libres.remove(cur)
+    while libres:
+        Dc = D[cur]
+        cur = min(libres, key=lambda j: (Dc[j], j))
+        order.append(cur)
+        libres.remove(cur)
+    return order
+
+
+def _busqueda_local(order: List[int], d0: List[int], D: List[List[int]], end: List[int], deadline: float) -> List[int]:
+    """2-opt + Or-opt (segmentos de 1..3) sobre el camino abierto hasta no mejorar o agotar tiempo."""
+    n = len(order)
+    S, E = n, n + 1  # nodos virtuales: inicio y cierre
+
+    def dist(a: int, b: int) -> int:
+        if a == S:
+            return d0[b]
+        if b == E:
+            return end[a]
+        return D[a][b]
+
+    seq = [S] + order + [E]
+    mejoro = True
+    while mejoro and time.perf_counter() < deadline:
+        mejoro = False
+        # 2-opt: invertir seq[i..j]
+        for i in range(1, n):
+            if time.perf_counter() >= deadline:
+                break
+            a, b = seq[i - 1], seq[i]
+            dab = dist(a, b)
+            for j in range(i + 1, n + 1):
+                c, d = seq[j], seq[j + 1]
+                delta = dist(a, c) + dist(b, d) - dab - dist(c, d)
+                if delta < 0:
+                    seq[i : j + 1] = reversed(seq[i : j + 1])
+                    mejoro = True
+                    b = seq[i]
+                    dab = dist(a, b)
+        # Or-opt: mover seq[i..i+L-1] entre otras dos posiciones
+        for L in (1, 2, 3):
+            i = 1
+            while i + L - 1 <= n and time.perf_counter() < deadline:
+                p, f = seq[i - 1], seq[i + L - 1]
+                q = seq[i + L]
+                h = seq[i]
+                quitar = dist(p, h) + dist(f, q) - dist(p, q)
+                movido = False
+                for j in range(0, n + 2 - 1):
+                    if i - 1 <= j <= i + L - 1:
+                        continue
+                    u, v = seq[j], seq[j + 1]
+                    if v == S:
+                        continue
+                    delta = dist(u, h) + dist(f, v) - dist(u, v) - quitar
+                    if delta < 0:
+                        seg = seq[i : i + L]
+                        del seq[i : i + L]
+                        k = j + 1 if j < i else j + 1 - L
+                        seq[k:k] = seg
+                        mejoro = movido = True
+                        break
+                if not movido:
+                    i += 1
+    return seq[1:-1]
+
+
+def optimizar_picks(
+    md: MapData,
+    start: Pos,
+    picks: List[Pos],
+    budget_ms: float = DEFAULT_BUDGET_MS,
+) -> PickPlan:
+    """Orden de picks y caja que minimizan el recorrido inicio -> picks -> cola -> salida."""
+    t_fin = time.perf_counter() + budget_ms / 1e3
+    fields = goal_fields(md)
+    unicos = list(dict.fromkeys(picks))
+    veces: Dict[Pos, int] = {}
+    for p in picks:
+        veces[p] = veces.get(p, 0) + 1
+
+    def cierre(o: Pos) -> Tuple[int, Optional[Register]]:
+        c = fields.mejor_cierre(o)
+        if c is None:
+            # Sin cierre alcanzable: caja más cercana en línea recta
+            regs = list(md.registers.values())
+            reg = min(regs, key=lambda r: o.manhattan(r.queue_spot)) if regs else None
+            return UNREACHABLE, reg
+        return c
+
+    if not unicos:
+        largo, reg = cierre(start)
+        return PickPlan(order=[], register=reg, length=largo, exact=True)
+
+    n = len(unicos)
+    d0, D = _matriz(md, start, unicos)
+    cierres = [cierre(p) for p in unicos]
+    end = [c for c, _ in cierres]
+
+    if n <= HELD_KARP_MAX:
+        idx = _held_karp(d0, D, end)
+        exact = True
+    else:
+        idx = _busqueda_local(_vecino_mas_cercano(d0, D), d0, D, end, t_fin)
+        exact = False
+
+    order: List[Pos] = []
+    for j in idx:
+        order.extend([unicos[j]] * veces[unicos[j]])
+    return PickPlan(order=order, register=cierres[idx[-1]][1], length=_costo(idx, d0, D, end), exact=exact)
+
+
+# --- Alias de compatibilidad (inglés) ---
+def optimize_picks(md: MapData, start: Pos, picks: List[Pos], budget_ms: float = DEFAULT_BUDGET_MS) -> PickPlan:
+    return optimizar_picks(md, start, picks, budget_ms)
@@ -0,0 +1,218 @@
+"""
+Registro de simulaciones por sesión (cada pestaña / cliente tiene la suya).
+
+- Las instancias se crean a pedido con una fábrica (`World`, `TravelWorld`,
+  `CrowdWorld`) y comparten lo de solo lectura: MapData (`load_shared_map`) y
+  grafo de ciudad (`city_graph`). Un `World` copia su mapa recién al primer
+  parche, así que cientos de sesiones cuestan poco más que su estado.
+- Tope por cantidad (`max_sessions`), por memoria estimada (`max_bytes`) y
+  por inactividad (`idle_seconds`): se desalojan primero las inactivas y
+  después las menos usadas recientemente (LRU).
+- La memoria es una estimación de lo propio de cada sesión (estado, rutas,
+  mensajes, mapa si ya lo copió); lo compartido no cuenta.
+
+Configuración por entorno: SESSIONS_MAX, SESSION_IDLE_S, SESSIONS_MAX_MB.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from .models import MapData
+from .sim.crowd import CrowdWorld
+from .sim.travel import TravelWorld
+from .sim.world import World
+
+
+T = TypeVar("T")
+
+DEFAULT_SESSION = "default"
+DEFAULT_MAX_SESSIONS = int(os.getenv("SESSIONS_MAX", "500"))
+DEFAULT_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_S", "1800"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("SESSIONS_MAX_MB", "1024")) * 1024 * 1024)
+MAX_SESSION_ID = 64
+
+# Estimaciones gruesas (CPython) para el tope de memoria
+_BASE_BYTES = 4_096
+_ITEM_BYTES = 96      # un elemento de lista / entrada de log
+_CELL_BYTES = 16      # celda de un grid propio (filas de transitabilidad y costos)
+
+
+def estimar_bytes(obj: Any) -> int:
+    """Memoria propia (no compartida) estimada de una simulación."""
+    if isinstance(obj, World):
+        n = _BASE_BYTES
+        s = obj.state
+        if s is not None:
+            b, c = s.buyer, s.cashier
+            items = len(s.messages) + len(b.selected_skus) + len(b.cart) + len(b.purchase_log) + len(b.goal_queue)
+            items += len(c.scan_log or []) + len(c.scanned_skus or [])
+            n += _ITEM_BYTES * items + 4 * len(b.path.ids)
+        if not obj.shared_map:
+            n += _bytes_mapa_propio(obj.map_data)
+        return n
+    if isinstance(obj, TravelWorld):
+        return _BASE_BYTES + _ITEM_BYTES * (len(obj.state.plan) + len(obj.state.messages))
+    if isinstance(obj, CrowdWorld):
+        # ~16 arreglos paralelos por comprador + planes (compartidos entre compradores)
+        return _BASE_BYTES + 80 * obj.n + _ITEM_BYTES * sum(len(p.skus) for p in obj.plans)
+    return _BASE_BYTES
+
+
+def _bytes_mapa_propio(md: MapData) -> int:
+    """Mapa que ya no es compartido: grid, productos y todo lo derivado que cuelga de él."""
+    n = _CELL_BYTES * md.grid.width * md.grid.height + _ITEM_BYTES * len(md.products)
+    if md.grid.compiled is not None:
+        n += md.grid.compiled.bytes_estimados()
+    for cache in (md.distances, md.fields):
+        if cache is not None:
+            n += cache.bytes_estimados()
+    return n
+
+
+class SessionRegistry(Generic[T]):
+    """
+    id de sesión -> instancia, creada a pedido con `factory()`.
+    `obtener(id)` la devuelve (creándola si hace falta) y aplica los topes.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        size_of: Callable[[Any], int] = estimar_bytes,
+    ):
+        self.factory = factory
+        self.max_sessions = max(1, int(max_sessions))
+        self.idle_seconds = float(idle_seconds)
+        self.max_bytes = max(0, int(max_bytes))
+        self.size_of = size_of
+        # id -> (instancia, último uso); orden = LRU (el primero es el más viejo)
+        self._items: "OrderedDict[str, Tuple[T, float]]" = OrderedDict()
+        self._bytes: Dict[str, int] = {}
+        self._ultimo: Optional[str] = None
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def obtener(self, session_id: Optional[str] = None) -> T:
+        sid = normalizar_sesion(session_id)
+        now = time.monotonic()
+        with self._lock:
+            # El último uso ya terminó: su tamaño puede haber cambiado
+            if self._ultimo in self._items:
+                self._bytes[self._ultimo] = self.size_of(self._items[self._ultimo][0])
+            self._desalojar(now, keep=sid)
+            item = self._items.get(sid)
+            if item is None:
+                obj = self.factory()
+                self.created += 1
+                self._bytes[sid] = self.size_of(obj)
+            else:
+                obj = item[0]
+            self._items[sid] = (obj, now)
+            self._items.move_to_end(sid)
+            self._ultimo = sid
+            self._desalojar(now, keep=sid)
+            return obj
+
+    def _desalojar(self, now: float, keep: str) -> None:
+        items = self._items
+        # 1) inactivas (las más viejas están al principio)
+        while items:
+            sid, (_, last) = next(iter(items.items()))
+            if sid == keep or now - last <= self.idle_seconds:
+                break
+            self._sacar(sid)
+            self.evicted_idle += 1
+        # 2) cantidad y memoria: LRU, nunca la sesión pedida
+        while len(items) > self.max_sessions or (self.max_bytes and self.bytes_estimados() > self.max_bytes):
+            sid = next((k for k in items if k != keep), None)
+            if sid is None:
+                break
+            self._sacar(sid)
+            self.evicted_lru += 1
+
+    def _sacar(self, sid: str) -> None:
+        self._items.pop(sid, None)
+        self._bytes.pop(sid, None)
+        if self._ultimo == sid:
+            self._ultimo = None
+
+    def poner(self, session_id: Optional[str], obj: T) -> T:
+        """Asocia `obj` a la sesión (reemplaza la que hubiera) y aplica los topes."""
+        sid = normalizar_sesion(session_id)
+        now = time.monotonic()
+        with self._lock:
+            if sid not in self._items:
+                self.created += 1
+            self._items[sid] = (obj, now)
+            self._items.move_to_end(sid)
+            self._bytes[sid] = self.size_of(obj)
+            self._ultimo = sid
+            self._desalojar(now, keep=sid)
+            return obj
+
+    def quitar(self, session_id: Optional[str]) -> bool:
+        with self._lock:
+            sid = normalizar_sesion(session_id)
+            existe = sid in self._items
+            self._sacar(sid)
+            return existe
+
+    def bytes_estimados(self) -> int:
+        return sum(self._bytes.values())
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "sessions": len(self._items),
+                "max_sessions": self.max_sessions,
+                "idle_seconds": self.idle_seconds,
+                "bytes_estimated": self.bytes_estimados(),
+                "max_bytes": self.max_bytes,
+                "created": self.created,
+                "evicted_idle": self.evicted_idle,
+                "evicted_lru": self.evicted_lru,
+                "oldest_idle_s": round(now - next(iter(self._items.values()))[1], 1) if self._items else None,
+            }
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, session_id: object) -> bool:
+        return isinstance(session_id, str) and normalizar_sesion(session_id) in self._items
+
+    # --- Alias de compatibilidad (inglés) ---
+    def get(self, session_id: Optional[str] = None) -> T:
+        return self.obtener(session_id)
+
+    def put(self, session_id: Optional[str], obj: T) -> T:
+        return self.poner(session_id, obj)
+
+    def remove(self, session_id: Optional[str]) -> bool:
+        return self.quitar(session_id)
+
+    def summary(self) -> Dict[str, Any]:
+        return self.resumen()
+
+
+def normalizar_sesion(session_id: Optional[str]) -> str:
+    sid = (session_id or "").strip()[:MAX_SESSION_ID]
+    return sid or DEFAULT_SESSION
+
+
+# --- Alias de compatibilidad (inglés) ---
+def estimate_bytes(obj: Any) -> int:
+    return estimar_bytes(obj)
+
+
+def normalize_session(session_id: Optional[str]) -> str:
+    return normalizar_sesion(session_id)
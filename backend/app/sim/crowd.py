@@ -0,0 +1,572 @@
+"""
+Simulación con muchos compradores a la vez (estado en arreglos paralelos).
+
+En lugar de un `BuyerState` por comprador, el estado de la población vive en
+arreglos indexados por comprador (struct-of-arrays):
+  - `pos` / `goal`: celda actual y meta (ids `y*W+x` del grid compilado);
+  - `phase`: esperando entrar, comprando, yendo a caja, en cola, saliendo, fuera;
+  - `voucher` / `budget`: vale y saldo;
+  - `plan` + `cart`: plan de compra (compartido entre compradores con el mismo
+    vale) y cursor del carrito sobre él (lo comprado es `plan.skus[:cart]`);
+  - `route` + `route_cursor`: ruta hacia el pick actual y avance sobre ella.
+Cada tick recorre la población en pasadas por lote (entradas, rutas,
+movimiento, llegadas, cajas). Hacia la salida y las colas de caja no se
+guardan rutas: se baja por el campo de distancias del mapa (O(1) por paso).
+Los compradores no se bloquean entre sí (como en `World`, dos pueden ocupar
+la misma celda); para evitar choques está `CooperativePlanner`.
+
+Las vistas (`resumen`, `comprador`, `compradores`, `posiciones`) se arman a
+pedido: avanzar ticks no serializa a nadie.
+
+Uso (desde backend/), prueba de carga en un mapa sintético:
+    python -m app.sim.crowd --buyers 2000 --spawn 20 --size 120
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..basket import elegir_canasta
+from ..components import componentes_de
+from ..data_loader import load_map
+from ..distances import DistanceField, find_route, goal_fields
+from ..models import MapData, Pos
+from ..pathfinding import OPTIMAL_ALGOS, WEIGHTED_ALGOS, CompiledGrid, canonical_algo, compile_grid
+from ..pick_order import optimizar_picks
+
+
+# Fases del comprador
+ESPERANDO, COMPRANDO, A_CAJA, EN_COLA, SALIENDO, FUERA = range(6)
+PHASES = ("waiting", "shopping", "to_register", "queued", "leaving", "done")
+
+# Presupuesto de planificación por vale distinto (canasta + orden de picks)
+PLAN_BUDGET_MS = 10.0
+
+MAX_PAGE = 500
+
+
+@dataclass(slots=True)
+class CrowdPlan:
+    """Plan de compra para un vale: picks en orden de visita y caja elegida."""
+    cells: array  # celda de cada ítem, en orden de visita
+    skus: List[str]
+    spent: array  # spent[k] = gasto tras los primeros k ítems
+    register: int
+    length: int
+
+
+class CrowdWorld:
+    """Muchos compradores sobre un mismo mapa, con estado en arreglos."""
+
+    def __init__(self, map_data: Optional[MapData] = None, seed: int = 0):
+        self.map_data = map_data or load_map()
+        self.reiniciar(buyers=0, seed=seed)
+
+    # ---------- Reinicio ----------
+    def reiniciar(
+        self,
+        buyers: int = 100,
+        spawn_per_tick: int = 5,
+        voucher_min: float = 20.0,
+        voucher_max: float = 120.0,
+        algo: str = "astar",
+        seed: int = 0,
+        map_data: Optional[MapData] = None,
+    ) -> Dict[str, Any]:
+        if map_data is not None:
+            self.map_data = map_data
+        md = self.map_data
+        n = max(0, int(buyers))
+        self.algo = canonical_algo(algo or "astar")
+        self.spawn_per_tick = max(1, int(spawn_per_tick))
+        self.rng = random.Random(seed)
+        self.tick = 0
+        self.last_tick_ms = 0.0
+
+        self.cg: CompiledGrid = compile_grid(md.grid)
+        self.registers = list(md.registers.values())
+        self._reg_por_id = {r.id: k for k, r in enumerate(self.registers)}
+        self._entrada = self.cg.cell_id(md.entrance)
+        self._salida = self.cg.cell_id(md.exit)
+        self._colas = [self.cg.cell_id(r.queue_spot) for r in self.registers]
+
+        # Vale entero en [min, max]: los compradores con el mismo vale comparten plan
+        lo, hi = sorted((max(0, int(round(voucher_min))), max(0, int(round(voucher_max)))))
+
+        # --- Estado por comprador (arreglos paralelos) ---
+        self.n = n
+        self.pos = array("i", [self._entrada]) * n
+        self.goal = array("i", [-1]) * n
+        self.phase = bytearray([ESPERANDO]) * n
+        self.voucher = array("d", [float(self.rng.randint(lo, hi)) for _ in range(n)])
+        self.budget = array("d", self.voucher)
+        self.plan = array("i", [-1]) * n
+        self.cart = array("i", [0]) * n
+        self.route: List[Optional[array]] = [None] * n
+        self.route_cursor = array("i", [0]) * n
+        self.register = array("i", [-1]) * n
+        self.steps = array("i", [0]) * n
+        self.t_in = array("i", [-1]) * n
+        self.t_queue = array("i", [-1]) * n
+        self.t_paid = array("i", [-1]) * n
+        self.t_out = array("i", [-1]) * n
+        self.stuck = bytearray(n)
+
+        # --- Estado compartido ---
+        self.plans: List[CrowdPlan] = []
+        self._plan_por_vale: Dict[int, int] = {}
+        self._rutas: Dict[Tuple[int, int], array] = {}
+        self._campos: Dict[int, DistanceField] = {}
+        self._version = md.grid.version
+        self.queues: List[Deque[int]] = [deque() for _ in self.registers]
+        self.serving = array("i", [-1]) * len(self.registers)
+        self.scan_left = array("i", [0]) * len(self.registers)
+        # Ticks de atención pendientes por caja (compradores asignados que no pagaron)
+        self.load = array("i", [0]) * len(self.registers)
+
+        self._siguiente_entrada = 0
+        self._activos: List[int] = []
+        self._sin_ruta: List[int] = []
+
+        # --- Agregados (se mantienen en cada pasada; `resumen` es O(#cajas)) ---
+        self.phase_counts = [0] * len(PHASES)
+        self.phase_counts[ESPERANDO] = n
+        self.stuck_count = 0
+        self.served = 0
+        self.items = 0
+        self.spent_total = 0.0
+        self.steps_done = 0
+        self.time_in_store = 0
+        self.queue_wait = 0
+        return self.resumen()
+
+    def usar_mapa(self, map_data: MapData) -> None:
+        """
+        Pasa a simular sobre `map_data`. Si es el mismo local (p.ej. la copia
+        propia que hace un World al primer parche) los compradores siguen y sus
+        rutas se rehacen en el próximo tick; si es otra sucursal, la multitud
+        queda vacía hasta el próximo `reiniciar`.
+        """
+        if map_data is self.map_data:
+            return
+        if map_data.registers is not self.map_data.registers:
+            self.reiniciar(buyers=0, map_data=map_data)
+            return
+        self.map_data = map_data
+        self._sincronizar_grid()
+
+    # ---------- Planes y rutas compartidas ----------
+    def _plan_para(self, voucher: float) -> int:
+        """Plan del vale (canasta + orden de picks + caja); uno por vale distinto."""
+        key = int(round(voucher * 100))
+        k = self._plan_por_vale.get(key)
+        if k is not None:
+            return k
+        md, cg = self.map_data, self.cg
+        skus = elegir_canasta(md, md.entrance, voucher, budget_ms=PLAN_BUDGET_MS / 2).skus
+        por_pick: Dict[Pos, List[str]] = {}
+        for sku in skus:
+            por_pick.setdefault(md.products[sku].pick, []).append(sku)
+        pp = optimizar_picks(md, md.entrance, [md.products[s].pick for s in skus], budget_ms=PLAN_BUDGET_MS / 2)
+
+        orden = [por_pick[p].pop() for p in pp.order]
+        spent = array("d", [0.0])
+        for sku in orden:
+            spent.append(spent[-1] + float(md.products[sku].price))
+        reg = self._reg_por_id.get(pp.register.id, 0) if pp.register is not None else 0
+        self.plans.append(
+            CrowdPlan(
+                cells=array("i", [cg.cell_id(md.products[s].pick) for s in orden]),
+                skus=orden,
+                spent=spent,
+                register=reg,
+                length=pp.length,
+            )
+        )
+        self._plan_por_vale[key] = len(self.plans) - 1
+        return len(self.plans) - 1
+
+    def _usa_campo(self) -> bool:
+        # Mismo criterio que `find_route`: el campo cuenta pasos
+        return self.algo in OPTIMAL_ALGOS and not (self.algo in WEIGHTED_ALGOS and self.cg.weighted)
+
+    def _campo(self, goal: int) -> DistanceField:
+        f = self._campos.get(goal)
+        if f is None:
+            f = goal_fields(self.map_data).campo(self.cg.pos(goal))
+            self._campos[goal] = f
+        return f
+
+    def _ruta(self, s: int, g: int) -> array:
+        """Ruta s -> g en ids (compartida: varios compradores recorren los mismos tramos)."""
+        r = self._rutas.get((s, g))
+        if r is None:
+            cg = self.cg
+            path = find_route(self.map_data, self.algo, cg.pos(s), cg.pos(g), goal_kind="crowd")
+            r = array("i", [cg.cell_id(p) for p in path])
+            self._rutas[(s, g)] = r
+        return r
+
+    def _fijar_meta(self, i: int, g: int) -> None:
+        self.goal[i] = g
+        self.route[i] = None
+        self.route_cursor[i] = 0
+        self._sin_ruta.append(i)
+
+    def _cambiar_fase(self, i: int, f: int) -> None:
+        self.phase_counts[self.phase[i]] -= 1
+        self.phase_counts[f] += 1
+        self.phase[i] = f
+
+    def _elegir_caja(self, i: int) -> int:
+        """
+        Caja que antes deja al comprador en la salida: llegar a la cola (o esperar
+        a que se despache lo ya asignado a esa caja) + tramo cola -> salida.
+        Sin ninguna alcanzable, la del plan.
+        """
+        c = self.pos[i]
+        salida = self._campo(self._salida).dist
+        mejor, mejor_r = -1, self.register[i]
+        for r, cola in enumerate(self._colas):
+            d, fin = self._campo(cola).dist[c], salida[cola]
+            if d < 0 or fin < 0:
+                continue
+            costo = max(d, self.load[r]) + fin
+            if mejor < 0 or costo < mejor or (costo == mejor and r == self.register[i]):
+                mejor, mejor_r = costo, r
+        return mejor_r
+
+    def _a_caja(self, i: int) -> None:
+        r = self._elegir_caja(i)
+        self.register[i] = r
+        self.load[r] += self.cart[i] + 1
+        self._cambiar_fase(i, A_CAJA)
+        self._fijar_meta(i, self._colas[r])
+
+    def _atascar(self, i: int) -> None:
+        if self.phase[i] == A_CAJA:
+            self.load[self.register[i]] -= self.cart[i] + 1
+        self.stuck[i] = 1
+        self.stuck_count += 1
+        self.t_out[i] = self.tick
+        self._cambiar_fase(i, FUERA)
+
+    def _sincronizar_grid(self) -> None:
+        """
+        Si el grid cambió (parches sobre el mapa, o `usar_mapa` con la copia
+        propia del World de la sesión), se vuelve a tomar su grid compilado (el
+        Grid puede haberlo reemplazado por una copia al primer cambio, ver
+        `Grid.copia`) y se recalculan las rutas.
+        """
+        md = self.map_data
+        if self._version == md.grid.version and self.cg is md.grid.compiled:
+            return
+        self._version = md.grid.version
+        self.cg = compile_grid(md.grid)
+        self._entrada = self.cg.cell_id(md.entrance)
+        self._salida = self.cg.cell_id(md.exit)
+        self._colas = [self.cg.cell_id(r.queue_spot) for r in self.registers]
+        self._rutas = {}
+        self._campos = {}
+        for i in self._activos:
+            if self.phase[i] in (COMPRANDO, A_CAJA, SALIENDO):
+                self._fijar_meta(i, self.goal[i])
+
+    # ---------- Pasadas del tick ----------
+    def _pasada_entradas(self) -> None:
+        fin = min(self.n, self._siguiente_entrada + self.spawn_per_tick)
+        for i in range(self._siguiente_entrada, fin):
+            k = self._plan_para(self.voucher[i])
+            plan = self.plans[k]
+            self.plan[i] = k
+            self.register[i] = plan.register
+            self.t_in[i] = self.tick
+            self._activos.append(i)
+            if plan.cells:
+                self._cambiar_fase(i, COMPRANDO)
+                self._fijar_meta(i, plan.cells[0])
+            else:
+                self._a_caja(i)
+        self._siguiente_entrada = fin
+
+    def _pasada_rutas(self) -> None:
+        campo = self._usa_campo()
+        conectados = componentes_de(self.cg).conectados_ids
+        pos, goal, phase = self.pos, self.goal, self.phase
+        for i in self._sin_ruta:
+            f = phase[i]
+            if f not in (COMPRANDO, A_CAJA, SALIENDO):
+                continue
+            s, g = pos[i], goal[i]
+            if not conectados(s, g):
+                if f == COMPRANDO:
+                    # Pick aislado: paga lo que ya tiene (_a_caja lo vuelve a encolar aquí)
+                    self._a_caja(i)
+                else:
+                    self._atascar(i)
+                continue
+            if f != COMPRANDO and campo:
+                continue  # baja por el campo de distancias
+            r = self._ruta(s, g)
+            if not r:
+                self._atascar(i)
+                continue
+            self.route[i] = r
+            self.route_cursor[i] = 0
+        self._sin_ruta = []
+
+    def _pasada_movimiento(self) -> List[int]:
+        pos, goal, phase, steps = self.pos, self.goal, self.phase, self.steps
+        route, cursor = self.route, self.route_cursor
+        nbrs = self.cg.neighbors
+        llegaron: List[int] = []
+        for i in self._activos:
+            f = phase[i]
+            if f == EN_COLA or f == FUERA:
+                continue
+            c, g = pos[i], goal[i]
+            if c != g:
+                r = route[i]
+                if r is not None:
+                    k = cursor[i] + 1
+                    cursor[i] = k
+                    c = r[k]
+                else:
+                    dist = self._campo(g).dist
+                    best = dist[c]
+                    for nb in nbrs[c]:
+                        d = dist[nb]
+                        if 0 <= d < best:
+                            best, c = d, nb
+                pos[i] = c
+                steps[i] += 1
+            if c == g:
+                llegaron.append(i)
+        return llegaron
+
+    def _pasada_llegadas(self, llegaron: List[int]) -> None:
+        for i in llegaron:
+            f = self.phase[i]
+            if f == COMPRANDO:
+                plan = self.plans[self.plan[i]]
+                k, c = self.cart[i], self.pos[i]
+                # Todos los ítems de este punto pick de una vez
+                while k < len(plan.cells) and plan.cells[k] == c:
+                    k += 1
+                self.items += k - self.cart[i]
+                self.cart[i] = k
+                self.budget[i] = self.voucher[i] - plan.spent[k]
+                if k < len(plan.cells):
+                    self._fijar_meta(i, plan.cells[k])
+                else:
+                    self._a_caja(i)
+            elif f == A_CAJA:
+                self._cambiar_fase(i, EN_COLA)
+                self.t_queue[i] = self.tick
+                self.queues[self.register[i]].append(i)
+            elif f == SALIENDO:
+                self._cambiar_fase(i, FUERA)
+                self.t_out[i] = self.tick
+                self.steps_done += self.steps[i]
+                self.time_in_store += self.tick - self.t_in[i]
+
+    def _pasada_cajas(self) -> None:
+        """Cada caja atiende a un comprador: 1 SKU por tick y un tick para canjear el vale."""
+        for r in range(len(self.registers)):
+            i = self.serving[r]
+            if i < 0:
+                if not self.queues[r]:
+                    continue
+                i = self.queues[r].popleft()
+                self.serving[r] = i
+                self.served += 1
+                self.queue_wait += self.tick - self.t_queue[i]
+                self.scan_left[r] = self.cart[i] + 1
+            self.scan_left[r] -= 1
+            self.load[r] -= 1
+            if self.scan_left[r] > 0:
+                continue
+            # Canje: el vale se consume y el comprador sale
+            self.serving[r] = -1
+            self.t_paid[i] = self.tick
+            self.spent_total += self.plans[self.plan[i]].spent[self.cart[i]]
+            self.budget[i] = 0.0
+            self._cambiar_fase(i, SALIENDO)
+            self._fijar_meta(i, self._salida)
+
+    # ---------- Tick ----------
+    def paso(self, steps: int = 1) -> Dict[str, Any]:
+        for _ in range(max(1, int(steps))):
+            if self.terminado:
+                break
+            t0 = time.perf_counter()
+            self.tick += 1
+            self._sincronizar_grid()
+            self._pasada_entradas()
+            self._pasada_rutas()
+            self._pasada_llegadas(self._pasada_movimiento())
+            self._pasada_cajas()
+            if self.phase_counts[FUERA] and self.tick % 32 == 0:
+                self._activos = [i for i in self._activos if self.phase[i] != FUERA]
+            self.last_tick_ms = (time.perf_counter() - t0) * 1e3
+        return self.resumen()
+
+    @property
+    def terminado(self) -> bool:
+        return self.phase_counts[FUERA] == self.n
+
+    # ---------- Vistas ----------
+    def resumen(self) -> Dict[str, Any]:
+        """Vista agregada (no recorre a los compradores)."""
+        hechos = self.phase_counts[FUERA] - self.stuck_count
+        return {
+            "map": self.map_data.name,
+            "tick": self.tick,
+            "finished": self.terminado,
+            "algo": self.algo,
+            "buyers": self.n,
+            "phases": dict(zip(PHASES, self.phase_counts)),
+            "stuck": self.stuck_count,
+            "plans": len(self.plans),
+            "items": self.items,
+            "spent": round(self.spent_total, 2),
+            "avg_steps": round(self.steps_done / hechos, 2) if hechos else None,
+            "avg_ticks_in_store": round(self.time_in_store / hechos, 2) if hechos else None,
+            "avg_queue_wait": round(self.queue_wait / self.served, 2) if self.served else None,
+            "registers": [
+                {
+                    "id": reg.id,
+                    "queue": len(self.queues[r]),
+                    "load": self.load[r],
+                    "serving": self.serving[r] if self.serving[r] >= 0 else None,
+                }
+                for r, reg in enumerate(self.registers)
+            ],
+            "last_tick_ms": round(self.last_tick_ms, 3),
+        }
+
+    def comprador(self, i: int) -> Dict[str, Any]:
+        """Vista de un comprador (se arma desde los arreglos)."""
+        if not 0 <= i < self.n:
+            raise IndexError(f"buyer out of range: {i}")
+        cg = self.cg
+
+        def pos(c: int) -> Optional[Dict[str, int]]:
+            return {"x": cg.xs[c], "y": cg.ys[c]} if c >= 0 else None
+
+        k = self.plan[i]
+        plan = self.plans[k] if k >= 0 else None
+        reg = self.register[i]
+        return {
+            "id": i,
+            "phase": PHASES[self.phase[i]],
+            "pos": pos(self.pos[i]),
+            "goal": pos(self.goal[i]),
+            "voucher": self.voucher[i],
+            "budget": round(self.budget[i], 2),
+            "plan": plan.skus if plan else [],
+            "cart": plan.skus[: self.cart[i]] if plan else [],
+            "register": self.registers[reg].id if reg >= 0 else None,
+            "steps": self.steps[i],
+            "route_left": len(r) - 1 - self.route_cursor[i] if (r := self.route[i]) is not None else None,
+            "tick_in": self.t_in[i] if self.t_in[i] >= 0 else None,
+            "tick_queue": self.t_queue[i] if self.t_queue[i] >= 0 else None,
+            "tick_paid": self.t_paid[i] if self.t_paid[i] >= 0 else None,
+            "tick_out": self.t_out[i] if self.t_out[i] >= 0 else None,
+            "stuck": bool(self.stuck[i]),
+        }
+
+    def compradores(self, offset: int = 0, limit: int = 100, phase: Optional[str] = None) -> Dict[str, Any]:
+        """Página de compradores (opcionalmente solo los de una fase)."""
+        limit = max(0, min(int(limit), MAX_PAGE))
+        if phase is not None:
+            f = PHASES.index(phase)
+            ids = [i for i in range(self.n) if self.phase[i] == f]
+        else:
+            ids = range(self.n)
+        sel = ids[max(0, int(offset)) : max(0, int(offset)) + limit]
+        return {"total": len(ids), "offset": offset, "buyers": [self.comprador(i) for i in sel]}
+
+    def posiciones(self) -> Dict[str, Any]:
+        """Compradores en el local como ids de celda y fase (arreglos planos, para dibujar)."""
+        ids = [i for i in self._activos if self.phase[i] != FUERA]
+        return {
+            "tick": self.tick,
+            "width": self.cg.width,
+            "buyers": ids,
+            "cells": [self.pos[i] for i in ids],
+            "phases": [self.phase[i] for i in ids],
+            "phase_names": list(PHASES),
+        }
+
+    # --- Alias de compatibilidad (inglés) ---
+    def reset(self, **kwargs: Any) -> Dict[str, Any]:
+        return self.reiniciar(**kwargs)
+
+    def step(self, steps: int = 1) -> Dict[str, Any]:
+        return self.paso(steps)
+
+    @property
+    def finished(self) -> bool:
+        return self.terminado
+
+    def use_map(self, map_data: MapData) -> None:
+        return self.usar_mapa(map_data)
+
+    def summary(self) -> Dict[str, Any]:
+        return self.resumen()
+
+    def buyer(self, i: int) -> Dict[str, Any]:
+        return self.comprador(i)
+
+    def buyers(self, offset: int = 0, limit: int = 100, phase: Optional[str] = None) -> Dict[str, Any]:
+        return self.compradores(offset, limit, phase)
+
+    def positions(self) -> Dict[str, Any]:
+        return self.posiciones()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from ..data_loader import parse_map
+    from ..mapgen import generar_mapa
+
+    ap = argparse.ArgumentParser(description="Prueba de carga: muchos compradores a la vez")
+    ap.add_argument("--buyers", type=int, default=1000)
+    ap.add_argument("--spawn", type=int, default=10, help="compradores que entran por tick")
+    ap.add_argument("--size", type=int, default=0, help="mapa sintético de size x size (0 = mapa por defecto)")
+    ap.add_argument("--algo", default="astar")
+    ap.add_argument("--voucher-min", type=float, default=20.0)
+    ap.add_argument("--voucher-max", type=float, default=120.0)
+    ap.add_argument("--max-ticks", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    md = parse_map(generar_mapa(args.size, args.size, args.seed)) if args.size else load_map()
+    crowd = CrowdWorld(md)
+    crowd.reiniciar(
+        buyers=args.buyers,
+        spawn_per_tick=args.spawn,
+        voucher_min=args.voucher_min,
+        voucher_max=args.voucher_max,
+        algo=args.algo,
+        seed=args.seed,
+    )
+    t0 = time.perf_counter()
+    while not crowd.terminado and crowd.tick < args.max_ticks:
+        crowd.paso()
+    dt = time.perf_counter() - t0
+    res = crowd.resumen()
+    print(
+        f"{args.buyers} compradores en {md.name}: {res['tick']} ticks en {dt:.2f}s "
+        f"({dt / max(1, res['tick']) * 1e3:.2f} ms/tick, {len(crowd.plans)} planes)"
+    )
+    print({k: res[k] for k in ("phases", "stuck", "items", "spent", "avg_steps", "avg_ticks_in_store", "avg_queue_wait")})
+
+
+if __name__ == "__main__":
+    main()
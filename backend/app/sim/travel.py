@@ -2,6 +2,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 import random
+import threading
 
 from ..data_loader import load_city_graph
 from ..agents.taxi import TaxiSTRIPSPlanner, TaxiAction
@@ -29,11 +30,10 @@ class TravelState:
         self.messages.append(msg)
 
 
-class TravelWorld:
-    def __init__(self, graph_file: str | None = None, seed: int = 123):
-        random.seed(seed)
+class CityGraph:
+    """Grafo de ciudad ya indexado (solo lectura: lo comparten todos los TravelWorld)."""
 
-        g = load_city_graph(graph_file)
+    def __init__(self, g: dict):
         self.meta = g.get("meta", {})
         self.nodes: Dict[str, dict] = {n["id"]: n for n in g.get("nodes", [])}
 
@@ -51,8 +51,40 @@ class TravelWorld:
         self.stores = g.get("stores", [])  # {branch_id,node_id,name}
         self.homes = [nid for nid, n in self.nodes.items() if n.get("kind") == "home"]
         self.taxi_stands = [nid for nid, n in self.nodes.items() if n.get("kind") in ("taxi_stand", "taxi")]
-
         self.planner = TaxiSTRIPSPlanner(self.nodes, self.adj)
+
+
+_GRAFOS: Dict[str, CityGraph] = {}
+_GRAFOS_LOCK = threading.Lock()
+
+
+def city_graph(graph_file: str | None = None) -> CityGraph:
+    """Grafo compartido: se carga e indexa una vez por archivo y proceso."""
+    key = str(graph_file or "")
+    with _GRAFOS_LOCK:
+        g = _GRAFOS.get(key)
+        if g is None:
+            g = CityGraph(load_city_graph(graph_file))
+            _GRAFOS[key] = g
+        return g
+
+
+class TravelWorld:
+    def __init__(self, graph_file: str | None = None, seed: int = 123, graph: Optional[CityGraph] = None):
+        # RNG propio: cada sesión sortea casa/taxi sin tocar el `random` global
+        self.rng = random.Random(seed)
+
+        g = graph or city_graph(graph_file)
+        self.graph = g
+        self.meta = g.meta
+        self.nodes = g.nodes
+        self.adj = g.adj
+        self.edges = g.edges
+        self.stores = g.stores
+        self.homes = g.homes
+        self.taxi_stands = g.taxi_stands
+        self.planner = g.planner
+
         self.state = TravelState()
         self.reset()
 
@@ -87,11 +119,11 @@ class TravelWorld:
         return best[1], best[2]
 
     def reset(self, home_id: Optional[str] = None, taxi_start: Optional[str] = None) -> TravelState:
-        home = home_id or (random.choice(self.homes) if self.homes else random.choice(list(self.nodes.keys())))
+        home = home_id or (self.rng.choice(self.homes) if self.homes else self.rng.choice(list(self.nodes.keys())))
         if home not in self.nodes:
             raise ValueError("home_id inválido")
 
-        taxi = taxi_start or (random.choice(self.taxi_stands) if self.taxi_stands else random.choice(list(self.nodes.keys())))
+        taxi = taxi_start or (self.rng.choice(self.taxi_stands) if self.taxi_stands else self.rng.choice(list(self.nodes.keys())))
         if taxi not in self.nodes:
             raise ValueError("taxi_start inválido")
 
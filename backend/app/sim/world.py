@@ -1,22 +1,59 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
 
 from ..data_loader import load_map
-from ..models import BuyerState, CashierState, MapData, Pos, WorldState
-from ..agents.buyer import BuyerAgent
+from ..models import MAX_CELL_COST, BuyerState, CashierState, MapData, Pos, Rect, WorldState
+from ..agents.buyer import EPS, BuyerAgent
 from ..agents.cashier import CashierAgent
+from ..pathfinding import PATH_CACHE, PATH_METRICS
+
+
+@dataclass(frozen=True, slots=True)
+class WorldSnapshot:
+    """
+    Foto de un `World` en un tick (ver `World.instantanea`). El mapa es el
+    mismo objeto que usaba el mundo (compartido, no se copia); comprador y
+    cajero son copias propias que nadie modifica: de una foto salen tantas
+    bifurcaciones como se quiera.
+    """
+
+    map_data: MapData
+    buyer: BuyerState
+    cashier: CashierState
+    step_count: int
+    messages: Tuple[str, ...]
+    finished: bool
+    event_driven: bool = True
 
 
 class World:
-    """Orquestador de la simulación."""
+    """
+    Orquestador de la simulación.
+
+    Con `event_driven=True` (default) los ticks en los que lo único que pasa es
+    que el comprador avanza una celda por su ruta vigente se aplican en bloque
+    hasta el próximo evento (pick, llegada a la cola, escaneo, salida). El
+    estado final y la bitácora son los mismos que avanzando tick a tick.
 
-    def __init__(self, map_data: Optional[MapData] = None):
+    Con `shared_map=True` el MapData es de solo lectura y lo comparten otros
+    mundos (sesiones): el primer parche trabaja sobre una copia propia.
+
+    `instantanea()` / `bifurcar()` / `restaurar()` sirven para análisis
+    "qué pasaría si": la bifurcación comparte el mapa (y sus cachés de
+    distancias) hasta que alguien lo parchea, y aun así el grid se copia por
+    filas a medida que se escriben.
+    """
+
+    def __init__(self, map_data: Optional[MapData] = None, event_driven: bool = True, shared_map: bool = False):
         self.map_data = map_data or load_map()
+        self.shared_map = shared_map and map_data is not None
         self.buyer_agent = BuyerAgent()
         self.cashier_agent = CashierAgent()
         self.state: Optional[WorldState] = None
         self.finished: bool = False
+        self.event_driven = event_driven
         self.reiniciar(voucher_amount=120.0, algo="astar")
 
     # --------- Alias/propiedades en español ---------
@@ -68,9 +105,12 @@ class World:
             self.state.log("⏹️ Simulación finalizada. (Reset para iniciar de nuevo)")
             return self.state
 
-        for _ in range(max(1, int(steps))):
-            if self.finished:
-                break
+        restantes = max(1, int(steps))
+        while restantes > 0 and not self.finished:
+            if self.event_driven:
+                restantes -= self._saltar_movimiento(restantes)
+                if restantes <= 0:
+                    break
 
             self.state.step_count += 1
             self.state.messages = []
@@ -81,9 +121,128 @@ class World:
             if self.state.buyer.paid and self.state.buyer.pos == self.map_data.exit:
                 self.state.log("✅ Compra finalizada: salió del supermercado.")
                 self.finished = True
+            restantes -= 1
+
+        return self.state
+
+    # --------- Instantáneas y bifurcaciones ---------
+    def instantanea(self) -> WorldSnapshot:
+        """
+        Foto del estado actual. El mapa pasa a ser compartido: el próximo parche,
+        de este mundo o de una bifurcación, trabaja sobre una copia propia.
+        """
+        s = self.state
+        assert s is not None
+        self.shared_map = True
+        return WorldSnapshot(
+            map_data=self.map_data,
+            buyer=s.buyer.copia(),
+            cashier=s.cashier.copia(),
+            step_count=s.step_count,
+            messages=tuple(s.messages),
+            finished=self.finished,
+            event_driven=self.event_driven,
+        )
 
+    def restaurar(self, snap: WorldSnapshot) -> WorldState:
+        """Vuelve al estado de `snap` (la foto no cambia: se puede restaurar otra vez)."""
+        self.map_data = snap.map_data
+        self.shared_map = True
+        self.event_driven = snap.event_driven
+        self.finished = snap.finished
+        self.state = WorldState(
+            map_data=snap.map_data,
+            buyer=snap.buyer.copia(),
+            cashier=snap.cashier.copia(),
+            step_count=snap.step_count,
+            messages=list(snap.messages),
+        )
         return self.state
 
+    @classmethod
+    def desde_instantanea(cls, snap: WorldSnapshot) -> "World":
+        """Mundo nuevo que arranca en `snap`."""
+        w = cls(snap.map_data, event_driven=snap.event_driven, shared_map=True)
+        w.restaurar(snap)
+        return w
+
+    def bifurcar(self, algo: Optional[str] = None) -> "World":
+        """
+        Mundo independiente que sigue desde el tick actual; con `algo` el
+        comprador de la bifurcación replanifica sus rutas con ese algoritmo.
+        Cuesta O(estado del comprador y cajero + alto del grid), no una copia del mapa.
+        """
+        w = World.desde_instantanea(self.instantanea())
+        if algo:
+            b = w.state.buyer
+            b.algo = algo.lower()
+            b.path.limpiar()
+            b.planner = None
+            w.state.log(f"🔀 Bifurcación con algo={b.algo}")
+        return w
+
+    def _solo_movimiento(self) -> bool:
+        """
+        True si el próximo tick solo movería al comprador una celda por su ruta:
+        ya planificó, no toca redirigirlo a caja, no está en una cola, no llegó a
+        su meta y la ruta vigente sale de donde está.
+        """
+        s = self.state
+        assert s is not None
+        b = s.buyer
+        if not (b.selected_skus and b.goal_queue):
+            return False
+        if b.goal is None or b.pos == b.goal:
+            return False
+        if not b.paid:
+            if b.budget_remaining <= EPS:
+                return False
+            mp = b.precio_minimo_pendiente()
+            if mp is not None and mp > b.budget_remaining + EPS:
+                return False
+        if s.map_data.caja_en_cola(b.pos) is not None:
+            return False
+        return len(b.path) >= 2 and b.path.actual() == b.pos
+
+    def _saltar_movimiento(self, limite: int) -> int:
+        """
+        Aplica de una vez hasta `limite` ticks de solo movimiento y devuelve
+        cuántos. Nunca aterriza en una cola de caja ni en la salida: ese tick
+        tiene efectos del cajero o del fin y se corre completo.
+        """
+        if limite <= 0 or not self._solo_movimiento():
+            return 0
+        s = self.state
+        assert s is not None
+        md, b, c = s.map_data, s.buyer, s.cashier
+        w = b.path.width
+        parada = {r.queue_spot.y * w + r.queue_spot.x for r in md.registers.values()}
+        parada.add(md.exit.y * w + md.exit.x)
+        meta = b.goal.y * w + b.goal.x
+
+        ids, cur = b.path.ids, b.path.cursor
+        k = movidas = 0
+        while k < limite and cur + k + 1 < len(ids):
+            nxt = ids[cur + k + 1]
+            if nxt in parada:
+                break
+            movidas += nxt != ids[cur + k]
+            k += 1
+            if nxt == meta:
+                break
+        if k == 0:
+            return 0
+
+        b.pos = b.path.saltar(k)
+        b.steps_moved += movidas
+        s.step_count += k
+        s.messages = []
+        # Lo que hace el cajero en cada uno de esos ticks (comprador fuera de la cola)
+        c.status = "idle"
+        if not b.paid:
+            c.register_id = None
+        return k
+
     def a_dict(self) -> Dict[str, Any]:
         s = self.state
         assert s is not None
@@ -95,6 +254,12 @@ class World:
         return {
             "meta": {"name": md.name, "city": md.city, "step": s.step_count, "finished": self.finished},
             "grid": {"width": md.grid.width, "height": md.grid.height},
+            "costs": [
+                {"x": x, "y": y, "cost": c}
+                for y, row in enumerate(md.grid.costs or [])
+                for x, c in enumerate(row)
+                if c != 1
+            ],
             "entrance": pos(md.entrance),
             "exit": pos(md.exit),
             "shelves": [
@@ -123,7 +288,10 @@ class World:
                     "goal": pos(s.buyer.goal) if s.buyer.goal else None,
                     "goal_kind": s.buyer.goal_kind,
                     "paid": s.buyer.paid,
-                    "path": [pos(p) for p in s.buyer.path[:200]],
+                    # Solo vértices (actual, giros, final): la polilínea es la misma ruta
+                    "path": [pos(p) for p in s.buyer.path.esquinas()],
+                    "path_len": len(s.buyer.path),
+                    "last_search": s.buyer.last_search.a_dict() if s.buyer.last_search else None,
                     "change_received": round(s.buyer.change_received, 2),
                 },
                 "cashier": {
@@ -141,6 +309,7 @@ class World:
                     "change_given": round(s.cashier.change_given, 2),
                 },
             },
+            "pathfinding": PATH_METRICS.resumen(md.name),
             "messages": s.messages,
         }
 
@@ -154,16 +323,35 @@ class World:
     def to_dict(self) -> Dict[str, Any]:
         return self.a_dict()
 
+    def snapshot(self) -> WorldSnapshot:
+        return self.instantanea()
+
+    def restore(self, snap: WorldSnapshot) -> WorldState:
+        return self.restaurar(snap)
+
+    @classmethod
+    def from_snapshot(cls, snap: WorldSnapshot) -> "World":
+        return cls.desde_instantanea(snap)
+
+    def fork(self, algo: Optional[str] = None) -> "World":
+        return self.bifurcar(algo)
+
     # ✅ FIX: ahora SÍ está dentro de la clase
     def recargar_mapa(self, map_file: str | None = None) -> None:
         """
         Carga un nuevo mapa desde /data y reinicia la simulación.
         """
         from pathlib import Path
-        from ..data_loader import load_map
+        from ..data_loader import load_shared_map
 
+        # Las rutas del mapa anterior ya no sirven (si nadie más lo usa)
+        if not self.shared_map:
+            PATH_CACHE.invalidar(self.map_data.grid)
+
+        # Los mapas de /data se comparten entre mundos (hasta el primer parche)
+        self.shared_map = True
         if map_file is None:
-            self.map_data = load_map()
+            self.map_data = load_shared_map()
         else:
             p = Path(map_file)
             if not p.suffix:
@@ -173,7 +361,7 @@ class World:
                 root = Path(__file__).resolve().parents[3]  # .../backend/app/sim/world.py -> project_root
                 p = root / p
 
-            self.map_data = load_map(p)
+            self.map_data = load_shared_map(p)
 
         voucher = 120.0
         algo = "astar"
@@ -185,17 +373,35 @@ class World:
 
         self.reiniciar(voucher_amount=voucher, algo=algo, cashier_register_id=reg)
 
+    def _mapa_propio(self) -> None:
+        """Copia editable del mapa compartido (grid y productos); el resto sigue compartido."""
+        self.map_data = self.map_data.copia_editable()
+        self.shared_map = False
+        if self.state:
+            self.state.map_data = self.map_data
+            # El D* Lite apunta al grid compartido: se rehace sobre la copia
+            self.state.buyer.planner = None
+
     # ✅ FIX: para que /api/patch no reviente
     def aplicar_parche(self, payload: Dict[str, Any]) -> None:
         """
         Soporta ops:
           - move_product: {"op":"move_product","sku":"P010","to":{"x":10,"y":2}}
           - set_blocked:  {"op":"set_blocked","at":{"x":7,"y":7},"blocked":true}
+          - set_cost:     {"op":"set_cost","at":{"x":7,"y":7},"cost":3}
+                          {"op":"set_cost","rect":{"x":5,"y":2,"w":3,"h":10},"cost":2}
         """
         ops = payload.get("ops", [])
         if not isinstance(ops, list):
             return
 
+        if self.shared_map and any(isinstance(op, dict) for op in ops):
+            self._mapa_propio()
+
+        grid_version = self.map_data.grid.version
+        changed: List[Pos] = []
+        costs_changed = False
+
         # si no hay state aún, igual permitimos modificar map_data
         for op in ops:
             if not isinstance(op, dict):
@@ -218,7 +424,13 @@ class World:
                         self.state.log("⚠️ move_product: coordenadas inválidas")
                     continue
 
-                self.map_data.products[sku].pick = Pos(x=x, y=y)
+                # Se reemplaza (no se modifica): el producto viejo puede ser compartido
+                old = self.map_data.products[sku].pick
+                self.map_data.products[sku] = replace(self.map_data.products[sku], pick=Pos(x=x, y=y))
+                if self.state:
+                    self.state.buyer.mover_pendiente(sku, old, Pos(x=x, y=y))
+                if self.map_data.distances is not None:
+                    self.map_data.distances.invalidar()
                 if self.state:
                     self.state.map_data = self.map_data
                     self.state.log(f"🧩 Producto {sku} movido a ({x},{y})")
@@ -235,20 +447,64 @@ class World:
                     continue
 
                 p = Pos(x=x, y=y)
+                if not self.map_data.grid.in_bounds(p):
+                    if self.state:
+                        self.state.log(f"⚠️ set_blocked: ({x},{y}) fuera del grid")
+                    continue
+
+                # Cambia la transitabilidad (sube grid.walk_version -> tabla y campos de distancias se invalidan)
+                v = self.map_data.grid.version
+                self.map_data.grid.set_blocked(p, blocked)
+                if self.map_data.grid.version != v:
+                    changed.append(p)
+                if self.state:
+                    self.state.map_data = self.map_data
+                    # Si la ruta actual pasa por la celda bloqueada, replanificar
+                    if blocked and p in self.state.buyer.path:
+                        self.state.buyer.path.limpiar()
+                    self.state.log(f"🧱 Bloqueo ({x},{y}) = {blocked}")
 
-                # Solo si tu MapData tiene estructura de bloqueados
-                if hasattr(self.map_data, "blocked"):
-                    if blocked:
-                        self.map_data.blocked.add(p)
+            elif kind == "set_cost":
+                try:
+                    cost = int(op.get("cost", 1))
+                    if "rect" in op:
+                        r = op.get("rect") or {}
+                        rect = Rect(x=int(r.get("x")), y=int(r.get("y")), w=int(r.get("w")), h=int(r.get("h")))
                     else:
-                        self.map_data.blocked.discard(p)
+                        at = op.get("at") or {}
+                        rect = Rect(x=int(at.get("x")), y=int(at.get("y")), w=1, h=1)
+                except Exception:
                     if self.state:
-                        self.state.map_data = self.map_data
-                        self.state.log(f"🧱 Bloqueo ({x},{y}) = {blocked}")
-                else:
+                        self.state.log("⚠️ set_cost: coordenadas/costo inválidos")
+                    continue
+                if not 1 <= cost <= MAX_CELL_COST:
                     if self.state:
-                        self.state.log("⚠️ MapData no tiene atributo 'blocked' (ignorado).")
+                        self.state.log(f"⚠️ set_cost: costo fuera de [1, {MAX_CELL_COST}] ({cost})")
+                    continue
+
+                v = self.map_data.grid.version
+                for cell in rect.iter_cells():
+                    self.map_data.grid.set_cost(cell, cost)
+                costs_changed = costs_changed or self.map_data.grid.version != v
+                if self.state:
+                    self.state.map_data = self.map_data
+                    self.state.log(f"🐢 Costo ({rect.x},{rect.y}) {rect.w}x{rect.h} = {cost}")
 
             else:
                 if self.state:
                     self.state.log(f"⚠️ op desconocida: {kind}")
+
+        # Invalidación exacta: las rutas cacheadas dependen de todo el grid; los
+        # campos cuentan pasos, así que solo les importa la transitabilidad
+        if self.map_data.grid.version != grid_version:
+            PATH_CACHE.invalidar(self.map_data.grid)
+        if changed and self.map_data.fields is not None:
+            self.map_data.fields.invalidar()
+
+        # Con costos nuevos la ruta actual puede dejar de ser la más barata
+        if costs_changed and self.state:
+            self.state.buyer.path.limpiar()
+
+        # Planificador incremental: reparar solo lo afectado por las celdas cambiadas
+        if changed and self.state and self.state.buyer.planner is not None:
+            self.state.buyer.planner.actualizar_celdas(changed)